@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""Benchmarks for the hot paths of python3-discogs-client.
+
+All cases run offline against MemoryFetcher/FilesystemFetcher, using
+synthetic payloads that are much larger than the test fixtures.
+
+Usage::
+
+    python benchmarks/bench.py                 # run and compare to baseline
+    python benchmarks/bench.py --save          # run and store a new baseline
+    python benchmarks/bench.py -k pagination   # run matching cases only
+
+Results are compared to ``baseline.json`` next to this file. Cases that got
+slower than the baseline by more than ``--threshold`` (default 25%) are
+reported as regressions and make the command exit with status 1. Timings
+depend on the machine, so store a baseline on the machine you compare on.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+from functools import lru_cache
+
+from oauthlib import oauth1
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discogs_client import Client  # noqa: E402
+from discogs_client.fetchers import FilesystemFetcher, MemoryFetcher  # noqa: E402
+from discogs_client.models import CollectionItemInstance, PaginatedList, Release  # noqa: E402
+from discogs_client.oauth import OAuthSigner  # noqa: E402
+from discogs_client.synthetic import SyntheticDataset  # noqa: E402
+from discogs_client.utils import parse_timestamp, update_qs  # noqa: E402
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'discogs_client', 'tests', 'res')
+
+CASES = {}
+
+
+def case(name):
+    """Register a benchmark case.
+
+    The decorated function does the setup and returns the callable to time.
+    """
+    def decorator(func):
+        CASES[name] = func
+        return func
+    return decorator
+
+
+# Synthetic payloads
+
+DATASET = SyntheticDataset(seed=1, releases=1000000, tracks=(500, 500), credits=(200, 200))
+DATASET.add_user('example', collection=10000)
+COLLECTION_URL = '/users/example/collection/folders/0/releases'
+
+
+def release_payload(release_id):
+    return DATASET.release(release_id)
+
+
+def memory_client(responses):
+    client = Client('benchmark/0.1')
+    client._base_url = ''
+    client._fetcher = MemoryFetcher(responses)
+    return client
+
+
+# Cases
+
+@case('client_request_decode')
+def bench_client_request_decode():
+    client = memory_client({'/releases/1': (json.dumps(release_payload(1)).encode('utf8'), 200)})
+    return lambda: client._get('/releases/1')
+
+
+@case('fetch_hit')
+def bench_fetch_hit():
+    release = Release(memory_client({}), release_payload(1))
+    return lambda: release.fetch('title')
+
+
+@case('fetch_miss')
+def bench_fetch_miss():
+    client = memory_client({'/releases/1': (json.dumps(release_payload(1)).encode('utf8'), 200)})
+    return lambda: Release(client, {'id': 1}).fetch('title')
+
+
+@case('fetch_invalid_key')
+def bench_fetch_invalid_key():
+    release = Release(memory_client({}), release_payload(1))
+    release.previous_request = release.data['resource_url']
+    for i in range(100):
+        release.fetch('invalid_{0}'.format(i))
+    return lambda: release.fetch('invalid_99')
+
+
+@case('descriptor_simple_field')
+def bench_descriptor_simple_field():
+    release = Release(memory_client({}), release_payload(1))
+    return lambda: release.title
+
+
+@case('descriptor_list_field')
+def bench_descriptor_list_field():
+    release = Release(memory_client({}), release_payload(1))
+    return lambda: release.tracklist
+
+
+@case('descriptor_object_field')
+def bench_descriptor_object_field():
+    release = Release(memory_client({}), release_payload(1))
+    return lambda: release.community
+
+
+@lru_cache(maxsize=None)
+def _collection_responses():
+    # Pre-rendered once, generating the pages is not what is measured here
+    return {url: DATASET.responses()[url] for url in DATASET.list_urls(COLLECTION_URL, 10000)}
+
+
+def _collection_client(trust_per_page):
+    client = memory_client(_collection_responses())
+    client.trust_per_page = trust_per_page
+    return client
+
+
+def _paginated_list(client):
+    return PaginatedList(client, COLLECTION_URL, 'releases', CollectionItemInstance)
+
+
+@case('pagination_iterate')
+def bench_pagination_iterate():
+    client = _collection_client(True)
+
+    def run():
+        for _ in _paginated_list(client):
+            pass
+    return run
+
+
+@case('pagination_getitem_trusted')
+def bench_pagination_getitem_trusted():
+    lst = _paginated_list(_collection_client(True))
+    for _ in lst:
+        pass
+    return lambda: [lst[i] for i in range(0, 10000, 97)]
+
+
+@case('pagination_getitem_untrusted')
+def bench_pagination_getitem_untrusted():
+    lst = _paginated_list(_collection_client(False))
+    for _ in lst:
+        pass
+    return lambda: [lst[i] for i in range(0, 10000, 97)]
+
+
+@case('update_qs')
+def bench_update_qs():
+    params = {'q': 'nirvana nevermind', 'type': 'release', 'format': 'Vinyl',
+              'year': 1991, 'page': 3, 'per_page': 50}
+    return lambda: update_qs('https://api.discogs.com/database/search', params)
+
+
+@case('parse_timestamp')
+def bench_parse_timestamp():
+    return lambda: parse_timestamp('2016-07-27T08:11:29-07:00')
+
+
+@case('filesystem_fetcher_exact')
+def bench_filesystem_fetcher_exact():
+    client = Client('benchmark/0.1')
+    client._base_url = ''
+    fetcher = FilesystemFetcher(FIXTURES_PATH)
+    return lambda: fetcher.fetch(client, 'GET', '/artists/1')
+
+
+@case('filesystem_fetcher_permuted_params')
+def bench_filesystem_fetcher_permuted_params():
+    client = Client('benchmark/0.1')
+    client._base_url = ''
+    fetcher = FilesystemFetcher(FIXTURES_PATH)
+    return lambda: fetcher.fetch(client, 'GET', '/artists/1/releases?page=1&per_page=50')
+
+
+def _oauth_client():
+    return oauth1.Client('consumer_key', client_secret='consumer_secret',
+                         resource_owner_key='token', resource_owner_secret='token_secret')
+
+
+INVENTORY_URL = ('https://api.discogs.com/users/example/inventory'
+                 '?page=3&per_page=100&sort=listed&sort_order=desc')
+LISTING_BODY = json.dumps({'release_id': 1, 'condition': 'Mint (M)', 'price': 10.0,
+                           'status': 'For Sale'})
+OAUTH_HEADERS = {'Accept-Encoding': 'gzip', 'User-Agent': 'benchmark/0.1'}
+OAUTH_JSON_HEADERS = dict(OAUTH_HEADERS, **{'Content-Type': 'application/json'})
+
+
+@case('oauth_sign_oauthlib')
+def bench_oauth_sign_oauthlib():
+    client = _oauth_client()
+    return lambda: client.sign(INVENTORY_URL, http_method='GET', headers=OAUTH_HEADERS)
+
+
+@case('oauth_sign')
+def bench_oauth_sign():
+    signer = OAuthSigner(_oauth_client())
+    return lambda: signer.sign(INVENTORY_URL, http_method='GET', headers=OAUTH_HEADERS)
+
+
+@case('oauth_sign_json_oauthlib')
+def bench_oauth_sign_json_oauthlib():
+    client = _oauth_client()
+    return lambda: client.sign('https://api.discogs.com/marketplace/listings', http_method='POST',
+                               body=LISTING_BODY, headers=OAUTH_JSON_HEADERS)
+
+
+@case('oauth_sign_json')
+def bench_oauth_sign_json():
+    signer = OAuthSigner(_oauth_client())
+    return lambda: signer.sign('https://api.discogs.com/marketplace/listings', http_method='POST',
+                               body=LISTING_BODY, headers=OAUTH_JSON_HEADERS)
+
+
+# Runner
+
+def measure(func, repeat=5):
+    """Return the best time per call of func in seconds."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()  # calls needed for at least 0.2 s
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def format_time(seconds):
+    for unit, factor in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= factor:
+            return '{0:.2f} {1}'.format(seconds / factor, unit)
+    return '{0:.0f} ns'.format(seconds / 1e-9)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='pattern', default='',
+                        help='only run cases whose name contains PATTERN')
+    parser.add_argument('--save', action='store_true', help='store results as the new baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown reported as regression (default 0.25)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    started = time.perf_counter()
+    for name, setup in CASES.items():
+        if args.pattern not in name:
+            continue
+        results[name] = seconds = measure(setup(), repeat=args.repeat)
+        line = '{0:<40} {1:>12}'.format(name, format_time(seconds))
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            line += '  {0:+7.1%}'.format(change)
+            if change > args.threshold:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    print('{0} cases in {1:.1f} s'.format(len(results), time.perf_counter() - started))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Baseline saved to {0}'.format(args.baseline))
+        return 0
+
+    if regressions:
+        print('Regressions beyond {0:.0%}: {1}'.format(args.threshold, ', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
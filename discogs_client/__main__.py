@@ -0,0 +1,4 @@
+import sys
+from discogs_client.cli import main
+
+sys.exit(main())
@@ -0,0 +1,230 @@
+"""Bulk changes of a marketplace inventory through CSV uploads.
+
+Adding a listing takes a request, and saving a changed :class:`.Listing` two.
+The inventory upload endpoints of the API instead take CSV files of up to
+thousands of listings each. :class:`BulkInventory` turns listings into CSV
+batches, uploads them, waits for Discogs to process them and reports a result
+for every listing::
+
+    bulk = BulkInventory(client)
+    for listing in listings:
+        listing.price = listing.price.value * 0.9
+    for result in bulk.change(listings):
+        if not result.ok:
+            print(result.item, result.message)
+
+The items are :class:`.Listing` objects or dicts. Dicts take the parameter
+names of :meth:`.Inventory.add_listing` (``release``, ``condition``,
+``allow_offers``, ...) or the CSV column names of the API (``release_id``,
+``media_condition``, ``accept_offer``, ...). Listings to change or delete
+are identified by their ``id`` or ``listing_id``.
+"""
+import csv
+import io
+import re
+import time
+from collections import namedtuple
+from enum import Enum
+from uuid import uuid4
+from discogs_client import models
+from discogs_client.exceptions import DiscogsAPIError
+
+
+#: Required and optional CSV columns of each kind of upload
+COLUMNS = {
+    'add': (('release_id', 'price', 'media_condition'),
+            ('sleeve_condition', 'comments', 'accept_offer', 'location', 'external_id',
+             'weight', 'format_quantity')),
+    'change': (('listing_id',),
+               ('release_id', 'price', 'media_condition', 'sleeve_condition', 'comments',
+                'accept_offer', 'location', 'external_id', 'weight', 'format_quantity')),
+    'delete': (('listing_id',), ()),
+}
+# Listing fields and add_listing parameters named differently in the CSV files
+COLUMN_NAMES = {
+    'id': 'listing_id',
+    'release': 'release_id',
+    'condition': 'media_condition',
+    'allow_offers': 'accept_offer',
+}
+# Lines of the upload results referring to a line of the CSV file
+LINE_MESSAGE = re.compile(r'\b(?:row|line)\s+(\d+)\b', re.IGNORECASE)
+
+#: The outcome of a bulk operation for one item. ``ok`` is None if Discogs
+#: did not finish processing the upload in time.
+RowResult = namedtuple('RowResult', ['item', 'ok', 'message'])
+
+
+def _value(value):
+    """Reduce a field value to what goes into a CSV cell."""
+    if isinstance(value, (models.Release, models.Listing)):
+        return value.id
+    if isinstance(value, models.Price):
+        return value.value
+    if isinstance(value, dict):
+        # Release and price data of listings
+        return value.get('id', value.get('value'))
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return 'Y' if value else 'N'
+    return value
+
+
+class BulkInventory:
+    """Adds, changes and deletes inventory listings through CSV uploads.
+
+    Parameters
+    ----------
+    client : Client
+        Client authenticated as the owner of the inventory.
+    batch_size : int, optional
+        Listings per uploaded file, by default 5000.
+    poll_interval : float, optional
+        Seconds between checks of the upload status, by default 10.
+    timeout : float, optional
+        Seconds to wait for Discogs to process an upload, by default an hour.
+        Results of uploads still pending by then have ``ok`` set to None.
+    """
+    def __init__(self, client, batch_size=5000, poll_interval=10.0, timeout=3600.0):
+        self.client = client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def add(self, items):
+        """Add new listings.
+
+        Returns
+        -------
+        list of RowResult
+        """
+        return self.run('add', items)
+
+    def change(self, items):
+        """Change existing listings.
+
+        Successfully saved changes of :class:`.Listing` objects are applied
+        to their data, like :meth:`.Listing.save` does.
+
+        Returns
+        -------
+        list of RowResult
+        """
+        results = self.run('change', items)
+        for result in results:
+            if result.ok and isinstance(result.item, models.Listing):
+                result.item._apply_changes()
+        return results
+
+    def delete(self, items):
+        """Delete listings.
+
+        Returns
+        -------
+        list of RowResult
+        """
+        return self.run('delete', items)
+
+    def run(self, action, items):
+        """Upload the items in batches and wait for the results."""
+        results = []
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == self.batch_size:
+                results.extend(self._run_batch(action, batch))
+                batch = []
+        if batch:
+            results.extend(self._run_batch(action, batch))
+        return results
+
+    def _run_batch(self, action, batch):
+        upload = self.wait(self.upload(action, batch))
+        return self.row_results(upload, batch)
+
+    def row(self, action, item):
+        """The CSV columns of an item as a dict."""
+        required, optional = COLUMNS[action]
+        if isinstance(item, models.Listing):
+            fields = dict(item.data)
+            fields.update(item.changes)
+        else:
+            fields = item
+        row = {}
+        for key, value in fields.items():
+            column = COLUMN_NAMES.get(key, key)
+            if value is not None and (column in required or column in optional):
+                row[column] = _value(value)
+        missing = [column for column in required if column not in row]
+        if missing:
+            raise ValueError('{0!r} lacks {1} to {2} it'.format(item, ', '.join(missing), action))
+        return row
+
+    def csv(self, action, batch):
+        """The CSV file uploading the batch of items."""
+        rows = [self.row(action, item) for item in batch]
+        required, optional = COLUMNS[action]
+        columns = list(required) + [c for c in optional if any(c in row for row in rows)]
+        f = io.StringIO()
+        writer = csv.DictWriter(f, columns, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+        return f.getvalue().encode('utf8')
+
+    def upload(self, action, batch):
+        """Upload a batch of items without waiting for the result.
+
+        Returns
+        -------
+        InventoryUpload
+        """
+        if action not in COLUMNS:
+            raise ValueError("Action must be one of 'add', 'change', 'delete'")
+        filename = '{0}-{1}.csv'.format(action, uuid4().hex)
+        url = '{0}/inventory/upload/{1}'.format(self.client._base_url, action)
+        resp = self.client._upload(url, filename, self.csv(action, batch))
+        if resp and 'id' in resp:
+            return models.InventoryUpload(self.client, resp)
+
+        # The API points to the new upload in the Location header, which the
+        # fetchers do not pass on. Look it up among the recent uploads.
+        recent = self.client._get(self.client._base_url + '/inventory/upload')
+        for data in recent.get('items', []):
+            if data.get('filename') == filename:
+                return models.InventoryUpload(self.client, data)
+        raise DiscogsAPIError('Uploaded file {0} not found'.format(filename))
+
+    def wait(self, upload):
+        """Poll the status of an upload until Discogs processed it or the
+        timeout expired."""
+        deadline = time.monotonic() + self.timeout
+        while upload.pending and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            upload.refresh()
+        return upload
+
+    def row_results(self, upload, batch):
+        """Match the results of a processed upload to the items uploaded.
+
+        Lines of the results naming a line of the CSV file are taken as
+        errors of the item in that line; the header is line 1.
+        """
+        if upload.pending:
+            return [RowResult(item, None, 'Upload still pending') for item in batch]
+        messages = {}
+        text = upload.fetch('results') or ''
+        for line in text.splitlines():
+            match = LINE_MESSAGE.search(line)
+            if match and 2 <= int(match.group(1)) < len(batch) + 2:
+                messages[int(match.group(1)) - 2] = line.strip()
+        failed = upload.fetch('status', '').lower() != 'success'
+        results = []
+        for index, item in enumerate(batch):
+            if index in messages:
+                results.append(RowResult(item, False, messages[index]))
+            elif failed:
+                results.append(RowResult(item, False, text))
+            else:
+                results.append(RowResult(item, True, None))
+        return results
@@ -0,0 +1,381 @@
+"""Command-line tool for bulk jobs, run as ``python -m discogs_client``.
+
+Export a list, all results of a search, or full data for a file of IDs to
+JSON Lines, JSON, CSV or Parquet::
+
+    python -m discogs_client export collection --user example -o collection.csv
+    python -m discogs_client export orders --fields id,status,total.value -o -
+    python -m discogs_client search "dub techno" -f type=release --all -o dub.jsonl
+    python -m discogs_client hydrate release_ids.txt --concurrency 8 -o releases.jsonl
+
+Authentication uses a personal access token from ``--token`` or the
+``DISCOGS_USER_TOKEN`` environment variable. Requests are spaced out to stay
+within ``--rate`` requests per minute, shared by all ``--concurrency``
+threads.
+
+Items are written as they come in. With ``--checkpoint FILE``, progress is
+saved to FILE after every page (or every 100 IDs), and running the same
+command again continues where it stopped, appending to the output. Lists are
+checkpointed with their :class:`.Cursor`. The checkpoint is removed once the
+job is done.
+"""
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import RequestException
+from discogs_client import __version__, models
+from discogs_client.client import Client
+from discogs_client.exceptions import HTTPError, TooManyAttemptsError
+from discogs_client.export import WRITERS, guess_format, iter_pages, open_output
+from discogs_client.fetchers import RateLimitedFetcher
+from discogs_client.utils import write_atomic
+
+
+USER_AGENT = 'python3-discogs-client-cli/' + __version__
+LISTS = ('collection', 'wantlist', 'inventory', 'orders')
+TYPES = ('release', 'master', 'artist', 'label')
+#: IDs hydrated between checkpoints
+CHECKPOINT_EVERY = 100
+
+
+class UsageError(ValueError):
+    """Arguments that do not fit the job, reported with the usage of the
+    command."""
+
+
+class Checkpoint:
+    """Progress of hydrating IDs, kept in a JSON file.
+
+    ``position`` counts the IDs that are completely written. A checkpoint
+    file of another job is rejected with a :class:`UsageError`. Exports of lists are
+    checkpointed with a :class:`.Cursor` instead.
+    """
+    def __init__(self, path, job):
+        self.path = path
+        self.job = job
+        self.position = 0
+        self.count = 0
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state['job'] != job:
+                raise UsageError('Checkpoint {0} belongs to another job: {1}'.format(
+                    path, state['job']))
+            self.position = state['position']
+            self.count = state['count']
+
+    @property
+    def resumed(self):
+        return self.position > 0
+
+    def save(self, position, count):
+        """Record progress, replacing the file atomically."""
+        self.position = position
+        self.count = count
+        if self.path is None:
+            return
+        write_atomic(self.path, json.dumps({'job': self.job, 'position': position,
+                                            'count': count}))
+
+    def done(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Output:
+    """Writes items to the output of a command and flushes them, so that
+    everything before a saved checkpoint is on disk."""
+    def __init__(self, args, append=False):
+        self.path = args.output
+        self.format = guess_format(args.output, args.format)
+        fields = args.fields.split(',') if args.fields else None
+        try:
+            # Before the file is opened, to leave no empty file behind
+            WRITERS[self.format].check(append)
+        except (ValueError, ImportError) as e:
+            raise UsageError(str(e)) from e
+        self.f, self.close_file = open_output(self.path, self.format, append)
+        self.writer = WRITERS[self.format](self.f, fields, append)
+
+    def write(self, items):
+        self.writer.write(items)
+        self.f.flush()
+
+    def close(self):
+        self.writer.close()
+        if self.close_file:
+            self.f.close()
+
+
+def _user(client, args):
+    if args.user:
+        return client.user(args.user)
+    return client.identity()
+
+
+def _list(client, args):
+    """The paginated list to export."""
+    if args.list == 'orders':
+        lst = models.PaginatedList(client, client._base_url + '/marketplace/orders',
+                                   'orders', models.Order)
+    elif args.list == 'collection':
+        folders = _user(client, args).collection_folders
+        for folder in folders:
+            if folder.id == args.folder:
+                lst = folder.releases
+                break
+        else:
+            raise UsageError('No collection folder {0}'.format(args.folder))
+    else:
+        lst = getattr(_user(client, args), args.list)
+    lst.per_page = args.per_page
+    if args.sort:
+        lst.sort(args.sort, args.order)
+    return lst
+
+
+def _search_fields(args):
+    fields = {}
+    for field in args.field:
+        name, sep, value = field.partition('=')
+        if not sep:
+            raise UsageError('Search fields are given as NAME=VALUE, not {0!r}'.format(field))
+        fields[name] = value
+    return fields
+
+
+def export_list(lst, args):
+    """Write the pages of a list, saving its cursor after every page.
+
+    Returns
+    -------
+    int
+        The number of items written.
+    """
+    cursor = models.Cursor.load(args.checkpoint) if args.checkpoint else None
+    resumed = cursor is not None
+    if resumed:
+        try:
+            lst.restore(cursor)
+        except ValueError as e:
+            raise UsageError(str(e)) from e
+    else:
+        cursor = lst.cursor
+    output = Output(args, append=resumed)
+    count = 0
+    try:
+        try:
+            for items in iter_pages(lst, args.prefetch, start=cursor.page,
+                                    concurrency=args.concurrency):
+                # Skips items that moved over from the previous page
+                items = models.skip_through(items, cursor.last_id)
+                output.write(items)
+                count += len(items)
+                cursor = cursor._replace(page=cursor.page + 1,
+                                         last_id=models.item_id(items[-1]) if items else cursor.last_id)
+                if args.checkpoint:
+                    cursor.save(args.checkpoint)
+        except HTTPError as e:
+            # The list ends early, as searches do at the end of their window
+            if e.status_code != 404 or cursor.page == 1:
+                raise
+    finally:
+        output.close()
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    return count
+
+
+def search_all(client, args):
+    """Write every result of a search, see :class:`.SearchEnumerator`."""
+    query = [args.query] if args.query else []
+    fields = _search_fields(args)
+    output = Output(args)
+    count = 0
+    try:
+        for result in client.search_all(*query, concurrency=args.concurrency, **fields):
+            output.write([result.data])
+            count += 1
+    finally:
+        output.close()
+    return count
+
+
+def read_ids(path):
+    """The IDs in a file with one ID per line, ``'-'`` for standard input.
+
+    Blank lines and lines starting with ``#`` are skipped.
+    """
+    f = sys.stdin if path == '-' else open(path)
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield int(line.split()[0])
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def hydrate(client, kind, ids, concurrency):
+    """Fetch the full data of objects concurrently.
+
+    Yields ``(id, data, error)`` in the order of ``ids``, with ``data`` None
+    and the HTTPError in ``error`` for objects that could not be fetched.
+    """
+    def fetch(id_):
+        obj = getattr(client, kind)(id_)
+        try:
+            obj.refresh()
+        except HTTPError as e:
+            return id_, None, e
+        return id_, obj.data, None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        try:
+            for id_ in ids:
+                pending.append(executor.submit(fetch, id_))
+                if len(pending) >= 2 * concurrency:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def hydrate_ids(client, args):
+    path = args.ids if args.ids == '-' else os.path.abspath(args.ids)
+    checkpoint = Checkpoint(args.checkpoint, 'hydrate {0} {1}'.format(args.type, path))
+    ids = read_ids(args.ids)
+    for _ in range(checkpoint.position):
+        next(ids, None)
+
+    output = Output(args, append=checkpoint.resumed)
+    position, count, failed = checkpoint.position, checkpoint.count, 0
+    try:
+        for id_, data, error in hydrate(client, args.type, ids, args.concurrency):
+            if error is None:
+                output.write([data])
+                count += 1
+            else:
+                failed += 1
+                print('{0} {1}: {2}'.format(args.type, id_, error), file=sys.stderr)
+            position += 1
+            if position % CHECKPOINT_EVERY == 0:
+                checkpoint.save(position, count)
+    finally:
+        output.close()
+        checkpoint.save(position, count)
+    checkpoint.done()
+    return count, failed
+
+
+def parser():
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('-o', '--output', default='-',
+                        help="file to write, '-' for standard output (default)")
+    output.add_argument('--format', choices=sorted(WRITERS),
+                        help='output format, by default derived from the file extension')
+    output.add_argument('--fields', help='comma-separated fields to write, dotted for nested values')
+    output.add_argument('--checkpoint', metavar='FILE',
+                        help='save progress to FILE and resume from it')
+
+    pages = argparse.ArgumentParser(add_help=False)
+    pages.add_argument('--per-page', type=int, default=100, help='items per request (default 100)')
+    pages.add_argument('--prefetch', type=int, default=2,
+                       help='pages fetched ahead of the one being written (default 2)')
+
+    p = argparse.ArgumentParser(prog='python -m discogs_client',
+                                description='Bulk jobs against the Discogs API.')
+    p.add_argument('--token', default=os.environ.get('DISCOGS_USER_TOKEN'),
+                   help='personal access token, by default $DISCOGS_USER_TOKEN')
+    p.add_argument('--user-agent', default=USER_AGENT)
+    p.add_argument('--rate', type=int, default=60,
+                   help='requests per minute, 0 for no limit (default 60)')
+    p.add_argument('--concurrency', type=int, default=4,
+                   help='requests in progress at the same time (default 4)')
+    commands = p.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    c = commands.add_parser('export', parents=[output, pages], help='export a list')
+    c.add_argument('list', choices=LISTS)
+    c.add_argument('--user', help='username, by default the authenticated user')
+    c.add_argument('--folder', type=int, default=0,
+                   help='collection folder ID (default 0, all releases)')
+    c.add_argument('--sort', help='sort key, such as added or listed')
+    c.add_argument('--order', choices=('asc', 'desc'), default='asc')
+
+    c = commands.add_parser('search', parents=[output, pages], help='export search results')
+    c.add_argument('query', nargs='?')
+    c.add_argument('-f', '--field', action='append', default=[], metavar='NAME=VALUE',
+                   help='search parameter such as type=release, may be repeated')
+    c.add_argument('--all', action='store_true',
+                   help='partition the search to get results beyond the first 10000')
+
+    c = commands.add_parser('hydrate', parents=[output], help='fetch full data for a file of IDs')
+    c.add_argument('ids', help="file with an ID per line, '-' for standard input")
+    c.add_argument('--type', choices=TYPES, default='release')
+    return p
+
+
+def main(argv=None, client=None):
+    """Run the command-line tool.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        Arguments, by default those of the process.
+    client : Client, optional
+        Client to use instead of one authenticated with ``--token``.
+
+    Returns
+    -------
+    int
+        The exit status.
+    """
+    p = parser()
+    args = p.parse_args(argv)
+    if client is None:
+        client = Client(args.user_agent, user_token=args.token)
+    if args.rate:
+        client._fetcher = RateLimitedFetcher(client._fetcher, rate=args.rate, per=60.0)
+
+    try:
+        if args.command == 'export':
+            count = export_list(_list(client, args), args)
+        elif args.command == 'search' and args.all:
+            if args.checkpoint:
+                p.error('--checkpoint cannot be used with --all')
+            count = search_all(client, args)
+        elif args.command == 'search':
+            query = [args.query] if args.query else []
+            lst = client.search(*query, **_search_fields(args))
+            lst.per_page = args.per_page
+            count = export_list(lst, args)
+        else:
+            count, failed = hydrate_ids(client, args)
+            if failed:
+                print('{0} {1}s could not be fetched'.format(failed, args.type), file=sys.stderr)
+                return 1
+    except UsageError as e:
+        p.error(str(e))
+    except (HTTPError, RequestException) as e:
+        print('Request failed: {0}'.format(e), file=sys.stderr)
+        return 1
+    except (ValueError, TooManyAttemptsError) as e:
+        # Such as a malformed response or checkpoint, or requests still
+        # rate limited after every retry, possibly after part of the
+        # output was written
+        print('Job failed: {0}'.format(e), file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print('Interrupted', file=sys.stderr)
+        return 130
+    if args.output != '-':
+        print('Wrote {0} items to {1}'.format(count, args.output), file=sys.stderr)
+    return 0
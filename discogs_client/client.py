@@ -1,11 +1,18 @@
 import json
+from collections import namedtuple
 from typing import Union
 from urllib.parse import urlencode
 
 from discogs_client import models
 from discogs_client.exceptions import ConfigurationError, HTTPError, AuthorizationError
-from discogs_client.utils import update_qs
+from discogs_client.utils import encode_multipart, update_qs
 from discogs_client.fetchers import RequestsFetcher, OAuth2Fetcher, UserTokenRequestsFetcher
+from discogs_client.search import SearchEnumerator, normalize_query
+
+
+#: The outcome of saving one object with :meth:`Client.save_all`. ``error``
+#: is the exception raised by the save, or None if it succeeded.
+SaveResult = namedtuple('SaveResult', ['object', 'error'])
 
 
 class Client:
@@ -20,6 +27,8 @@ class Client:
         self.verbose = False
         self._fetcher = RequestsFetcher()
         self._trust_per_page = True  # Default: True
+        self._save_mode = 'refresh'
+        self.search_cache = None
 
         if consumer_key and consumer_secret:
             self.set_consumer_key(consumer_key, consumer_secret)
@@ -85,7 +94,7 @@ class Client:
         if not self.user_agent:
             raise ConfigurationError('Invalid or no User-Agent set.')
 
-    def _request(self, method, url, data=None):
+    def _request(self, method, url, data=None, content_type=None):
         if self.verbose:
             print(' '.join((method, url)))
 
@@ -97,11 +106,13 @@ class Client:
         }
 
         if data:
-            headers['Content-Type'] = 'application/json'
+            headers['Content-Type'] = content_type or 'application/json'
 
-        content, status_code = self._fetcher.fetch(self, method, url, data=data, headers=headers)
+        # Data with a content type of its own is sent as it is
+        content, status_code = self._fetcher.fetch(self, method, url, data, headers,
+                                                   content_type is None)
 
-        if status_code == 204:
+        if status_code == 204 or (not content and 200 <= status_code < 300):
             return None
 
         body = json.loads(content)
@@ -126,23 +137,42 @@ class Client:
     def _put(self, url, data):
         return self._request('PUT', url, data)
 
+    def _upload(self, url, filename, content, field='upload', content_type='text/csv'):
+        body, multipart_type = encode_multipart(field, filename, content, content_type)
+        return self._request('POST', url, body, multipart_type)
+
     def search(self, *query, **fields):
         """
         Search the Discogs database. Returns a paginated list of objects
         (Artists, Releases, Masters, and Labels). The keyword arguments to this
-        function are serialized into the request's query string.
+        function are serialized into the request's query string, in the
+        canonical form of :func:`~discogs_client.search.normalize_query`.
+        Set :attr:`search_cache` to a :class:`~discogs_client.search.SearchCache`
+        to reuse the pages of equivalent searches.
+        """
+        return models.SearchResults(
+            self,
+            update_qs(self._base_url + '/database/search', self._search_fields(query, fields))
+        )
+
+    def search_all(self, *query, concurrency=4, **fields):
         """
+        Iterate over every result of a search, like :meth:`search`, but also
+        beyond the 10000 results the API pages through for a single search.
+
+        Broad searches are split by type, year range, format and country
+        until every part fits, see :class:`~discogs_client.search.SearchEnumerator`.
+        Results arrive in no particular order, each of them once.
+        """
+        return SearchEnumerator(self, self._search_fields(query, fields), concurrency=concurrency)
+
+    def _search_fields(self, query, fields):
         if query:
             items = [
                 item.decode() if type(item) == bytes else item for item in query
             ]
             fields['q'] = ' '.join(items)
-
-        return models.MixedPaginatedList(
-            self,
-            update_qs(self._base_url + '/database/search', fields),
-            'results'
-        )
+        return normalize_query(fields)
 
     def artist(self, id):
         """Fetch an Artist by ID."""
@@ -176,6 +206,10 @@ class Client:
         """Fetch an Order by ID."""
         return models.Order(self, {'id': id})
 
+    def inventory_upload(self, id):
+        """Fetch an InventoryUpload by ID."""
+        return models.InventoryUpload(self, {'id': id})
+
     def fee_for(self, price, currency='USD'):
         """Calculate the fee for selling an item on the Marketplace."""
         resp = self._get('{0}/marketplace/fee/{1:.4f}/{2}'.format(self._base_url, price, currency))
@@ -229,4 +263,63 @@ class Client:
     def trust_per_page(self, value: bool) -> None:
         if not isinstance(value, bool):
             raise ValueError("trust_per_page must be a bool")
-        self._trust_per_page = value
\ No newline at end of file
+        self._trust_per_page = value
+
+    def priority(self, name):
+        """Make the requests of the current thread belong to a request class
+        of a :class:`~discogs_client.fetchers.SchedulingFetcher`, for use in
+        a ``with`` statement.
+
+        Raises
+        ------
+        ConfigurationError
+            If the client's fetcher does not schedule requests.
+        """
+        use = getattr(self._fetcher, 'use', None)
+        if use is None:
+            raise ConfigurationError('Request classes require a SchedulingFetcher')
+        return use(name)
+
+    @property
+    def save_mode(self) -> str:
+        """How :meth:`~discogs_client.models.PrimaryAPIObject.save` updates
+        an object, ``'refresh'`` (default) or ``'optimistic'``."""
+        return self._save_mode
+
+    @save_mode.setter
+    def save_mode(self, value: str) -> None:
+        if value not in models.SAVE_MODES:
+            raise ValueError("save_mode must be one of 'refresh', 'optimistic'")
+        self._save_mode = value
+
+    def save_all(self, objects, concurrency=4, mode=None):
+        """Save the changes of many objects, several at a time.
+
+        Objects without changes are skipped. An error saving one object does
+        not stop the others from being saved.
+
+        Parameters
+        ----------
+        objects : iterable of PrimaryAPIObject
+        concurrency : int, optional
+            Number of saves in progress at the same time, by default 4.
+        mode : str, optional
+            Save mode, by default :attr:`save_mode`.
+
+        Returns
+        -------
+        list of SaveResult
+            One result per object, in the order of ``objects``.
+        """
+        def save(obj):
+            if not obj.changes:
+                return SaveResult(obj, None)
+            try:
+                obj.save(mode)
+            except Exception as e:
+                return SaveResult(obj, e)
+            return SaveResult(obj, None)
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(save, objects))
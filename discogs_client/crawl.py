@@ -0,0 +1,553 @@
+"""Crawls of the catalog shared by many workers.
+
+A :class:`CrawlQueue` keeps the work in a SQLite file: ranges of IDs to
+request from a URL template such as ``/releases/{id}``, or single URLs.
+Workers lease a unit, report their progress through it and mark it done::
+
+    queue = CrawlQueue('crawl.db')
+    queue.add_range('/releases/{id}', 1, 1000000, size=1000)
+    queue.add_range('/masters/{id}/versions', 1, 100000, size=500)
+
+    # In every worker process, on this or other machines
+    client = Client('ExampleApplication/0.1', user_token='my_user_token')
+    worker = CrawlWorker(client, CrawlQueue('crawl.db'), SQLiteSink('results.db'))
+    worker.run()
+
+Leases expire unless the worker reports progress, so the units of workers
+that died are picked up by others, continuing at the last reported ID. Units
+that fail are retried up to ``max_attempts`` times. When no unit is left, a
+worker steals the second half of the largest range still being worked on.
+
+The queue also holds the rate budget of all workers: every request reserves a
+slot, so that together they stay within the limit of the account, and adding
+workers scales the throughput until it is reached.
+
+SQLite locking needs a local file system. Workers on other machines use a
+:class:`CoordinatorServer` serving the queue over HTTP, through a
+:class:`RemoteQueue`::
+
+    CoordinatorServer(CrawlQueue('crawl.db'), host='0.0.0.0', port=8765).serve_forever()
+
+    worker = CrawlWorker(client, RemoteQueue('http://coordinator:8765'),
+                         JSONLinesSink('results-{0}.jsonl'.format(socket.gethostname())))
+
+Results are written to a sink, a :class:`JSONLinesSink` or a
+:class:`SQLiteSink`. Units can be fetched more than once, after an expired
+lease or a steal, so sinks keyed by URL such as the SQLiteSink keep a single
+copy of every result.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from discogs_client.exceptions import HTTPError, LeaseLostError
+from discogs_client.fetchers import RateLimitedFetcher
+
+
+#: A unit of work. ``url`` is a URL, or for ranges a template with ``{id}``
+#: for the IDs from ``first`` to ``last``; ``position`` is the next ID to
+#: fetch.
+WorkUnit = namedtuple('WorkUnit', ['id', 'url', 'first', 'last', 'position', 'attempts'])
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    first INTEGER,
+    last INTEGER,
+    position INTEGER,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS units_state ON units (state, expires);
+CREATE TABLE IF NOT EXISTS budget (start REAL NOT NULL);
+'''
+UNIT_COLUMNS = 'id, url, first, last, position, attempts'
+
+
+class CrawlQueue:
+    """Work units, their leases and the shared rate budget in a SQLite file.
+
+    Every process opens its own queue on the same file. A queue may be
+    shared by the threads of a process.
+
+    Parameters
+    ----------
+    path : str
+        The database file, created if missing.
+    lease_time : float, optional
+        Seconds a leased unit stays with its worker without progress, by
+        default 300.
+    max_attempts : int, optional
+        Attempts before a failing unit is given up, by default 3.
+    steal_min : int, optional
+        IDs left in a range for its second half to be stolen, by default 100.
+    """
+    def __init__(self, path, lease_time=300.0, max_attempts=3, steal_min=100, clock=time.time):
+        self.path = path
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+        self.steal_min = steal_min
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _transaction(self, func, *args):
+        # BEGIN IMMEDIATE takes the write lock up front, so that two processes
+        # cannot lease the same unit
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(*args)
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+            return result
+
+    def add_range(self, template, first, last, size=1000):
+        """Add the IDs from ``first`` to ``last`` for a URL template with
+        ``{id}``, in units of ``size`` IDs.
+
+        Returns
+        -------
+        int
+            The number of units added.
+        """
+        units = [(template, start, min(start + size - 1, last), start)
+                 for start in range(first, last + 1, size)]
+
+        def add():
+            self._db.executemany(
+                'INSERT INTO units (url, first, last, position) VALUES (?, ?, ?, ?)', units)
+        self._transaction(add)
+        return len(units)
+
+    def add_urls(self, urls):
+        """Add a unit for every URL. Returns the number of units added."""
+        units = [(url,) for url in urls]
+        self._transaction(self._db.executemany, 'INSERT INTO units (url) VALUES (?)', units)
+        return len(units)
+
+    def _unit(self, row):
+        return WorkUnit(*row) if row is not None else None
+
+    def lease(self, worker):
+        """Lease the next unit to a worker.
+
+        Pending units come first, then units whose lease expired. Without
+        either, the second half of the largest range in progress is split
+        off for the worker.
+
+        Returns
+        -------
+        WorkUnit or None
+            None if there is nothing to lease. Units leased to other workers
+            may still come back after failing.
+        """
+        return self._transaction(self._lease, worker)
+
+    def _lease(self, worker):
+        now = self.clock()
+        row = self._db.execute(
+            'SELECT ' + UNIT_COLUMNS + " FROM units WHERE state = 'pending' "
+            "OR (state = 'leased' AND expires < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+        if row is not None:
+            self._db.execute("UPDATE units SET state = 'leased', worker = ?, expires = ? "
+                             "WHERE id = ?", (worker, now + self.lease_time, row[0]))
+            return self._unit(row)
+
+        row = self._db.execute(
+            'SELECT ' + UNIT_COLUMNS + " FROM units WHERE state = 'leased' AND first IS NOT NULL "
+            'AND last - position + 1 >= ? ORDER BY last - position DESC LIMIT 1',
+            (self.steal_min,)).fetchone()
+        if row is None:
+            return None
+        victim = self._unit(row)
+        middle = victim.position + (victim.last - victim.position + 1) // 2
+        self._db.execute('UPDATE units SET last = ? WHERE id = ?', (middle - 1, victim.id))
+        cursor = self._db.execute(
+            "INSERT INTO units (url, first, last, position, state, worker, expires) "
+            "VALUES (?, ?, ?, ?, 'leased', ?, ?)",
+            (victim.url, middle, victim.last, middle, worker, now + self.lease_time))
+        return WorkUnit(cursor.lastrowid, victim.url, middle, victim.last, middle, 0)
+
+    def progress(self, unit, worker, position=None):
+        """Record the progress of a unit and extend its lease.
+
+        Returns
+        -------
+        WorkUnit
+            The unit as stored, with its ``last`` ID lowered if part of the
+            range was stolen.
+
+        Raises
+        ------
+        LeaseLostError
+            If the lease expired and the unit went to another worker.
+        """
+        return self._transaction(self._progress, unit, worker, position)
+
+    def _progress(self, unit, worker, position):
+        row = self._db.execute('SELECT worker, state FROM units WHERE id = ?',
+                               (unit.id,)).fetchone()
+        if row is None or row[0] != worker or row[1] != 'leased':
+            raise LeaseLostError(unit.id)
+        self._db.execute('UPDATE units SET position = COALESCE(?, position), expires = ? '
+                         'WHERE id = ?', (position, self.clock() + self.lease_time, unit.id))
+        return self._unit(self._db.execute(
+            'SELECT ' + UNIT_COLUMNS + ' FROM units WHERE id = ?', (unit.id,)).fetchone())
+
+    def complete(self, unit, worker):
+        """Mark a unit as done."""
+        self._transaction(self._finish, unit, worker, None)
+
+    def fail(self, unit, worker, error):
+        """Record a failed attempt of a unit. It is leased again until it
+        failed ``max_attempts`` times, continuing at its last position."""
+        self._transaction(self._finish, unit, worker, str(error))
+
+    def _finish(self, unit, worker, error):
+        row = self._db.execute('SELECT worker, attempts FROM units WHERE id = ?',
+                               (unit.id,)).fetchone()
+        if row is None or row[0] != worker:
+            return
+        if error is None:
+            self._db.execute("UPDATE units SET state = 'done', expires = NULL WHERE id = ?",
+                             (unit.id,))
+            return
+        attempts = row[1] + 1
+        state = 'pending' if attempts < self.max_attempts else 'failed'
+        self._db.execute('UPDATE units SET state = ?, attempts = ?, error = ?, worker = NULL, '
+                         'expires = NULL WHERE id = ?', (state, attempts, error, unit.id))
+
+    def reserve(self, rate, per):
+        """Reserve a start time for a request within the budget of ``rate``
+        requests per ``per`` seconds shared by all workers.
+
+        Returns
+        -------
+        float
+            Seconds to wait before the request.
+        """
+        return self._transaction(self._reserve, rate, per)
+
+    def _reserve(self, rate, per):
+        now = self.clock()
+        self._db.execute('DELETE FROM budget WHERE start <= ?', (now - per,))
+        starts = [row[0] for row in self._db.execute(
+            'SELECT start FROM budget ORDER BY start DESC LIMIT ?', (rate,))]
+        start = max([now] + starts[:1])
+        if len(starts) >= rate:
+            start = max(start, starts[-1] + per)
+        self._db.execute('INSERT INTO budget (start) VALUES (?)', (start,))
+        return start - now
+
+    def stats(self):
+        """The number of units in every state, ``pending``, ``leased``,
+        ``done`` and ``failed``."""
+        with self._lock:
+            rows = self._db.execute('SELECT state, COUNT(*) FROM units GROUP BY state').fetchall()
+        counts = dict.fromkeys(('pending', 'leased', 'done', 'failed'), 0)
+        counts.update(rows)
+        return counts
+
+    def failures(self):
+        """The units that were given up, with their last error."""
+        with self._lock:
+            rows = self._db.execute('SELECT ' + UNIT_COLUMNS + ", error FROM units "
+                                    "WHERE state = 'failed' ORDER BY id").fetchall()
+        return [(WorkUnit(*row[:-1]), row[-1]) for row in rows]
+
+
+class _CoordinatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Small responses on kept-alive connections, don't wait for more data
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        args = json.loads(self.rfile.read(length) or b'{}')
+        status, body = self.server.coordinator.call(self.path.strip('/'), args)
+        content = json.dumps(body).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CoordinatorServer:
+    """Serves a :class:`CrawlQueue` over HTTP to workers on other machines,
+    which connect with a :class:`RemoteQueue`.
+
+    Parameters
+    ----------
+    queue : CrawlQueue
+    host : str, optional
+        Interface to bind to, by default ``'127.0.0.1'``.
+    port : int, optional
+        Port to bind to, by default 0 (pick a free port).
+    """
+    methods = ('add_range', 'add_urls', 'lease', 'progress', 'complete', 'fail', 'reserve',
+               'stats')
+
+    def __init__(self, queue, host='127.0.0.1', port=0):
+        self.queue = queue
+        self._httpd = ThreadingHTTPServer((host, port), _CoordinatorHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.coordinator = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def call(self, method, args):
+        """Run a queue method for a request, returns the status and body."""
+        if method not in self.methods:
+            return 404, {'message': 'Unknown method {0}'.format(method)}
+        if 'unit' in args:
+            args['unit'] = WorkUnit(*args['unit'])
+        try:
+            result = getattr(self.queue, method)(**args)
+        except LeaseLostError as e:
+            return 409, {'message': str(e)}
+        return 200, {'result': result}
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class RemoteQueue:
+    """A :class:`CrawlQueue` served by a :class:`CoordinatorServer`."""
+    def __init__(self, url, timeout=30.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _call(self, method, **args):
+        resp = self._session.post('{0}/{1}'.format(self.url, method), json=args,
+                                  timeout=self.timeout)
+        body = resp.json()
+        if resp.status_code == 409:
+            raise LeaseLostError(args['unit'][0])
+        if resp.status_code != 200:
+            raise HTTPError(body['message'], resp.status_code)
+        return body['result']
+
+    def add_range(self, template, first, last, size=1000):
+        return self._call('add_range', template=template, first=first, last=last, size=size)
+
+    def add_urls(self, urls):
+        return self._call('add_urls', urls=list(urls))
+
+    def lease(self, worker):
+        unit = self._call('lease', worker=worker)
+        return WorkUnit(*unit) if unit is not None else None
+
+    def progress(self, unit, worker, position=None):
+        return WorkUnit(*self._call('progress', unit=unit, worker=worker, position=position))
+
+    def complete(self, unit, worker):
+        self._call('complete', unit=unit, worker=worker)
+
+    def fail(self, unit, worker, error):
+        self._call('fail', unit=unit, worker=worker, error=str(error))
+
+    def reserve(self, rate, per):
+        return self._call('reserve', rate=rate, per=per)
+
+    def stats(self):
+        return self._call('stats')
+
+    def close(self):
+        self._session.close()
+
+
+class JSONLinesSink:
+    """Appends results to a JSON Lines file, a line with the ``url`` and
+    ``data`` of every response."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf8')
+
+    def write(self, url, data):
+        line = json.dumps({'url': url, 'data': data}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SQLiteSink:
+    """Keeps results in a SQLite table ``results`` with a row per URL, so
+    that repeated fetches replace earlier results."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS results '
+                         '(url TEXT PRIMARY KEY, data TEXT NOT NULL, fetched REAL NOT NULL)')
+
+    def write(self, url, data):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                             (url, json.dumps(data, ensure_ascii=False), time.time()))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def get(self, url):
+        """The result for a URL, or None."""
+        with self._lock:
+            row = self._db.execute('SELECT data FROM results WHERE url = ?', (url,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def close(self):
+        self._db.close()
+
+
+class CrawlWorker:
+    """Leases units from a queue, fetches them with a client and writes the
+    results to a sink.
+
+    The client's fetcher is wrapped in a :class:`.RateLimitedFetcher` taking
+    its slots from the budget of the queue. IDs that don't exist (404) are
+    skipped, other errors fail the unit. Paginated responses are followed to
+    their last page, writing every page.
+
+    Parameters
+    ----------
+    client : Client
+    queue : CrawlQueue or RemoteQueue
+    sink : JSONLinesSink or SQLiteSink
+    name : str, optional
+        Name of the worker in the leases, by default a random one.
+    concurrency : int, optional
+        Requests in progress at the same time, by default 4.
+    rate : int, optional
+        Requests per ``per`` seconds allowed for all workers together, by
+        default 60, or None to not limit requests.
+    per : float, optional
+        Length of the rate limit window in seconds, by default 60.
+    """
+    def __init__(self, client, queue, sink, name=None, concurrency=4, rate=60, per=60.0):
+        self.client = client
+        self.queue = queue
+        self.sink = sink
+        self.name = name or uuid.uuid4().hex[:12]
+        self.concurrency = concurrency
+        if rate is not None:
+            client._fetcher = RateLimitedFetcher(client._fetcher, rate=rate, per=per, budget=queue)
+        self.fetched = 0
+        self.missing = 0
+        self.failed = 0
+
+    def _absolute(self, url):
+        return self.client._base_url + url if url.startswith('/') else url
+
+    def fetch(self, url):
+        """Fetch a URL and all further pages, write them to the sink.
+
+        Returns
+        -------
+        bool
+            False if the URL does not exist.
+        """
+        while url:
+            url = self._absolute(url)
+            try:
+                data = self.client._get(url)
+            except HTTPError as e:
+                if e.status_code == 404:
+                    self.missing += 1
+                    return False
+                raise
+            self.sink.write(url, data)
+            self.fetched += 1
+            pagination = data.get('pagination') if isinstance(data, dict) else None
+            url = pagination.get('urls', {}).get('next') if pagination else None
+        return True
+
+    def process(self, unit, executor):
+        """Work through a unit, reporting the progress after every batch of
+        IDs."""
+        if unit.first is None:
+            self.fetch(unit.url)
+            return
+        batch = 2 * self.concurrency
+        position = unit.position
+        while position <= unit.last:
+            ids = range(position, min(position + batch, unit.last + 1))
+            list(executor.map(self.fetch, [unit.url.format(id=id_) for id_ in ids]))
+            position = ids[-1] + 1
+            # Lowers unit.last if the rest of the range was stolen
+            unit = self.queue.progress(unit, self.name, position)
+
+    def run(self, max_units=None):
+        """Work on units until the queue is empty, or for ``max_units``.
+
+        Returns
+        -------
+        int
+            The number of units done.
+        """
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while max_units is None or done < max_units:
+                unit = self.queue.lease(self.name)
+                if unit is None:
+                    break
+                try:
+                    self.process(unit, executor)
+                except LeaseLostError:
+                    continue
+                except (HTTPError, requests.RequestException) as e:
+                    self.failed += 1
+                    self.queue.fail(unit, self.name, e)
+                    continue
+                self.queue.complete(unit, self.name)
+                done += 1
+        return done
@@ -42,3 +42,14 @@ class AuthorizationError(HTTPError):
     def __init__(self, message, code, response):
         super(AuthorizationError, self).__init__(message, code)
         self.msg = '{0} Response: {1!r}'.format(self.msg, response)
+
+
+class LeaseLostError(DiscogsAPIError):
+    """A crawl worker's lease on a work unit expired and the unit went to
+    another worker."""
+    def __init__(self, unit_id):
+        self.unit_id = unit_id
+        self.msg = 'Lease on work unit {0} was lost'.format(unit_id)
+
+    def __str__(self):
+        return self.msg
@@ -0,0 +1,291 @@
+"""Streaming export of paginated lists to files.
+
+:meth:`.BasePaginatedResponse.export` writes every item of a list to a JSON
+Lines, JSON, CSV or Parquet file. Pages are requested by a background thread while
+the previous page is written, and the items are written as the raw dicts of
+the API responses, so neither model objects nor cached pages build up::
+
+    me.collection_folders[0].releases.export(
+        'collection.csv', fields=['id', 'basic_information.title', 'date_added'])
+
+``fields`` selects the values to write. A dotted name such as
+``basic_information.title`` picks a value nested in dicts. Without ``fields``
+the items are written as they are to JSON Lines and JSON, while CSV and
+Parquet get the keys of the first item as columns, with nested values encoded
+as JSON. The types of the Parquet columns are those of the values of the first
+page; columns without a value on it are strings.
+
+Writing Parquet requires pyarrow.
+"""
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+from collections import deque
+
+
+EXTENSIONS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json', '.csv': 'csv',
+              '.parquet': 'parquet'}
+
+
+def project(item, fields):
+    """Pick the values of fields from a raw item dict.
+
+    Dotted field names pick values from nested dicts. Missing values are None.
+    """
+    row = {}
+    for field in fields:
+        value = item
+        for key in field.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        row[field] = value
+    return row
+
+
+def _flat(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def iter_pages(paginated, prefetch=2, start=1, concurrency=1):
+    """Yield the raw items of every page of a list from page ``start`` on,
+    fetching the following pages in the background, ``concurrency`` pages
+    at the same time.
+
+    The pages are not cached in the list.
+    """
+    first = paginated._fetch_page(start)
+    num_pages = first.get('pagination', {}).get('pages', 1)
+    yield first[paginated._list_key]
+    if num_pages <= start:
+        return
+
+    pages = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def fetch_page(index):
+        return paginated._fetch_page(index)[paginated._list_key]
+
+    def fetch():
+        from concurrent.futures import ThreadPoolExecutor
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                pending = deque()
+                for index in range(start + 1, num_pages + 1):
+                    if stop.is_set():
+                        break
+                    pending.append(executor.submit(fetch_page, index))
+                    if len(pending) >= concurrency:
+                        pages.put(pending.popleft().result())
+                while pending and not stop.is_set():
+                    pages.put(pending.popleft().result())
+        except BaseException as e:
+            pages.put(e)
+
+    thread = threading.Thread(target=fetch, daemon=True)
+    thread.start()
+    try:
+        for _ in range(start + 1, num_pages + 1):
+            page = pages.get()
+            if isinstance(page, BaseException):
+                raise page
+            yield page
+    finally:
+        stop.set()
+        # Unblock the fetching thread if it waits for room in the queue
+        while thread.is_alive():
+            try:
+                pages.get_nowait()
+            except queue.Empty:
+                thread.join(0.01)
+
+
+class _Writer:
+    def __init__(self, f, fields, append=False):
+        self.check(append)
+        self.f = f
+        self.fields = fields
+        self.append = append
+
+    @classmethod
+    def check(cls, append=False):
+        """Raise the errors of creating a writer, before its file is opened."""
+
+    def close(self):
+        pass
+
+
+class _JSONLinesWriter(_Writer):
+    def _dumps(self, item):
+        if self.fields is not None:
+            item = project(item, self.fields)
+        return json.dumps(item, ensure_ascii=False)
+
+    def write(self, items):
+        for item in items:
+            self.f.write(self._dumps(item))
+            self.f.write('\n')
+
+
+class _JSONWriter(_JSONLinesWriter):
+    """Writes a JSON array, with an item per line."""
+    count = 0
+
+    @classmethod
+    def check(cls, append=False):
+        if append:
+            raise ValueError('JSON files cannot be appended to, use JSON Lines')
+
+    def write(self, items):
+        for item in items:
+            self.f.write(',\n' if self.count else '[\n')
+            self.f.write(self._dumps(item))
+            self.count += 1
+
+    def close(self):
+        self.f.write('\n]\n' if self.count else '[]\n')
+
+
+class _CSVWriter(_Writer):
+    writer = None
+
+    def write(self, items):
+        if not items:
+            return
+        if self.writer is None:
+            if self.fields is None:
+                self.fields = list(items[0])
+            self.writer = csv.DictWriter(self.f, self.fields, extrasaction='ignore',
+                                         lineterminator='\n')
+            if not self.append:
+                self.writer.writeheader()
+        for item in items:
+            row = project(item, self.fields)
+            self.writer.writerow({k: _flat(v) for k, v in row.items()})
+
+
+class _ParquetWriter(_Writer):
+    writer = None
+
+    def __init__(self, f, fields, append=False):
+        super().__init__(f, fields, append)
+        self.pyarrow, self.parquet = self._import()
+        self.strings = ()
+
+    @staticmethod
+    def _import():
+        try:
+            import pyarrow
+            from pyarrow import parquet
+        except ImportError as e:
+            raise ImportError('Exporting to Parquet requires pyarrow') from e
+        return pyarrow, parquet
+
+    @classmethod
+    def check(cls, append=False):
+        if append:
+            raise ValueError('Parquet files cannot be appended to')
+        cls._import()
+
+    def _schema(self, rows):
+        """The schema of the file, with the types of the values of the first
+        page; columns without a value on it are strings."""
+        pa = self.pyarrow
+        return pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type)
+                          else field for field in pa.Table.from_pylist(rows).schema])
+
+    def write(self, items):
+        if not items:
+            return
+        if self.fields is None:
+            self.fields = list(items[0])
+        rows = [{k: _flat(v) for k, v in project(item, self.fields).items()}
+                for item in items]
+        if self.writer is None:
+            schema = self._schema(rows)
+            self.strings = [field.name for field in schema
+                            if self.pyarrow.types.is_string(field.type)]
+            self.writer = self.parquet.ParquetWriter(self.f, schema)
+        for row in rows:
+            for name in self.strings:
+                value = row[name]
+                if value is not None and not isinstance(value, str):
+                    row[name] = json.dumps(value)
+        self.writer.write_table(self.pyarrow.Table.from_pylist(rows, schema=self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {'jsonl': _JSONLinesWriter, 'json': _JSONWriter, 'csv': _CSVWriter,
+           'parquet': _ParquetWriter}
+
+
+def guess_format(path, format=None):
+    """Check ``format``, or derive it from the extension of ``path``; JSON
+    Lines if unknown."""
+    if format is None:
+        name = path if isinstance(path, str) else getattr(path, 'name', '')
+        format = EXTENSIONS.get(os.path.splitext(str(name))[1].lower(), 'jsonl')
+    if format not in WRITERS:
+        raise ValueError("format must be one of 'jsonl', 'json', 'csv', 'parquet'")
+    return format
+
+
+def open_output(path, format, append=False):
+    """Open the file to write for a path, ``'-'`` or a file object.
+
+    Returns the file and whether the caller has to close it.
+    """
+    if path == '-':
+        return (sys.stdout.buffer if format == 'parquet' else sys.stdout), False
+    if not isinstance(path, str):
+        return path, False
+    if format == 'parquet':
+        return open(path, 'ab' if append else 'wb'), True
+    return open(path, 'a' if append else 'w', encoding='utf8', newline=''), True
+
+
+def export(paginated, path, format=None, fields=None, prefetch=2):
+    """Write every item of a paginated list to a file.
+
+    Parameters
+    ----------
+    paginated : BasePaginatedResponse
+        The list to export, with its ``per_page``, sort and filters.
+    path : str or file object
+        Path of the file to write, ``'-'`` for standard output, or an open
+        file; a text file for JSON Lines, JSON and CSV, a binary one for
+        Parquet.
+    format : str, optional
+        ``'jsonl'``, ``'json'``, ``'csv'`` or ``'parquet'``, by default derived
+        from the extension of ``path``: ``.jsonl`` and ``.ndjson`` are JSON
+        Lines, ``.json`` is a JSON array.
+    fields : list of str, optional
+        Values to write for each item, see :func:`project`.
+    prefetch : int, optional
+        Pages fetched ahead of the one being written, by default 2.
+
+    Returns
+    -------
+    int
+        The number of items written.
+    """
+    format = guess_format(path, format)
+    WRITERS[format].check()
+    f, close = open_output(path, format)
+    count = 0
+    try:
+        writer = WRITERS[format](f, fields)
+        for items in iter_pages(paginated, prefetch):
+            writer.write(items)
+            count += len(items)
+        writer.close()
+    finally:
+        if close:
+            f.close()
+    return count
@@ -1,23 +1,69 @@
-from requests.api import request
-from oauthlib import oauth1
+import copy
 import json
+import mmap
 import os
-import re
-from discogs_client.utils import backoff
+import random
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from discogs_client.utils import backoff, canonical_url
 from urllib.parse import parse_qsl
 from typing import Union
 
 
-class Fetcher:
+RATE_LIMIT_HEADERS = (
+    ('rate_limit', 'X-Discogs-Ratelimit'),
+    ('rate_limit_used', 'X-Discogs-Ratelimit-Used'),
+    ('rate_limit_remaining', 'X-Discogs-Ratelimit-Remaining'),
+)
+
+#: The rate limit headers of one response
+RateLimit = namedtuple('RateLimit', [attr for attr, _ in RATE_LIMIT_HEADERS])
+
+
+class _TransientState:
+    """Leaves the attributes named in ``_transient``, such as locks,
+    sessions and open files, out when an object is pickled or copied, and
+    creates them again with ``_restore``."""
+    _transient = ()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._transient:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._restore()
+
+    def _restore(self):
+        """Create the transient attributes of an unpickled or copied object."""
+
+
+class Fetcher(_TransientState):
     """
     Base class for Fetchers, which wrap and normalize the APIs of various HTTP
     libraries.
 
     (It's a slightly leaky abstraction designed to make testing easier.)
+
+    Fetchers can be shared between threads. Every thread sends its requests
+    through a ``requests.Session`` of its own, so connections are reused
+    without threads waiting for each other.
+
+    ``requests`` and ``oauthlib`` are imported once they are needed, so that
+    importing the package stays fast.
     """
     backoff_enabled = True
     connect_timeout: Union[float, int, None] = None
     read_timeout: Union[float, int, None] = None
+    #: Rate limit headers of the last response, set all at once so that
+    #: they belong to the same response when threads share the fetcher
+    rate_limit_info = RateLimit(None, None, None)
+    #: The per-thread sessions are created again once needed
+    _transient = ('_local',)
 
     def fetch(self, client, method, url, data=None, headers=None, json=True):
         """Fetch the given request
@@ -52,9 +98,27 @@ class Fetcher:
         """
         raise NotImplementedError()
 
+    @property
+    def session(self):
+        """The ``requests.Session`` of the calling thread."""
+        local = self.__dict__.get('_local')
+        if local is None:
+            local = self.__dict__.setdefault('_local', threading.local())
+        session = getattr(local, 'session', None)
+        if session is None:
+            from requests import Session
+            session = local.session = Session()
+        return session
+
+    def store_rate_limit(self, headers):
+        """Keep the rate limit headers of a response."""
+        info = RateLimit(*(headers.get(header) for _, header in RATE_LIMIT_HEADERS))
+        self.rate_limit_info = info
+        self.rate_limit, self.rate_limit_used, self.rate_limit_remaining = info
+
     @backoff
     def request(self, method, url, data, headers, params=None):
-        return request(
+        return self.session.request(
             method=method, url=url, data=data,
             headers=headers, params=params,
             timeout=(self.connect_timeout, self.read_timeout)
@@ -105,12 +169,7 @@ class RequestsFetcher(Fetcher):
             as returned by Python "Requests"
         """
         resp = self.request(method, url, data=data, headers=headers)
-        self.rate_limit = resp.headers.get(
-                'X-Discogs-Ratelimit')
-        self.rate_limit_used = resp.headers.get(
-                'X-Discogs-Ratelimit-Used')
-        self.rate_limit_remaining = resp.headers.get(
-                'X-Discogs-Ratelimit-Remaining')
+        self.store_rate_limit(resp.headers)
         return resp.content, resp.status_code
 
 
@@ -149,21 +208,27 @@ class UserTokenRequestsFetcher(Fetcher):
         resp = self.request(
             method, url, data=data, headers=headers, params={'token':self.user_token}
         )
-        self.rate_limit = resp.headers.get(
-                'X-Discogs-Ratelimit')
-        self.rate_limit_used = resp.headers.get(
-                'X-Discogs-Ratelimit-Used')
-        self.rate_limit_remaining = resp.headers.get(
-                'X-Discogs-Ratelimit-Remaining')
+        self.store_rate_limit(resp.headers)
         return resp.content, resp.status_code
 
 
 class OAuth2Fetcher(Fetcher):
-    """Fetches via HTTP + OAuth 1.0a from the Discogs API."""
+    """Fetches via HTTP + OAuth 1.0a from the Discogs API.
+
+    Requests are signed by an :class:`.OAuthSigner` for the current
+    ``client``, which is built again whenever the client is replaced.
+    """
     def __init__(self, consumer_key, consumer_secret, token=None, secret=None):
+        from oauthlib import oauth1
         self.client = oauth1.Client(consumer_key, client_secret=consumer_secret)
+        self._signer = None
         self.store_token(token, secret)
 
+    _transient = Fetcher._transient + ('_signer',)
+
+    def _restore(self):
+        self._signer = None
+
     def store_token_from_qs(self, query_string):
         token_dict = dict(parse_qsl(query_string))
         token = token_dict[b'oauth_token'].decode('utf-8')
@@ -174,12 +239,29 @@ class OAuth2Fetcher(Fetcher):
     def forget_token(self):
         self.store_token(None, None)
 
+    def _update_client(self, **settings):
+        # Requests in other threads may be signing with the current client,
+        # so changes go to a copy that replaces it
+        client = copy.copy(self.client)
+        for name, value in settings.items():
+            setattr(client, name, value)
+        self.client = client
+
     def store_token(self, token, secret):
-        self.client.resource_owner_key = token
-        self.client.resource_owner_secret = secret
+        self._update_client(resource_owner_key=token, resource_owner_secret=secret)
 
     def set_verifier(self, verifier):
-        self.client.verifier = verifier
+        self._update_client(verifier=verifier)
+
+    @property
+    def signer(self):
+        """The :class:`.OAuthSigner` of the current client."""
+        client = self.client
+        signer = self._signer
+        if signer is None or signer.client is not client:
+            from discogs_client.oauth import OAuthSigner
+            signer = self._signer = OAuthSigner(client)
+        return signer
 
     def fetch(self, client, method, url, data=None, headers=None, json_format=True):
         """Fetch the given request on the user's behalf
@@ -208,26 +290,137 @@ class OAuth2Fetcher(Fetcher):
             as returned by Python "Requests"
         """
         body = json.dumps(data) if json_format and data else data
-        uri, headers, body = self.client.sign(url, http_method=method,
+        uri, headers, body = self.signer.sign(url, http_method=method,
                                               body=body, headers=headers)
 
         resp = self.request(method, url, data=body, headers=headers)
-        self.rate_limit = resp.headers.get(
-                'X-Discogs-Ratelimit')
-        self.rate_limit_used = resp.headers.get(
-                'X-Discogs-Ratelimit-Used')
-        self.rate_limit_remaining = resp.headers.get(
-                'X-Discogs-Ratelimit-Remaining')
+        self.store_rate_limit(resp.headers)
         return resp.content, resp.status_code
 
 
 class FilesystemFetcher(Fetcher):
-    """Fetches from a directory of files."""
+    """Fetches from a directory of files.
+
+    The directory is indexed once when the fetcher is created. Requests are
+    looked up by their path and their set of query parameters, so the order
+    of the parameters in the URL does not matter and a lookup costs a single
+    dict access, however many files there are.
+
+    Parameters
+    ----------
+    base_path : str
+        The directory to serve files from.
+    watch : bool, optional
+        Pick up files that were added, removed or changed after the fetcher
+        was created, by default False. This costs a few ``stat`` calls per
+        request.
+    use_mmap : bool, optional
+        Keep the most recently requested files memory-mapped, so repeated
+        requests for them are answered without opening and reading them
+        again, by default False. At most ``max_maps`` files are kept mapped
+        at a time, and so open.
+    """
     default_response = json.dumps({'message': 'Resource not found.'}), 404
-    path_with_params = re.compile(r'(?P<dir>(\w+/)+)(?P<query>\w+)\?(?P<params>.*)')
+    #: Files kept memory-mapped with ``use_mmap``
+    max_maps = 128
 
-    def __init__(self, base_path):
+    def __init__(self, base_path, watch=False, use_mmap=False):
         self.base_path = base_path
+        self.watch = watch
+        self.use_mmap = use_mmap
+        self._maps = OrderedDict()
+        self._maps_lock = threading.Lock()
+        self.build_index()
+
+    _transient = Fetcher._transient + ('_maps', '_maps_lock')
+
+    def _restore(self):
+        self._maps = OrderedDict()
+        self._maps_lock = threading.Lock()
+
+    @staticmethod
+    def _canonical(name, ext=''):
+        """Split a request path into its canonical index key."""
+        path, _, query = name.partition('?')
+        return path, tuple(sorted(query.split('&'))) if query else (), ext
+
+    def _index_file(self, index, name, ext, path):
+        index.setdefault(self._canonical(name, ext), path)
+        # '?' is illegal in file names on Windows, so query strings are stored
+        # behind a '_'. Endpoints and parameter names may contain '_' as well,
+        # so index every possible split.
+        query_start = name.rfind('/') + 1
+        first_param = name.find('=', query_start)
+        if first_param == -1:
+            return
+        split = name.find('_', query_start, first_param)
+        while split != -1:
+            index.setdefault(self._canonical(name[:split] + '?' + name[split + 1:], ext), path)
+            split = name.find('_', split + 1, first_param)
+
+    def build_index(self):
+        """(Re)build the index of all files below ``base_path``."""
+        index = {}
+        dir_mtimes = {}
+        for dirpath, dirnames, filenames in os.walk(self.base_path):
+            dir_mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+            rel_dir = os.path.relpath(dirpath, self.base_path).replace(os.sep, '/')
+            prefix = '' if rel_dir == '.' else rel_dir + '/'
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = prefix + filename
+                self._index_file(index, name, '', path)
+                if name.endswith('.json'):
+                    self._index_file(index, name[:-len('.json')], '.json', path)
+        self._index = index
+        self._dir_mtimes = dir_mtimes
+
+    def _index_is_stale(self):
+        for dirpath, mtime in self._dir_mtimes.items():
+            try:
+                if os.stat(dirpath).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _read(self, path):
+        if not self.use_mmap:
+            with open(path, 'rb') as f:
+                return f.read()
+
+        version = None
+        if self.watch:
+            stat = os.stat(path)
+            version = stat.st_mtime_ns, stat.st_size
+        with self._maps_lock:
+            cached = self._maps.get(path)
+            if cached is not None and (version is None or version == cached[1]):
+                self._maps.move_to_end(path)
+                return cached[0][:]
+
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                return b''
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        content = mapped[:]
+        with self._maps_lock:
+            replaced = self._maps.pop(path, None)
+            self._maps[path] = mapped, (stat.st_mtime_ns, stat.st_size)
+            # Close the maps dropped under the lock, so that no other thread
+            # is still reading them
+            if replaced is not None:
+                replaced[0].close()
+            while len(self._maps) > self.max_maps:
+                self._maps.popitem(last=False)[1][0].close()
+        return content
+
+    def close(self):
+        """Close the files kept memory-mapped."""
+        with self._maps_lock:
+            while self._maps:
+                self._maps.popitem()[1][0].close()
 
     def fetch(self, client, method, url, data=None, headers=None, json=True):
         """Fetch the given request
@@ -253,61 +446,23 @@ class FilesystemFetcher(Fetcher):
         """
         url = url.replace(client._base_url, '')
 
-        if json:
-            base_name = ''.join((url[1:], '.json'))
-        else:
-            base_name = url[1:]
-
-        path = os.path.join(self.base_path, base_name)
+        key = self._canonical(url[1:], '.json' if json else '')
 
-        # The exact path might not exist, but check for files with different
-        # permutations of query parameters.
-        if not os.path.exists(path):
-            base_name = self.check_alternate_params(base_name, json)
-            path = os.path.join(self.base_path, base_name)
+        path = self._index.get(key)
+        if path is None and self.watch and self._index_is_stale():
+            self.build_index()
+            path = self._index.get(key)
 
+        if path is None:
+            return self.default_response
         try:
-            path = path.replace('?', '_')  # '?' is illegal in file names on Windows
-            with open(path, 'r') as f:
-                content = f.read().encode('utf8')  # return bytes not unicode
-            return content, 200
-        except:
+            return self._read(path), 200
+        except FileNotFoundError:
+            # Removed since the index was built
+            if self.watch:
+                self.build_index()
             return self.default_response
 
-    def check_alternate_params(self, base_name, json):
-        """
-        parse_qs() result is non-deterministic - a different file might be
-        requested, making the tests fail randomly, depending on the order of parameters in the query.
-        This fixes it by checking for matching file names with a different permutations of the parameters.
-        """
-        match = self.path_with_params.match(base_name)
-
-        # No parameters in query - no match. Nothing to do.
-        if not match:
-            return base_name
-
-        ext = '.json' if json else ''
-
-        # The base name consists of one or more path elements (directories),
-        # a query (discogs.com endpoint), query parameters, and possibly an extension like 'json'.
-        # Extract these.
-        base_dir = os.path.join(self.base_path, match.group('dir'))
-        query = match.group('query')  # we'll need this to only check relevant filenames
-        params_str = match.group('params')[:-len(ext)]  # strip extension if any
-        params = set(params_str.split('&'))
-
-        # List files that match the same query, possibly with different parameters
-        filenames = [f for f in os.listdir(base_dir) if f.startswith(query)]
-        for f in filenames:
-            # Strip the query, the '?' sign (or its replacement) and the extension, if any
-            params2_str = f[len(query) + 1:-len(ext)]
-            params2 = set(params2_str.split('&'))
-            if params == params2:
-                return base_name.replace(params_str, params2_str)
-
-        # No matching alternatives found - revert to original.
-        return base_name
-
 
 class MemoryFetcher(Fetcher):
     """Fetches from a dict of URL -> (content, status_code)."""
@@ -340,3 +495,625 @@ class MemoryFetcher(Fetcher):
         status_code : int
         """
         return self.responses.get(url, self.default_response)
+
+
+class FetcherWrapper(_TransientState):
+    """Base class for fetchers that wrap another fetcher.
+
+    Settings, token handling and rate limit information are those of the
+    wrapped fetcher, kept in the attribute named by ``_wrapped``.
+    """
+    #: Attribute holding the wrapped fetcher, which may be None
+    _wrapped = 'fetcher'
+    #: Settings that are passed on to the wrapped fetcher when set
+    _settings = ('backoff_enabled', 'connect_timeout', 'read_timeout')
+
+    def __getattr__(self, name):
+        if name == self._wrapped:
+            raise AttributeError(name)
+        wrapped = getattr(self, self._wrapped)
+        if wrapped is None:
+            raise AttributeError(name)
+        return getattr(wrapped, name)
+
+    def __setattr__(self, name, value):
+        if name in self._settings:
+            wrapped = getattr(self, self._wrapped)
+            if wrapped is not None:
+                setattr(wrapped, name, value)
+        else:
+            super().__setattr__(name, value)
+
+
+CASSETTE_MAGIC = b'DISCOGS-CASSETTE 1\n'
+
+
+class RecordingFetcher(FetcherWrapper):
+    """Wraps a fetcher and records all its responses to a cassette file.
+
+    A cassette is a single file of request/response records, each a JSON
+    header line followed by the raw response body. The header holds the
+    method, the canonical URL, the status code and the rate limit headers.
+    Records are appended as they come in, so an interrupted session can be
+    replayed up to the last complete request with a :class:`ReplayFetcher`.
+
+    Parameters
+    ----------
+    fetcher : Fetcher
+        The fetcher doing the actual requests.
+    path : str
+        The cassette file. Records are appended if it already exists.
+    """
+    def __init__(self, fetcher, path):
+        self.fetcher = fetcher
+        self.path = path
+        self._restore()
+
+    _transient = ('_lock', '_file')
+
+    def _restore(self):
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(CASSETTE_MAGIC)
+
+    def close(self):
+        self._file.close()
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        """Fetch the given request with the wrapped fetcher and record the
+        response.
+
+        Returns
+        -------
+        content : bytes
+        status_code : int
+        """
+        content, status_code = self.fetcher.fetch(client, method, url, data, headers, json)
+        if isinstance(content, str):
+            content = content.encode('utf8')
+        self.record(method, url, content, status_code)
+        return content, status_code
+
+    def record(self, method, url, content, status_code):
+        """Append a record to the cassette."""
+        # The headers of one response, even if other threads share the fetcher
+        info = getattr(self.fetcher, 'rate_limit_info', None) or RateLimit(None, None, None)
+        header = {
+            'method': method,
+            'url': canonical_url(url),
+            'status': status_code,
+            'headers': {
+                header: str(value) for (_, header), value in zip(RATE_LIMIT_HEADERS, info)
+                if value is not None
+            },
+            'length': len(content),
+        }
+        line = json.dumps(header, separators=(',', ':')).encode('utf8')
+        with self._lock:
+            self._file.write(line + b'\n' + content + b'\n')
+            self._file.flush()
+
+
+class RateLimitedFetcher(FetcherWrapper):
+    """Wraps a fetcher and spaces out its requests to stay within a rate limit.
+
+    No more than ``rate`` requests are started in any ``per`` seconds, also
+    when the fetcher is shared between threads. Requests over the limit wait
+    for their turn, in the order they came in.
+
+    Parameters
+    ----------
+    fetcher : Fetcher
+        The fetcher doing the actual requests.
+    rate : int, optional
+        Requests allowed per ``per`` seconds, by default 60 (the limit of the
+        API for authenticated requests).
+    per : float, optional
+        Length of the moving window in seconds, by default 60.
+    budget : object, optional
+        Keeps the start times instead of this fetcher, to share the limit
+        with other processes, such as a :class:`.CrawlQueue`. Its
+        ``reserve(rate, per)`` returns the seconds to wait.
+    """
+    def __init__(self, fetcher, rate=60, per=60.0, budget=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.fetcher = fetcher
+        self.rate = rate
+        self.per = per
+        self.budget = budget
+        self.clock = clock
+        self.sleep = sleep
+        self.waited = 0.0
+        self._starts = deque()
+        self._lock = threading.Lock()
+
+    _transient = ('_lock',)
+
+    def _restore(self):
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Reserve the next free start time, return the seconds until then."""
+        if self.budget is not None:
+            return self.budget.reserve(self.rate, self.per)
+        with self._lock:
+            now = self.clock()
+            while self._starts and self._starts[0] <= now - self.per:
+                self._starts.popleft()
+            start = max(now, self._starts[-1]) if self._starts else now
+            if len(self._starts) >= self.rate:
+                start = max(start, self._starts[-self.rate] + self.per)
+            self._starts.append(start)
+            return start - now
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        """Wait for a free slot, then fetch the given request with the wrapped
+        fetcher.
+
+        Returns
+        -------
+        content : bytes
+        status_code : int
+        """
+        delay = self._reserve()
+        if delay > 0:
+            with self._lock:
+                self.waited += delay
+            self.sleep(delay)
+        return self.fetcher.fetch(client, method, url, data, headers, json)
+
+
+class _Ticket:
+    __slots__ = ('seq', 'name', 'queued')
+
+    def __init__(self, seq, name, queued):
+        self.seq = seq
+        self.name = name
+        self.queued = queued
+
+
+class SchedulingFetcher(FetcherWrapper):
+    """Wraps a fetcher and schedules its requests by priority class within
+    one rate limit.
+
+    Every request belongs to a class, chosen per thread with :meth:`use`.
+    When a slot in the rate limit frees up, it goes to the waiting request of
+    the class with the lowest priority number, so interactive requests jump
+    ahead of queued background work, which takes whatever quota is left.
+    Classes of equal priority share the slots in proportion to their weights
+    (weighted fair queuing). Within a class, requests go first come, first
+    served.
+
+    Parameters
+    ----------
+    fetcher : Fetcher
+        The fetcher doing the actual requests.
+    rate : int, optional
+        Requests allowed per ``per`` seconds, by default 60.
+    per : float, optional
+        Length of the moving window in seconds, by default 60.
+    classes : dict, optional
+        Priority of every class by name, lower goes first, by default
+        ``{'interactive': 0, 'default': 1, 'background': 2}``.
+    weights : dict, optional
+        Weights of classes sharing a priority, by default 1 each.
+    default : str, optional
+        Class of threads that didn't choose one, by default ``'default'``.
+    max_concurrency : int, optional
+        Requests in progress at the same time, by default unlimited.
+
+    Examples
+    --------
+    >>> client._fetcher = SchedulingFetcher(client._fetcher)
+    >>> with client.priority('background'):
+    ...     for item in me.inventory:
+    ...         pass
+    """
+    classes = {'interactive': 0, 'default': 1, 'background': 2}
+
+    def __init__(self, fetcher, rate=60, per=60.0, classes=None, weights=None,
+                 default='default', max_concurrency=None):
+        if classes is not None:
+            self.classes = dict(classes)
+        if default not in self.classes:
+            raise ValueError('Unknown request class {0!r}'.format(default))
+        self.fetcher = fetcher
+        self.rate = rate
+        self.per = per
+        self.weights = dict.fromkeys(self.classes, 1.0)
+        self.weights.update(weights or {})
+        self.default = default
+        self.max_concurrency = max_concurrency
+        self._restore()
+        self._queues = {name: deque() for name in self.classes}
+        self._finish = dict.fromkeys(self.classes, 0.0)  # virtual finish times
+        self._virtual_time = 0.0
+        self._starts = deque()
+        self._in_flight = 0
+        self._seq = 0
+        self._stats = {name: {'queued': 0, 'max_queued': 0, 'requests': 0, 'wait': 0.0,
+                              'max_wait': 0.0} for name in self.classes}
+
+    _transient = ('_local', '_cond')
+
+    def _restore(self):
+        self._local = threading.local()
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def use(self, name):
+        """Make the requests of the current thread belong to a class."""
+        if name not in self.classes:
+            raise ValueError('Unknown request class {0!r}'.format(name))
+        previous = getattr(self._local, 'name', None)
+        self._local.name = name
+        try:
+            yield self
+        finally:
+            self._local.name = previous
+
+    @property
+    def current(self):
+        """The class of the current thread's requests."""
+        return getattr(self._local, 'name', None) or self.default
+
+    def stats(self):
+        """Queue depth and wait times per class.
+
+        Returns
+        -------
+        dict
+            For every class, the requests ``queued`` now, ``max_queued``, the
+            ``requests`` sent, and their total and maximum ``wait`` in seconds
+            as ``wait`` and ``max_wait``, and ``mean_wait``.
+        """
+        with self._cond:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+        for values in stats.values():
+            values['mean_wait'] = values['wait'] / values['requests'] if values['requests'] else 0.0
+        return stats
+
+    def _next(self):
+        """The ticket to serve next."""
+        best = None
+        for name, queue in self._queues.items():
+            if not queue:
+                continue
+            key = (self.classes[name], self._finish[name] + 1 / self.weights[name], queue[0].seq)
+            if best is None or key < best[0]:
+                best = (key, queue[0])
+        return best[1] if best is not None else None
+
+    def _delay(self, now):
+        """Seconds until the rate limit allows another request."""
+        while self._starts and self._starts[0] <= now - self.per:
+            self._starts.popleft()
+        if len(self._starts) < self.rate:
+            return 0.0
+        return self._starts[-self.rate] + self.per - now
+
+    def _acquire(self, name):
+        with self._cond:
+            now = time.monotonic()
+            queue = self._queues[name]
+            if not queue:
+                # An idle class gets no credit for the time it was idle
+                self._finish[name] = max(self._finish[name], self._virtual_time)
+            ticket = _Ticket(self._seq, name, now)
+            self._seq += 1
+            queue.append(ticket)
+            stats = self._stats[name]
+            stats['queued'] += 1
+            stats['max_queued'] = max(stats['max_queued'], stats['queued'])
+            self._cond.notify_all()
+
+            while True:
+                now = time.monotonic()
+                timeout = None
+                if self._next() is ticket:
+                    delay = self._delay(now)
+                    busy = self.max_concurrency is not None and \
+                        self._in_flight >= self.max_concurrency
+                    if delay <= 0 and not busy:
+                        break
+                    if not busy:
+                        timeout = delay
+                self._cond.wait(timeout)
+
+            queue.popleft()
+            self._finish[name] += 1 / self.weights[name]
+            self._virtual_time = self._finish[name]
+            self._starts.append(now)
+            self._in_flight += 1
+            waited = now - ticket.queued
+            stats['queued'] -= 1
+            stats['requests'] += 1
+            stats['wait'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+            # The next in line may be able to go as well
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        """Wait for the turn of the request, then fetch it with the wrapped
+        fetcher.
+
+        Returns
+        -------
+        content : bytes
+        status_code : int
+        """
+        self._acquire(self.current)
+        try:
+            return self.fetcher.fetch(client, method, url, data, headers, json)
+        finally:
+            self._release()
+
+
+class ReplayFetcher(Fetcher):
+    """Answers requests from a cassette recorded by a :class:`RecordingFetcher`.
+
+    The cassette is memory-mapped and indexed by method and canonical URL
+    when the fetcher is created, so the order of query parameters and
+    authentication parameters do not matter, and each lookup costs a single
+    dict access. If a request was recorded several times, the responses are
+    replayed in the recorded order, and the last one is repeated after that.
+
+    Parameters
+    ----------
+    path : str
+        The cassette file.
+    """
+    default_response = json.dumps({'message': 'Resource not found.'}), 404
+
+    def __init__(self, path):
+        self.path = path
+        self.rate_limit = None
+        self.rate_limit_used = None
+        self.rate_limit_remaining = None
+        self._index = {}
+        self._next = {}
+        self._restore()
+        self._load_index()
+
+    _transient = Fetcher._transient + ('_lock', '_map')
+
+    def _restore(self):
+        self._lock = threading.Lock()
+        with open(self.path, 'rb') as f:
+            if f.read(len(CASSETTE_MAGIC)) != CASSETTE_MAGIC:
+                raise ValueError('{0} is not a cassette file'.format(self.path))
+            size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def _load_index(self):
+        position = len(CASSETTE_MAGIC)
+        size = len(self._map)
+        while position < size:
+            end = self._map.find(b'\n', position)
+            if end == -1:
+                break
+            record = json.loads(self._map[position:end])
+            start = end + 1
+            position = start + record['length'] + 1
+            if position > size:
+                break  # Truncated by an interrupted recording
+            key = record['method'], record['url']
+            self._index.setdefault(key, []).append(
+                (start, record['length'], record['status'], record['headers']))
+
+    def __len__(self):
+        return sum(len(records) for records in self._index.values())
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        """Fetch the given request from the cassette
+
+        Returns
+        -------
+        content : bytes
+        status_code : int
+        """
+        key = method, canonical_url(url)
+        records = self._index.get(key)
+        if records is None:
+            return self.default_response
+        with self._lock:
+            position = self._next.get(key, 0)
+            self._next[key] = min(position + 1, len(records) - 1)
+        start, length, status_code, recorded_headers = records[position]
+        self.store_rate_limit(recorded_headers)
+        return self._map[start:start + length], status_code
+
+
+class SimulatedResponse:
+    """The minimal subset of a "Requests" response used by the fetchers."""
+    def __init__(self, content, status_code, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class SimulatedFetcher(Fetcher):
+    """Wraps another fetcher and makes it behave like the real Discogs API.
+
+    Responses of the wrapped fetcher (usually a :class:`MemoryFetcher` or
+    :class:`FilesystemFetcher`) are delayed by a configurable latency
+    distribution, and rate limiting, server errors and timeouts are injected.
+    All random decisions are drawn from a generator seeded with ``seed``, so a
+    simulation is reproducible.
+
+    Parameters
+    ----------
+    fetcher : Fetcher
+        The fetcher that produces the actual responses.
+    latency : float, optional
+        Mean response time in seconds, by default 0.
+    jitter : float, optional
+        Spread of the response time in seconds, by default 0. Its meaning
+        depends on ``distribution``.
+    distribution : str, optional
+        One of ``'constant'``, ``'uniform'`` (latency +/- jitter),
+        ``'normal'`` (jitter is the standard deviation) or ``'exponential'``
+        (latency is the mean, jitter is ignored), by default ``'uniform'``.
+    rate_limit : int, optional
+        Requests allowed per ``rate_limit_window``, by default 60 (the limit
+        for authenticated requests). Requests beyond the quota get a 429.
+    rate_limit_window : float, optional
+        Length of the moving rate limit window in seconds, by default 60.
+    error_rate : float, optional
+        Probability that a request starts a burst of server errors, by
+        default 0.
+    error_burst : int, optional
+        Maximum number of consecutive server errors in a burst, by default 1.
+    error_statuses : tuple, optional
+        Status codes to choose from for server errors.
+    timeout_rate : float, optional
+        Probability that a request never gets an answer and times out, by
+        default 0.
+    seed : int, optional
+        Seed for the random number generator.
+    realtime : bool, optional
+        If True (default), latency and backoff are spent in ``time.sleep``.
+        If False, they only advance the simulated clock, which makes
+        simulations fast and their rate limiting fully deterministic.
+    """
+    distributions = ('constant', 'uniform', 'normal', 'exponential')
+
+    def __init__(self, fetcher, latency=0.0, jitter=0.0, distribution='uniform',
+                 rate_limit=60, rate_limit_window=60.0, error_rate=0.0,
+                 error_burst=1, error_statuses=(500, 502, 503), timeout_rate=0.0,
+                 seed=None, realtime=True):
+        if distribution not in self.distributions:
+            raise ValueError('distribution must be one of {0}'.format(
+                ', '.join(self.distributions)))
+        self.fetcher = fetcher
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.error_rate = error_rate
+        self.error_burst = error_burst
+        self.error_statuses = error_statuses
+        self.timeout_rate = timeout_rate
+        self.realtime = realtime
+        self.random = random.Random(seed)
+        self.clock = 0.0
+        self.rate_limit_used = 0
+        self.rate_limit_remaining = rate_limit
+        self.rate_limit_info = RateLimit(str(rate_limit), '0', str(rate_limit))
+        self._history = deque()
+        self._burst = 0
+        self._lock = threading.Lock()
+
+    _transient = Fetcher._transient + ('_lock',)
+
+    def _restore(self):
+        self._lock = threading.Lock()
+
+    def now(self):
+        """Current time of the simulation in seconds."""
+        return time.monotonic() if self.realtime else self.clock
+
+    def _sleep(self, seconds):
+        if self.realtime:
+            time.sleep(seconds)
+        else:
+            with self._lock:
+                self.clock += seconds
+
+    def _draw_latency(self):
+        if self.distribution == 'constant':
+            value = self.latency
+        elif self.distribution == 'uniform':
+            value = self.random.uniform(self.latency - self.jitter,
+                                        self.latency + self.jitter)
+        elif self.distribution == 'normal':
+            value = self.random.gauss(self.latency, self.jitter)
+        else:
+            value = self.random.expovariate(1 / self.latency) if self.latency else 0
+        return max(value, 0.0)
+
+    def _update_quota(self):
+        """Expire old requests from the moving window, return True if the
+        current request fits into the quota."""
+        now = self.now()
+        while self._history and self._history[0] <= now - self.rate_limit_window:
+            self._history.popleft()
+        allowed = len(self._history) < self.rate_limit
+        if allowed:
+            self._history.append(now)
+        self.rate_limit_used = len(self._history)
+        self.rate_limit_remaining = self.rate_limit - self.rate_limit_used
+        # Set all at once, like the headers stored by the other fetchers
+        self.rate_limit_info = RateLimit(str(self.rate_limit), str(self.rate_limit_used),
+                                         str(self.rate_limit_remaining))
+        return allowed
+
+    def _response(self, content, status_code, info):
+        return SimulatedResponse(content, status_code, {
+            header: value for (_, header), value in zip(RATE_LIMIT_HEADERS, info)
+        })
+
+    def _error(self, status_code, message, info):
+        return self._response(json.dumps({'message': message}).encode('utf8'), status_code, info)
+
+    @backoff
+    def request(self, client, method, url, data, headers, json_format):
+        # Random decisions and quota bookkeeping are serialized, the simulated
+        # latency is spent outside the lock so concurrent requests overlap.
+        with self._lock:
+            timed_out = self.random.random() < self.timeout_rate
+            latency = self._draw_latency()
+        if self.read_timeout is not None and latency > self.read_timeout:
+            timed_out = True
+        if timed_out:
+            from requests.exceptions import ReadTimeout
+            self._sleep(self.read_timeout or 0)
+            raise ReadTimeout('Simulated timeout for {0} {1}'.format(method, url))
+        self._sleep(latency)
+
+        with self._lock:
+            allowed = self._update_quota()
+            info = self.rate_limit_info
+            if not allowed:
+                return self._error(429, "You are making requests too quickly.", info)
+            if not self._burst and self.random.random() < self.error_rate:
+                self._burst = self.random.randint(1, self.error_burst)
+            if self._burst:
+                self._burst -= 1
+                return self._error(self.random.choice(self.error_statuses),
+                                   'Simulated server error.', info)
+
+        content, status_code = self.fetcher.fetch(client, method, url, data,
+                                                  headers, json_format)
+        if isinstance(content, str):
+            content = content.encode('utf8')
+        return self._response(content, status_code, info)
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        """Fetch the given request from the wrapped fetcher, subject to the
+        simulated latency, rate limit and failures.
+
+        Returns
+        -------
+        content : bytes
+        status_code : int
+
+        Raises
+        ------
+        requests.exceptions.ReadTimeout
+            If the request was selected to time out, or its simulated latency
+            exceeds ``read_timeout``.
+        """
+        resp = self.request(client, method, url, data, headers, json)
+        return resp.content, resp.status_code
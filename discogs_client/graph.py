@@ -0,0 +1,267 @@
+"""Breadth-first crawls of the relations between artists, releases, labels
+and masters.
+
+:class:`GraphCrawler` starts from seed objects and follows their relations
+level by level, fetching every object once::
+
+    crawler = GraphCrawler(client, [client.artist(45)], max_depth=2,
+                           relations=['artist.aliases', 'artist.releases', 'release.labels'])
+    for node in crawler:
+        for relation, target in node.edges:
+            graph.add_edge((node.kind, node.id), target, relation=relation)
+
+Every node is yielded once, with its data and its edges to other nodes as
+``(relation, (kind, id))`` pairs. The relations followed are those in
+:data:`RELATIONS`; lists such as ``artist.releases`` are read page by page,
+up to ``list_pages`` pages. Nodes at ``max_depth`` are yielded without being
+fetched, unless ``fetch_leaves`` is set.
+
+Objects are marked as visited when they are first found, in a bitmap per type
+that takes one bit per ID up to the highest one seen, so the frontier never
+holds an object twice and a crawl of millions of objects fits in a few
+megabytes. With ``checkpoint``, the visited set and the frontier are saved
+to a file every ``checkpoint_every`` nodes and when the crawl stops, and a
+new crawler with the same checkpoint continues from there. Nodes yielded
+since the last checkpoint are yielded again.
+"""
+import base64
+import json
+import os
+import threading
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from discogs_client import models
+from discogs_client.exceptions import HTTPError
+from discogs_client.utils import write_atomic
+
+
+#: Relations followed from every type of object
+RELATIONS = {
+    'artist': ('releases', 'aliases', 'members', 'groups'),
+    'release': ('labels', 'master', 'credits'),
+    'label': ('sublabels', 'releases'),
+    'master': ('versions',),
+}
+KINDS = {models.Artist: 'artist', models.Release: 'release', models.Label: 'label',
+         models.Master: 'master'}
+
+Node = namedtuple('Node', ['kind', 'id', 'depth', 'data', 'edges'])
+
+
+class VisitedSet:
+    """IDs per object type, in bitmaps of one bit per ID."""
+    def __init__(self):
+        self._bits = {}
+        self._count = 0
+
+    def add(self, kind, id_):
+        """Add an ID, return False if it was already there."""
+        bits = self._bits.setdefault(kind, bytearray())
+        index, mask = id_ >> 3, 1 << (id_ & 7)
+        if index >= len(bits):
+            bits.extend(bytes(index + 1 - len(bits)))
+        elif bits[index] & mask:
+            return False
+        bits[index] |= mask
+        self._count += 1
+        return True
+
+    def __contains__(self, node):
+        kind, id_ = node
+        bits = self._bits.get(kind, b'')
+        index = id_ >> 3
+        return index < len(bits) and bool(bits[index] & (1 << (id_ & 7)))
+
+    def __len__(self):
+        return self._count
+
+    def to_dict(self):
+        return {
+            'count': self._count,
+            'bits': {kind: base64.b64encode(zlib.compress(bytes(bits))).decode('ascii')
+                     for kind, bits in self._bits.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        visited = cls()
+        visited._count = state['count']
+        visited._bits = {kind: bytearray(zlib.decompress(base64.b64decode(bits)))
+                         for kind, bits in state['bits'].items()}
+        return visited
+
+
+def _relations(relations):
+    """Map of object type to the relations to follow, from names such as
+    ``'artist.releases'``."""
+    if relations is None:
+        return dict(RELATIONS)
+    selected = {kind: () for kind in RELATIONS}
+    for name in relations:
+        kind, _, relation = name.partition('.')
+        if relation not in RELATIONS.get(kind, ()):
+            raise ValueError('Unknown relation {0!r}'.format(name))
+        selected[kind] += (relation,)
+    return selected
+
+
+class GraphCrawler:
+    """Crawls the relations between objects breadth first.
+
+    Parameters
+    ----------
+    client : Client
+    seeds : list
+        Artist, Release, Label or Master objects, or ``(kind, id)`` tuples
+        such as ``('artist', 45)``, to start from at depth 0.
+    relations : list of str, optional
+        Relations to follow, such as ``'artist.aliases'``, by default all of
+        :data:`RELATIONS`.
+    max_depth : int, optional
+        Depth of the farthest nodes, by default 2.
+    concurrency : int, optional
+        Objects fetched at the same time, by default 4.
+    list_pages : int, optional
+        Pages read of every list relation, by default all of them.
+    per_page : int, optional
+        Items per page of list relations, by default 100.
+    fetch_leaves : bool, optional
+        Fetch the data of nodes at ``max_depth`` too, by default False.
+    checkpoint : str, optional
+        File the state of the crawl is saved to, and resumed from if it
+        exists. The seeds are ignored when resuming.
+    checkpoint_every : int, optional
+        Nodes between checkpoints, by default 1000.
+    """
+    def __init__(self, client, seeds, relations=None, max_depth=2, concurrency=4,
+                 list_pages=None, per_page=100, fetch_leaves=False, checkpoint=None,
+                 checkpoint_every=1000):
+        self.client = client
+        self.relations = _relations(relations)
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.list_pages = list_pages
+        self.per_page = per_page
+        self.fetch_leaves = fetch_leaves
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.requests = 0
+        self.missing = 0
+        self._lock = threading.Lock()
+        self.visited = VisitedSet()
+        self.frontier = deque()
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self._load()
+        else:
+            for seed in seeds:
+                if not isinstance(seed, tuple):
+                    seed = (KINDS[type(seed)], seed.id)
+                self._discover(seed[0], int(seed[1]), 0)
+
+    def _discover(self, kind, id_, depth):
+        if self.visited.add(kind, id_):
+            self.frontier.append((kind, id_, depth))
+
+    def _load(self):
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        self.visited = VisitedSet.from_dict(state['visited'])
+        self.frontier = deque(tuple(node) for node in state['frontier'])
+        self.requests = state['requests']
+        self.missing = state['missing']
+
+    def save(self, in_progress=()):
+        """Write the state of the crawl to the checkpoint file, replacing it
+        atomically. Nodes in progress are saved as part of the frontier."""
+        if self.checkpoint is None:
+            return
+        state = {
+            'visited': self.visited.to_dict(),
+            'frontier': list(in_progress) + list(self.frontier),
+            'requests': self.requests,
+            'missing': self.missing,
+        }
+        write_atomic(self.checkpoint, json.dumps(state))
+
+    def _count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _targets(self, value):
+        """Nodes in the value of a relation, reading lists page by page."""
+        if value is None:
+            return
+        if isinstance(value, models.BasePaginatedResponse):
+            value.per_page = self.per_page
+            index, pages = 1, 1
+            while index <= pages and (self.list_pages is None or index <= self.list_pages):
+                items = value.page(index)
+                self._count_request()
+                pages = value.pages
+                for item in items:
+                    yield item
+                index += 1
+        elif isinstance(value, list):
+            yield from value
+        else:
+            yield value
+
+    def expand(self, kind, id_, depth):
+        """Fetch an object and its relations.
+
+        Returns
+        -------
+        Node
+            The node with its data and edges, or None if it does not exist.
+        """
+        if depth >= self.max_depth and not self.fetch_leaves:
+            return Node(kind, id_, depth, None, [])
+        obj = getattr(self.client, kind)(id_)
+        try:
+            obj.refresh()
+            self._count_request()
+            if depth >= self.max_depth:
+                return Node(kind, id_, depth, obj.data, [])
+            edges = []
+            for relation in self.relations[kind]:
+                for target in self._targets(getattr(obj, relation)):
+                    target_kind = KINDS.get(type(target))
+                    target_id = int(target.data.get('id') or 0)
+                    if target_kind is not None and target_id > 0:
+                        edges.append((relation, (target_kind, target_id)))
+        except HTTPError as e:
+            if e.status_code != 404:
+                raise
+            with self._lock:
+                self.missing += 1
+            return None
+        return Node(kind, id_, depth, obj.data, edges)
+
+    def __iter__(self):
+        in_progress = {}
+        since_checkpoint = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                while self.frontier or in_progress:
+                    while self.frontier and len(in_progress) < self.concurrency:
+                        node = self.frontier.popleft()
+                        in_progress[executor.submit(self.expand, *node)] = node
+                    done, _ = wait(in_progress, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        # Fails with the node still in progress, to save it
+                        node = future.result()
+                        del in_progress[future]
+                        if node is None:
+                            continue
+                        for _, (kind, id_) in node.edges:
+                            self._discover(kind, id_, node.depth + 1)
+                        yield node
+                        since_checkpoint += 1
+                        if since_checkpoint >= self.checkpoint_every:
+                            self.save(in_progress.values())
+                            since_checkpoint = 0
+            finally:
+                for future in in_progress:
+                    future.cancel()
+                self.save(in_progress.values())
@@ -1,5 +1,74 @@
+import json
+import os
+import threading
+from bisect import bisect_right
+from collections import namedtuple
 from discogs_client.exceptions import HTTPError
-from discogs_client.utils import parse_timestamp, update_qs, omit_none
+from discogs_client.utils import canonical_url, parse_timestamp, update_qs, omit_none, write_atomic
+
+
+SAVE_MODES = ('refresh', 'optimistic')
+
+
+class Cursor(namedtuple('Cursor', ['url', 'per_page', 'sort', 'sort_order', 'filters',
+                                   'page', 'last_id'])):
+    """A position in a paginated list, see :meth:`BasePaginatedResponse.iter_from`.
+
+    Holds the state of the list, the page to fetch next and the ID of the
+    item before the next one, see :func:`item_id`, so that a walk can
+    continue in another process or on another host. Cursors are plain data
+    and convert to and from JSON.
+    """
+    __slots__ = ()
+
+    def to_json(self):
+        return json.dumps(self._asdict())
+
+    @classmethod
+    def from_json(cls, text):
+        fields = json.loads(text)
+        if isinstance(fields['last_id'], list):
+            fields['last_id'] = tuple(fields['last_id'])
+        return cls(**fields)
+
+    def save(self, path):
+        """Write the cursor to a file, replacing it atomically."""
+        write_atomic(path, self.to_json())
+
+    @classmethod
+    def load(cls, path):
+        """The cursor saved in a file, or None if there is none."""
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls.from_json(f.read())
+
+
+def item_id(item):
+    """The ID a cursor keeps for an item of a list, a model object or the raw
+    dict; the instance ID for collection items.
+
+    Lists such as search results and the releases of an artist mix types of
+    items, and release 5 is not master 5, so items with a type are
+    identified by a ``(type, id)`` tuple.
+    """
+    data = getattr(item, 'data', item)
+    if not isinstance(data, dict):
+        return None
+    id_ = data.get('instance_id', data.get('id'))
+    if id_ is not None and 'type' in data:
+        return data['type'], id_
+    return id_
+
+
+def skip_through(items, last_id):
+    """The items following the one with ID ``last_id``, or all of them if it
+    is not among the items."""
+    if last_id is not None:
+        for i, item in enumerate(items):
+            if item_id(item) == last_id:
+                return items[i + 1:]
+    return items
 
 
 class SimpleFieldDescriptor:
@@ -199,20 +268,61 @@ class PrimaryAPIObject(APIObject):
         equal = self.__eq__(other)
         return NotImplemented if equal is NotImplemented else not equal
 
+    def __getstate__(self):
+        # The refresh lock is created again once needed
+        state = self.__dict__.copy()
+        state.pop('_refresh_lock', None)
+        return state
+
     def refresh(self):
         if self.data.get('resource_url'):
             data = self.client._get(self.data['resource_url'])
-            self.data.update(data)
+            # Replaced rather than updated, for threads iterating the data
+            self.data = dict(self.data, **data)
             self.changes = {}
             self.previous_request = self.data.get('resource_url')
 
-    def save(self):
+    def save(self, mode=None):
+        """Save the pending changes.
+
+        Parameters
+        ----------
+        mode : str, optional
+            ``'refresh'`` requests the object again after saving, in case
+            there were side-effects. ``'optimistic'`` saves that request: it
+            takes the response if the API returns the updated object, or else
+            applies the changes to the local data and refreshes only once a
+            field missing locally is read. By default the client's
+            ``save_mode``.
+        """
+        if mode is None:
+            mode = self.client.save_mode
+        if mode not in SAVE_MODES:
+            raise ValueError("mode must be one of 'refresh', 'optimistic'")
         if self.data.get('resource_url'):
             # TODO: This should be PATCH
-            self.client._post(self.data['resource_url'], self.changes)
-
-            # Refresh the object, in case there were side-effects
-            self.refresh()
+            resp = self.client._post(self.data['resource_url'], self.changes)
+
+            if mode == 'refresh':
+                # Refresh the object, in case there were side-effects
+                self.refresh()
+            elif isinstance(resp, dict) and 'resource_url' in resp:
+                resource_url = self.data['resource_url']
+                self.data.update(resp)
+                self.data['resource_url'] = resource_url
+                self.changes = {}
+                self.previous_request = resource_url
+                self._known_invalid_keys = []
+            else:
+                self._apply_changes()
+                # Side-effects are picked up by the next refresh
+                self.previous_request = None
+                self._known_invalid_keys = []
+
+    def _apply_changes(self):
+        """Move the pending changes into the local data."""
+        self.data.update(self.changes)
+        self.changes = {}
 
     def delete(self):
         if self.data.get('resource_url'):
@@ -234,15 +344,22 @@ class PrimaryAPIObject(APIObject):
         except KeyError:
             pass
 
-        # Object already refreshed from resource_url
-        # return default to prevent an unnecessary API call
-        if self.data.get('resource_url') == self.previous_request:
-            self._known_invalid_keys.append(key)
-            return default
-
-        # Now refresh the object from its resource_url.
-        # The key might exist but not be in our cache.
-        self.refresh()
+        # Threads missing the same key wait for a single refresh. The lock is
+        # only created once needed, most objects never refresh themselves.
+        lock = self.__dict__.get('_refresh_lock')
+        if lock is None:
+            lock = self.__dict__.setdefault('_refresh_lock', threading.Lock())
+        with lock:
+            # Object already refreshed from resource_url, possibly by
+            # another thread: return default to prevent an unnecessary API call
+            if self.data.get('resource_url') == self.previous_request:
+                if key not in self.data:
+                    self._known_invalid_keys.append(key)
+                    return default
+            else:
+                # Now refresh the object from its resource_url.
+                # The key might exist but not be in our cache.
+                self.refresh()
 
         try:
             return self.data[key]
@@ -266,18 +383,46 @@ class SecondaryAPIObject(APIObject):
 
 
 class BasePaginatedResponse:
-    """Base class for lists of objects spread across many URLs."""
+    """Base class for lists of objects spread across many URLs.
+
+    Lists can be read from many threads. Pages are fetched without holding a
+    lock; a page fetched while the cache changed, because the list was
+    re-sorted or an item was added or removed, is returned but not cached.
+    """
     def __init__(self, client, url):
         self.client = client
         self.url = url
         self._num_pages = None
         self._num_items = None
         self._pages = {}
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._executor = None
+        self._executor_workers = None
+        self._offsets = [0]
+        self._offsets_generation = 0
+        self._api_per_page = None
         self._per_page = 50
         self._list_key = 'items'
         self._sort_key = None
         self._sort_order = 'asc'
         self._filters = {}
+        self.position = None
+
+    #: Sort key ordering the list by the date items were added
+    _added_sort_key = None
+    #: Pages fetched at the same time when several are needed at once
+    concurrency = 4
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_executor'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
 
     @property
     def per_page(self):
@@ -289,15 +434,240 @@ class BasePaginatedResponse:
         self._invalidate()
 
     def _invalidate(self):
-        self._pages = {}
-        self._num_pages = None
-        self._num_items = None
+        with self._lock:
+            self._generation += 1
+            self._pages = {}
+            self._num_pages = None
+            self._num_items = None
+            self._api_per_page = None
+
+    def _insertion_index(self):
+        """The index at which the API lists new items, None if unknown.
+
+        New items go first or last if the list is sorted by the date items
+        were added, and no filter could exclude them.
+        """
+        if self._added_sort_key is None or self._sort_key != self._added_sort_key or self._filters:
+            return None
+        return 0 if self._sort_order == 'desc' else self._num_items
+
+    def _locate(self, predicate):
+        """The index of the first cached item matching predicate, or None."""
+        for page_index in sorted(self._pages):
+            for offset, item in enumerate(self._pages[page_index]):
+                if predicate(item):
+                    return (page_index - 1) * self._per_page + offset
+        return None
+
+    def _cache_complete(self):
+        return self._num_pages is not None and len(self._pages) == self._num_pages
+
+    def _patchable(self):
+        # Item indexes follow from page numbers only if pages are full
+        return self._num_items is not None and self.client._trust_per_page
+
+    def _patch_insert(self, index, item):
+        """Insert item at index in the cached pages.
+
+        Cached pages before the item stay as they are. Every later page
+        passes its last item on to the next; pages after the first one not
+        cached have shifted and are dropped.
+        """
+        page_index = index // self._per_page + 1
+        carry = [item]
+        offset = index % self._per_page
+        while carry and page_index in self._pages:
+            page = self._pages[page_index]
+            page.insert(offset, carry.pop())
+            if len(page) > self._per_page:
+                carry.append(page.pop())
+            page_index += 1
+            offset = 0
+        self._num_items += 1
+        self._set_num_pages()
+        self._drop_pages(page_index)
+
+    def _patch_remove(self, index):
+        """Remove the item at index from the cached pages.
+
+        Later pages pass their first item on to the previous page; a page
+        that cannot be completed because the next page is not cached is
+        dropped.
+        """
+        page_index = index // self._per_page + 1
+        # Items shift through the pages as they were, even if the last one
+        # is emptied by the removal
+        num_pages = self._num_pages
+        self._num_items -= 1
+        self._set_num_pages()
+        if page_index not in self._pages:
+            self._drop_pages(page_index + 1)
+            return
+        del self._pages[page_index][index % self._per_page]
+        while page_index < num_pages:
+            if page_index + 1 not in self._pages:
+                self._drop_pages(page_index)
+                return
+            self._pages[page_index].append(self._pages[page_index + 1].pop(0))
+            page_index += 1
+        self._drop_pages(self._num_pages + 1)
+
+    def _set_num_pages(self):
+        self._num_pages = max(1, -(-self._num_items // self._per_page))
+
+    def _drop_pages(self, first):
+        """Drop cached pages from page number first on."""
+        for page_index in [i for i in self._pages if i >= first]:
+            del self._pages[page_index]
+
+    def _added(self, item):
+        """Update the cache for an item added to the list."""
+        with self._lock:
+            self._generation += 1
+            index = self._insertion_index()
+            if index is None or not self._patchable():
+                self._invalidate()
+            else:
+                self._patch_insert(index, self._transform(item))
+
+    def _removed(self, predicate):
+        """Update the cache for the item matching predicate removed from the
+        list."""
+        with self._lock:
+            self._generation += 1
+            if not self._patchable():
+                self._invalidate()
+                return
+            index = self._locate(predicate)
+            if index is not None:
+                self._patch_remove(index)
+            elif not self._cache_complete():
+                # Somewhere in a page not loaded yet, every later page shifts
+                self._invalidate()
+
+    def _cache_page(self, generation, index, data):
+        """Cache a fetched page unless the cache changed since the fetch
+        started, return its items."""
+        items = [self._transform(item) for item in data[self._list_key]]
+        pagination = data.get('pagination')
+        with self._lock:
+            if generation == self._generation:
+                self._pages[index] = items
+                if pagination and self._num_items is None:
+                    self._num_pages = pagination['pages']
+                    self._num_items = pagination['items']
+                if pagination and pagination.get('per_page'):
+                    self._api_per_page = pagination['per_page']
+        return items
+
+    def _page_size(self):
+        """The most items a page can hold: ``per_page``, unless the API
+        reported that it serves fewer."""
+        if self._api_per_page is None:
+            return self._per_page
+        return min(self._per_page, self._api_per_page)
+
+    def _load_pages(self, indexes):
+        """Fetch the pages not cached yet, concurrently if there are several."""
+        missing = [index for index in indexes if index not in self._pages]
+        if len(missing) == 1:
+            self.page(missing[0])
+        elif missing:
+            list(self._page_executor().map(self.page, missing))
+
+    def _page_executor(self):
+        """The thread pool fetching pages, kept for the life of the list so
+        that its threads, and their HTTP sessions, are reused."""
+        with self._lock:
+            if self._executor is None or self._executor_workers != self.concurrency:
+                from concurrent.futures import ThreadPoolExecutor
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                                    thread_name_prefix='discogs-pages')
+                self._executor_workers = self.concurrency
+            return self._executor
+
+    def _loaded_offsets(self):
+        """The index of the first item of every page, for the pages cached
+        from page 1 on without a gap, followed by the number of items in
+        them."""
+        with self._lock:
+            if self._offsets_generation != self._generation:
+                self._offsets = [0]
+                self._offsets_generation = self._generation
+            offsets = self._offsets
+            # Page numbers start at 1, the next page is len(offsets)
+            while len(offsets) in self._pages:
+                offsets.append(offsets[-1] + len(self._pages[len(offsets)]))
+            return offsets
+
+    def _items_by_offsets(self, indexes):
+        """The items at indexes, with pages that may hold fewer items than
+        ``per_page``.
+
+        Items are looked up by bisecting the offsets of the pages before
+        them. The pages missing up to the highest index are fetched, as many
+        at once as it takes to reach it if they are full.
+        """
+        highest = max(indexes)
+        while True:
+            with self._lock:
+                offsets = self._loaded_offsets()
+                if highest < offsets[-1]:
+                    items = []
+                    for index in indexes:
+                        page_index = bisect_right(offsets, index)
+                        items.append(self._pages[page_index][index - offsets[page_index - 1]])
+                    return items
+                first, end = len(offsets), offsets[-1]
+            if self._num_pages is None:
+                # Page 1 tells how many pages there are
+                last = first
+            elif first > self._num_pages:
+                raise IndexError('list index out of range')
+            else:
+                last = min(first + (highest - end) // self._page_size(), self._num_pages)
+            self._load_pages(range(first, last + 1))
+
+    def _slice_indexes(self, index):
+        """The indexes of the items in a slice, up to the end of the list.
+
+        Trusting ``per_page``, a slice running forward between non-negative
+        bounds starts with the page of its first item, which tells the
+        number of items, rather than with page 1.
+        """
+        start, stop, step = index.start, index.stop, index.step
+        if (self._num_items is None and self.client._trust_per_page
+                and (step is None or step > 0) and (start is None or start >= 0)
+                and stop is not None and stop >= 0):
+            start = start or 0
+            if start >= stop:
+                return range(0)
+            try:
+                self.page(start // self.per_page + 1)
+            except HTTPError as e:
+                # Starts beyond the end of the list
+                if e.status_code == 404:
+                    return range(0)
+                raise
+        return range(*index.indices(len(self)))
+
+    def _items_by_page_size(self, indexes):
+        """The items at indexes, with pages that hold ``per_page`` items.
+        The pages they are on are fetched at once."""
+        per_page = self.per_page
+        self._load_pages(sorted({index // per_page + 1 for index in indexes}))
+        return [self.page(index // per_page + 1)[index % per_page] for index in indexes]
+
+    def _fetch_page(self, index):
+        return self.client._get(self._url_for_page(index))
 
     def _load_pagination_info(self):
-        data = self.client._get(self._url_for_page(1))
-        self._pages[1] = [
-            self._transform(item) for item in data[self._list_key]
-        ]
+        generation = self._generation
+        data = self._fetch_page(1)
+        self._cache_page(generation, 1, data)
+        # Set even if the cache changed, for the caller to go on with
         self._num_pages = data['pagination']['pages']
         self._num_items = data['pagination']['items']
 
@@ -343,53 +713,149 @@ class BasePaginatedResponse:
         return self._num_items
 
     def page(self, index):
-        if index not in self._pages:
-            data = self.client._get(self._url_for_page(index))
-            self._pages[index] = [
-                self._transform(item) for item in data[self._list_key]
-            ]
-        return self._pages[index]
+        items = self._pages.get(index)
+        if items is None:
+            generation = self._generation
+            items = self._cache_page(generation, index, self._fetch_page(index))
+        return items
 
     def _transform(self, item):
         return item
 
     def __getitem__(self, index):
-        """Retrieve an item by its index.
+        """Retrieve an item by its index, or a list of items by a slice.
 
         By default, uses the API's ``per_page`` value to calculate the page
         containing the item directly. If the API returns fewer items per page
         than reported, this may yield incorrect results — set
-        ``client.trust_per_page = False`` to fall back to a sequential page
-        walk at the cost of performance.
+        ``client.trust_per_page = False`` to count the items of the pages
+        before the index instead, at the cost of fetching all of them once.
+
+        Negative indexes, and slices with a negative or missing bound, count
+        from the number of items the API reports, which takes the first page
+        if it is not loaded yet. The pages a slice needs are fetched at the
+        same time, see ``concurrency``.
         """
-        if self.client._trust_per_page:
-            page_index = index // self.per_page + 1
-            offset = index % self.per_page
+        if isinstance(index, slice):
+            indexes = self._slice_indexes(index)
+            if not indexes:
+                return []
+        else:
+            if index < 0:
+                index += len(self)
+                if index < 0:
+                    raise IndexError('list index out of range')
+            indexes = None
 
-            try:
-                page = self.page(page_index)
-            except HTTPError as e:
-                if e.status_code == 404:
-                    raise IndexError(e.msg) from e
-                raise
+        try:
+            if indexes is not None:
+                if self.client._trust_per_page:
+                    return self._items_by_page_size(indexes)
+                return self._items_by_offsets(indexes)
+
+            if self.client._trust_per_page:
+                page = self.page(index // self.per_page + 1)
+                return page[index % self.per_page]
+
+            # Not trusting the per_page parameter, find the page by the number
+            # of items in the pages before it
+            return self._items_by_offsets((index,))[0]
+        except HTTPError as e:
+            if e.status_code == 404:
+                raise IndexError(e.msg) from e
+            raise
 
-            return page[offset]
+    @property
+    def cursor(self):
+        """A :class:`Cursor` at the start of the list, with its current
+        ``per_page``, sort and filters."""
+        return Cursor(self.url, self._per_page, self._sort_key, self._sort_order,
+                      dict(self._filters), 1, None)
+
+    def restore(self, cursor):
+        """Take over the ``per_page``, sort and filters of a cursor.
+
+        Raises
+        ------
+        ValueError
+            If the cursor belongs to a list at another URL.
+        """
+        if cursor.url != self.url:
+            raise ValueError('Cursor of {0} cannot be used for {1}'.format(cursor.url, self.url))
+        self._per_page = cursor.per_page
+        self._sort_key = cursor.sort
+        self._sort_order = cursor.sort_order
+        self._filters = dict(cursor.filters)
+        self._invalidate()
+
+    def iter_from(self, cursor=None, checkpoint=None, checkpoint_every=10):
+        """Iterate over the list from the position of a cursor.
 
-        # Fallback to sequential page loading if we're not trusting the per_page parameter
-        current = 0
-        page_index = 1
+        Pages are fetched one after the other and not cached, so a walk of
+        any length keeps a single page in memory. ``self.position`` is the
+        cursor after the last item yielded.
+
+        If items were added to the list before the position, the walk still
+        continues after the last item; if items were removed, as many items
+        following the position are skipped.
+
+        Parameters
+        ----------
+        cursor : Cursor, optional
+            Where to start, by default at the beginning. The list takes over
+            the ``per_page``, sort and filters of the cursor.
+        checkpoint : str, optional
+            File the cursor is saved to every ``checkpoint_every`` pages,
+            and loaded from when ``cursor`` is not given. The walk continues
+            after the last checkpoint, repeating the items yielded since.
+        checkpoint_every : int, optional
+            Pages between checkpoints, by default 10.
+        """
+        if cursor is None and checkpoint is not None:
+            cursor = Cursor.load(checkpoint)
+        if cursor is None:
+            cursor = self.cursor
+        else:
+            self.restore(cursor)
+        self.position = cursor
+        index = cursor.page
         while True:
             try:
-                page = self.page(page_index)
+                data = self._fetch_page(index)
             except HTTPError as e:
-                if e.status_code == 404:
-                    raise IndexError(e.msg) from e
+                # Pages beyond the end, after the list got shorter
+                if e.status_code == 404 and index > 1:
+                    break
                 raise
-            if current + len(page) > index:
-                return page[index - current]
-            current += len(page)
-            page_index += 1
+            pagination = data.get('pagination', {})
+            self._num_pages = pagination.get('pages', index)
+            self._num_items = pagination.get('items')
+            items = [self._transform(item) for item in data[self._list_key]]
+            for item in skip_through(items, self.position.last_id):
+                self.position = self.position._replace(last_id=item_id(item))
+                yield item
+            self.position = self.position._replace(page=index + 1)
+            if checkpoint is not None and (index % checkpoint_every == 0
+                                           or index >= self._num_pages):
+                self.position.save(checkpoint)
+            if index >= self._num_pages:
+                break
+            index += 1
+
+    def export(self, path, format=None, fields=None, prefetch=2):
+        """Write every item of the list to a JSON Lines, JSON, CSV or Parquet file.
+
+        Pages are fetched in the background while the previous one is
+        written, and are not cached. See :func:`discogs_client.export.export`
+        for the parameters.
 
+        Returns
+        -------
+        int
+            The number of items written.
+        """
+        from discogs_client.export import export
+        return export(self, path, format=format, fields=fields, prefetch=prefetch)
 
     def __len__(self):
         return self.count
@@ -400,6 +866,14 @@ class BasePaginatedResponse:
             for item in page:
                 yield item
 
+    def __reversed__(self):
+        """Iterate from the last item to the first, fetching the pages from
+        the last one backwards. The number of pages takes the first page if
+        it is not loaded yet."""
+        for i in range(self.pages, 0, -1):
+            for item in reversed(self.page(i)):
+                yield item
+
 
 class PaginatedList(BasePaginatedResponse):
     """A paginated list of objects of a particular class."""
@@ -413,7 +887,14 @@ class PaginatedList(BasePaginatedResponse):
 
 
 class Wantlist(PaginatedList):
+    _added_sort_key = 'added'
+
     def add(self, release, notes=None, notes_public=None, rating=None):
+        """Add a release to the wantlist, or change its notes and rating.
+
+        Cached pages are patched if the wantlist is sorted by date added,
+        otherwise they are discarded.
+        """
         release_id = release.id if isinstance(release, Release) else release
         data = {
             'release_id': str(release_id),
@@ -421,16 +902,32 @@ class Wantlist(PaginatedList):
             'notes_public': notes_public,
             'rating': rating,
         }
-        self.client._put(self.url + '/' + str(release_id), omit_none(data))
-        self._invalidate()
+        resp = self.client._put(self.url + '/' + str(release_id), omit_none(data))
+        if not isinstance(resp, dict) or 'id' not in resp:
+            # Without the want in the response, there is nothing complete to
+            # patch the cache with
+            self._invalidate()
+            return
+
+        with self._lock:
+            index = self._locate(lambda item: item.id == release_id) if self._patchable() else None
+            if index is None:
+                self._added(resp)
+            else:
+                # Changed, not added
+                self._generation += 1
+                page = self._pages[index // self._per_page + 1]
+                page[index % self._per_page] = self._transform(resp)
 
     def remove(self, release):
         release_id = release.id if isinstance(release, Release) else release
         self.client._delete(self.url + '/' + str(release_id))
-        self._invalidate()
+        self._removed(lambda item: item.id == release_id)
 
 
 class Inventory(PaginatedList):
+    _added_sort_key = 'listed'
+
     def add_listing(self, release, condition, price, status, sleeve_condition=None,
                     comments=None, allow_offers=None, external_id=None, location=None,
                     weight=None, format_quantity=None):
@@ -448,8 +945,38 @@ class Inventory(PaginatedList):
             "weight": weight,
             "format_quantity": format_quantity,
         }
-        self.client._post(self.client._base_url + '/marketplace/listings', omit_none(data))
+        resp = self.client._post(self.client._base_url + '/marketplace/listings', omit_none(data))
+        if isinstance(resp, dict) and 'listing_id' in resp:
+            # Only the ID is returned, the listing is fetched when read
+            self._added({'id': resp['listing_id']})
+        else:
+            self._invalidate()
+
+    def bulk_add(self, listings, **kwargs):
+        """Add many listings through CSV uploads.
+
+        See :class:`~discogs_client.bulk.BulkInventory` for the accepted
+        listings and keyword arguments.
+
+        Returns
+        -------
+        list of RowResult
+        """
+        return self._bulk('add', listings, kwargs)
+
+    def bulk_change(self, listings, **kwargs):
+        """Change many listings through CSV uploads."""
+        return self._bulk('change', listings, kwargs)
+
+    def bulk_delete(self, listings, **kwargs):
+        """Delete many listings through CSV uploads."""
+        return self._bulk('delete', listings, kwargs)
+
+    def _bulk(self, action, listings, kwargs):
+        from discogs_client.bulk import BulkInventory
+        results = getattr(BulkInventory(self.client, **kwargs), action)(listings)
         self._invalidate()
+        return results
 
 
 class OrderMessagesList(PaginatedList):
@@ -460,8 +987,15 @@ class OrderMessagesList(PaginatedList):
             'email_buyer': email_buyer,
             'email_seller': email_seller,
         }
-        self.client._post(self.url, omit_none(data))
-        self._invalidate()
+        resp = self.client._post(self.url, omit_none(data))
+        if isinstance(resp, dict):
+            self._added(resp)
+        else:
+            self._invalidate()
+
+    def _insertion_index(self):
+        # The API lists the most recent messages first
+        return 0
 
 
 class MixedPaginatedList(BasePaginatedResponse):
@@ -480,6 +1014,29 @@ class MixedPaginatedList(BasePaginatedResponse):
         return CLASS_MAP[item['type']](self.client, item)
 
 
+class SearchResults(MixedPaginatedList):
+    """Results of a database search.
+
+    Pages are kept in the client's ``search_cache``, if it has one, under
+    their canonical URL, which includes the ``per_page``, sort and filter
+    state of the list.
+    """
+    def __init__(self, client, url):
+        super(SearchResults, self).__init__(client, url, 'results')
+
+    def _fetch_page(self, index):
+        cache = getattr(self.client, 'search_cache', None)
+        if cache is None:
+            return super(SearchResults, self)._fetch_page(index)
+        key = canonical_url(self._url_for_page(index))
+        content = cache.get(key)
+        if content is None:
+            content = json.dumps(super(SearchResults, self)._fetch_page(index))
+            cache.put(key, content)
+        # Decoded anew, so that changes to the objects don't reach the cache
+        return json.loads(content)
+
+
 class Artist(PrimaryAPIObject):
     """An object describing an artist"""
     id = SimpleField()  #:
@@ -865,10 +1422,41 @@ class Listing(PrimaryAPIObject):
     def price(self, value):
         self.changes['price'] = value
 
+    def _apply_changes(self):
+        # The price is changed by value, the currency stays
+        changes = dict(self.changes)
+        if 'price' in changes and isinstance(self.data.get('price'), dict):
+            self.data['price'] = dict(self.data['price'], value=changes.pop('price'))
+        self.changes = changes
+        super(Listing, self)._apply_changes()
+
     def __repr__(self):
         return '<Listing {0!r} {1!r}>'.format(self.id, self.release.data['description'])
 
 
+class InventoryUpload(PrimaryAPIObject):
+    """A CSV file uploaded to add, change or delete inventory listings."""
+    id = SimpleField()  #:
+    status = SimpleField()  #:
+    type = SimpleField()  #:
+    filename = SimpleField()  #:
+    results = SimpleField()  #:
+    created_ts = SimpleField()  #:
+    finished_ts = SimpleField()  #:
+
+    def __init__(self, client, dict_):
+        super(InventoryUpload, self).__init__(client, dict_)
+        self.data['resource_url'] = '{0}/inventory/upload/{1}'.format(client._base_url, dict_['id'])
+
+    @property
+    def pending(self):
+        """Whether Discogs is still processing the file."""
+        return self.fetch('status', '').lower() in ('pending', 'queued', 'processing')
+
+    def __repr__(self):
+        return '<InventoryUpload {0!r} {1!r}>'.format(self.id, self.status)
+
+
 class Order(PrimaryAPIObject):
     id = SimpleField()  #:
     next_status = SimpleField()  #:
@@ -898,6 +1486,13 @@ class Order(PrimaryAPIObject):
     def shipping(self, value):
         self.changes['shipping'] = value
 
+    def _apply_changes(self):
+        changes = dict(self.changes)
+        if 'shipping' in changes and isinstance(self.data.get('shipping'), dict):
+            self.data['shipping'] = dict(self.data['shipping'], value=changes.pop('shipping'))
+        self.changes = changes
+        super(Order, self)._apply_changes()
+
     def __repr__(self):
         return '<Order {0!r}>'.format(self.id)
 
@@ -996,6 +1591,7 @@ CLASS_MAP = {
     'track': Track,
     'user': User,
     'order': Order,
+    'inventoryupload': InventoryUpload,
     'list': List,
     'listitem': ListItem,
     'listing': Listing,
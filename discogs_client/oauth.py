@@ -0,0 +1,151 @@
+"""Signing requests with OAuth 1.0a.
+
+:class:`OAuthSigner` signs requests exactly like ``oauthlib.oauth1.Client.sign``,
+byte for byte, but does most of the work once per consumer and token instead
+of once per request::
+
+    signer = OAuthSigner(oauth1.Client(consumer_key, client_secret=consumer_secret,
+                                       resource_owner_key=token,
+                                       resource_owner_secret=secret))
+    uri, headers, body = signer.sign(url, http_method='GET', headers=headers)
+
+The escaped protocol parameters, the part of the ``Authorization`` header
+they make up and the HMAC key are prepared when the signer is created. For a
+request, only its query parameters, nonce, timestamp and body hash are
+escaped, the normalized parameters are not escaped character by character a
+second time, and the header is built once rather than built and parsed again.
+Base string URIs are cached, as the requests of a job usually go to few
+paths.
+
+The fast path covers what the API is used with: HMAC-SHA1 signatures in the
+``Authorization`` header, and requests without a body or with a JSON body.
+Anything else, such as the form-encoded requests for tokens, is signed by
+the oauthlib client itself. A signer never changes after it was created, so
+it can be shared between threads; build a new one when the token changes.
+"""
+import base64
+import hashlib
+import hmac
+from functools import lru_cache
+from urllib.parse import quote
+from oauthlib.common import generate_nonce, generate_timestamp, urldecode
+from oauthlib.oauth1 import SIGNATURE_HMAC_SHA1, SIGNATURE_TYPE_AUTH_HEADER
+from oauthlib.oauth1.rfc5849.signature import base_string_uri
+from oauthlib.oauth1.rfc5849.utils import unescape
+
+
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+
+def escape(value):
+    """Percent-encode a string as OAuth does (RFC 5849, section 3.6)."""
+    return quote(value, safe='~')
+
+
+@lru_cache(maxsize=1024)
+def _escaped_base_uri(uri, host):
+    return escape(base_string_uri(uri, host))
+
+
+class OAuthSigner:
+    """Signs requests for an ``oauthlib.oauth1.Client``.
+
+    Parameters
+    ----------
+    client : oauthlib.oauth1.Client
+        The client holding the consumer, token and settings. It must not be
+        changed while the signer is in use.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.fast = (client.signature_method == SIGNATURE_HMAC_SHA1
+                     and client.signature_type == SIGNATURE_TYPE_AUTH_HEADER
+                     and not client.realm and not client.decoding)
+        if not self.fast:
+            return
+        params = [
+            ('oauth_version', '1.0'),
+            ('oauth_signature_method', client.signature_method),
+            ('oauth_consumer_key', client.client_key),
+        ]
+        if client.resource_owner_key:
+            params.append(('oauth_token', client.resource_owner_key))
+        if client.callback_uri:
+            params.append(('oauth_callback', client.callback_uri))
+        if client.verifier:
+            params.append(('oauth_verifier', client.verifier))
+        self._params = [(escape(name), escape(value)) for name, value in params]
+        self._header = ''.join(', {0}="{1}"'.format(name, value) for name, value in self._params)
+        key = escape(client.client_secret or '') + '&' + escape(client.resource_owner_secret or '')
+        self._hmac = hmac.new(key.encode('utf-8'), digestmod=hashlib.sha1)
+
+    def _signs_fast(self, uri, body, headers):
+        """Whether a request is one oauthlib signs the way the fast path
+        does, returns its content type."""
+        if not self.fast or not isinstance(uri, str) or '#' in uri:
+            return False, None
+        content_type = None
+        for name, value in headers.items():
+            if not isinstance(name, str) or not isinstance(value, str):
+                return False, None
+            if name.lower() == 'content-type':
+                content_type = value
+        if content_type is not None and (FORM_CONTENT_TYPE in content_type
+                                         or content_type.startswith('multipart/')):
+            return False, None
+        # A JSON object or array never decodes as form parameters
+        if body is not None and not (isinstance(body, str) and body[:1] in ('{', '[')):
+            return False, None
+        return True, content_type
+
+    def sign(self, uri, http_method='GET', body=None, headers=None):
+        """Sign a request.
+
+        Returns
+        -------
+        tuple
+            The URI, the headers with the ``Authorization`` header and the
+            body, as returned by ``oauthlib.oauth1.Client.sign``.
+        """
+        headers = headers or {}
+        fast, content_type = self._signs_fast(uri, body, headers)
+        if not fast:
+            return self.client.sign(uri, http_method=http_method, body=body, headers=headers)
+
+        client = self.client
+        nonce = escape(generate_nonce() if client.nonce is None else client.nonce)
+        timestamp = escape(generate_timestamp() if client.timestamp is None else client.timestamp)
+        params = [('oauth_nonce', nonce), ('oauth_timestamp', timestamp)]
+        params.extend(self._params)
+        extra = ''
+        if body is not None and content_type:
+            body_hash = escape(base64.b64encode(hashlib.sha1(body.encode('utf-8')).digest()).decode('utf-8'))
+            params.append(('oauth_body_hash', body_hash))
+            extra = ', oauth_body_hash="{0}"'.format(body_hash)
+
+        base, _, query = uri.partition('?')
+        if query:
+            for name, value in urldecode(query):
+                if name == 'oauth_signature':
+                    continue
+                if name.startswith('oauth_'):
+                    value = unescape(value)
+                params.append((escape(name), escape(value)))
+        params.sort()
+        # The normalized parameters are escaped once more for the base
+        # string. Escaped names and values hold no other reserved character
+        # than '%', so that is done by replacing it, '=' and '&'.
+        normalized = '%26'.join(['{0}%3D{1}'.format(name.replace('%', '%25'), value.replace('%', '%25'))
+                                 for name, value in params])
+        base_string = '{0}&{1}&{2}'.format(escape(http_method.upper()),
+                                           _escaped_base_uri(base, headers.get('Host')),
+                                           normalized)
+
+        digest = self._hmac.copy()
+        digest.update(base_string.encode('utf-8'))
+        signature = escape(base64.b64encode(digest.digest()).decode('utf-8'))
+
+        signed = dict(headers)
+        signed['Authorization'] = 'OAuth oauth_nonce="{0}", oauth_timestamp="{1}"{2}{3}, oauth_signature="{4}"'.format(
+            nonce, timestamp, self._header, extra, signature)
+        return uri, signed, body
@@ -0,0 +1,271 @@
+"""Searching the Discogs database.
+
+Search parameters are brought into a canonical form by
+:func:`normalize_query`, so that equivalent searches request the same URL and
+can share the pages of a :class:`SearchCache`::
+
+    client.search_cache = SearchCache(ttl=600)
+    client.search('Nirvana  Nevermind')  # requests q=nirvana nevermind
+    client.search('nirvana nevermind')   # same pages, from the cache
+
+The API pages through no more than the first 10000 results of a search, so
+the results of broad queries are cut off. :class:`SearchEnumerator` splits
+such a query into partitions, by type, year range, format and country, until
+every partition fits into that window, and fetches all of them::
+
+    for result in client.search_all(genre='Electronic', style='Dub Techno'):
+        print(result)
+
+A partition's first page tells how many results it has. Partitions that fit
+are fetched completely, larger ones are split further and their results are
+read from their parts only. Every request is made with the maximum of 100
+results per page, and results are deduplicated by type and ID.
+
+Year, format and country only partition releases and masters. Results
+without a year, or with formats or countries not in :data:`FORMATS` and
+:data:`COUNTRIES`, are only found if their partition fits into the window
+without splitting by that facet. :attr:`SearchEnumerator.truncated` lists
+the searches whose results were not all found, with the number of results
+missing: partitions that cannot be split any further, which are fetched as
+far as the window allows, and partitions whose parts hold fewer results than
+they do. Releases of several formats count in several parts, so results
+missing from the parts of a format split can go unnoticed.
+"""
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from discogs_client import models
+from discogs_client.utils import update_qs
+
+
+#: Results the API pages through for a single search
+SEARCH_WINDOW = 10000
+TYPES = ('release', 'master', 'artist', 'label')
+FORMATS = (
+    'Vinyl', 'CD', 'Cassette', 'File', 'CDr', 'DVD', 'Box Set', 'Shellac',
+    'Flexi-disc', 'Lathe Cut', 'Reel-To-Reel', 'VHS', 'Blu-ray', 'SACD',
+    'Minidisc', 'All Media', '8-Track Cartridge', 'DVDr', 'Memory Stick',
+)
+COUNTRIES = (
+    'US', 'UK', 'Germany', 'France', 'Japan', 'Italy', 'Netherlands',
+    'Europe', 'Canada', 'Spain', 'Russia', 'Australia', 'Sweden', 'Belgium',
+    'Brazil', 'Poland', 'Finland', 'Greece', 'Switzerland', 'Mexico',
+    'Argentina', 'Denmark', 'Norway', 'Austria', 'Portugal', 'Ukraine',
+    'Czech Republic', 'Hungary', 'New Zealand', 'Ireland', 'Turkey',
+    'Yugoslavia', 'South Africa', 'Unknown', 'Worldwide',
+)
+FIRST_YEAR = 1860
+# Full-text search fields, matched regardless of case
+TEXT_FIELDS = ('q', 'query', 'title', 'release_title', 'credit', 'artist', 'anv', 'label',
+               'track', 'submitter', 'contributor')
+
+
+def normalize_query(fields):
+    """Bring search parameters into a canonical form.
+
+    Parameter names are lowercased and sorted, and runs of whitespace in the
+    values collapsed. Full-text fields are lowercased, since the search
+    ignores their case, and so is ``type``, whose comma-separated values are
+    also sorted. Filters such as ``genre`` or ``format`` keep their case.
+
+    Returns
+    -------
+    dict
+    """
+    normalized = {}
+    for name, value in fields.items():
+        name = name.strip().lower()
+        if isinstance(value, bytes):
+            value = value.decode()
+        if isinstance(value, str):
+            value = ' '.join(value.split())
+            if name in TEXT_FIELDS:
+                value = value.lower()
+            elif name == 'type':
+                value = ','.join(sorted(v.strip() for v in value.lower().split(',')))
+        normalized[name] = value
+    return dict(sorted(normalized.items()))
+
+
+class SearchCache:
+    """Keeps pages of search results for ``ttl`` seconds.
+
+    Set it as the ``search_cache`` of a :class:`.Client` to share the pages
+    between all searches of that client. When full, the least recently used
+    pages are evicted first.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Seconds a page is kept, by default 300.
+    maxsize : int, optional
+        Maximum number of pages kept, by default 1024.
+    """
+    def __init__(self, ttl=300.0, maxsize=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """The cached page for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, content):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _Split:
+    """A partition that was split, with the results found in its parts."""
+    def __init__(self, fields, count, parts):
+        self.fields = fields
+        self.count = count
+        self.parts = parts
+        self.found = 0
+
+
+class SearchEnumerator:
+    """Iterates over every result of a search, partitioning it as required.
+
+    Parameters
+    ----------
+    client : Client
+    fields : dict
+        Search parameters as passed to :meth:`.Client.search`.
+    concurrency : int, optional
+        Requests in progress at the same time, by default 4.
+    window : int, optional
+        Results the API pages through for a single search, by default
+        :data:`SEARCH_WINDOW`.
+    years : tuple of int, optional
+        First and last year to partition by, by default 1860 and the
+        current year.
+    """
+    per_page = 100
+
+    def __init__(self, client, fields, concurrency=4, window=SEARCH_WINDOW, years=None):
+        self.client = client
+        self.fields = fields
+        self.concurrency = concurrency
+        self.window = window
+        self.years = years or (FIRST_YEAR, datetime.date.today().year)
+        #: ``(fields, missing)`` pairs of the searches whose results were
+        #: not all found
+        self.truncated = []
+        self.requests = 0
+
+    def _list(self, fields):
+        params = dict(fields)
+        if isinstance(params.get('year'), tuple):
+            first, last = params['year']
+            params['year'] = str(first) if first == last else '{0}-{1}'.format(first, last)
+        lst = models.SearchResults(
+            self.client, update_qs(self.client._base_url + '/database/search', params))
+        lst.per_page = self.per_page
+        return lst
+
+    def split(self, fields):
+        """Partitions of a search, or None if it cannot be split any further."""
+        year = fields.get('year')
+        if isinstance(year, tuple) and year[0] < year[1]:
+            middle = (year[0] + year[1]) // 2
+            return [dict(fields, year=(year[0], middle)), dict(fields, year=(middle + 1, year[1]))]
+        if 'type' not in fields:
+            return [dict(fields, type=type_) for type_ in TYPES]
+        if fields['type'] not in ('release', 'master'):
+            return None
+        if 'year' not in fields:
+            return [dict(fields, year=self.years)]
+        if 'format' not in fields:
+            return [dict(fields, format=format_) for format_ in FORMATS]
+        if 'country' not in fields:
+            return [dict(fields, country=country) for country in COUNTRIES]
+        return None
+
+    def _page(self, fields, lst, index, parent=None):
+        return fields, lst, index, lst.page(index), parent
+
+    def _first_page(self, executor, fields, parent=None):
+        return executor.submit(self._page, fields, self._list(fields), 1, parent)
+
+    def _count_part(self, parent, count):
+        """Add up the results of the parts of a split partition, and record
+        those its parts miss once all of them are counted."""
+        parent.found += count
+        parent.parts -= 1
+        if parent.parts == 0 and parent.found < parent.count:
+            self.truncated.append((parent.fields, parent.count - parent.found))
+
+    def __iter__(self):
+        # Imported here, as most programs never enumerate a search
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+        seen = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = {self._first_page(executor, self.fields)}
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        fields, lst, index, page, parent = future.result()
+                        self.requests += 1
+                        if index == 1:
+                            if parent is not None:
+                                self._count_part(parent, lst.count)
+                            following, split = self._schedule(executor, fields, lst)
+                            pending |= following
+                            if split:
+                                # Its results are read from its parts
+                                continue
+                        for item in page:
+                            key = (item.data['type'], item.data['id'])
+                            if key not in seen:
+                                seen.add(key)
+                                yield item
+            finally:
+                # Stopped early, don't wait for pages nobody reads
+                for future in pending:
+                    future.cancel()
+
+    def _schedule(self, executor, fields, lst):
+        """Submit the requests following the first page of a partition.
+
+        Returns
+        -------
+        futures : set
+        split : bool
+            Whether the partition was split into parts.
+        """
+        if lst.count > self.window:
+            partitions = self.split(fields)
+            if partitions is not None:
+                parent = _Split(fields, lst.count, len(partitions))
+                return {self._first_page(executor, partition, parent)
+                        for partition in partitions}, True
+            self.truncated.append((fields, lst.count - self.window))
+        last_page = min(lst.pages, -(-self.window // self.per_page))
+        return {executor.submit(self._page, fields, lst, index)
+                for index in range(2, last_page + 1)}, False
@@ -0,0 +1,260 @@
+"""A local stand-in for the Discogs API.
+
+The server answers HTTP requests from any offline fetcher, such as a
+:class:`.FilesystemFetcher` pointed at the test fixtures, and behaves like
+api.discogs.com on the wire: it sends rate limit headers and 429s, compresses
+responses with gzip and keeps connections alive. This allows the real network
+path of :class:`.RequestsFetcher` and :class:`.OAuth2Fetcher` to be exercised
+and benchmarked without hitting the Discogs API.
+
+Run it from the command line to serve the bundled test fixtures::
+
+    python -m discogs_client.server --port 8000
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+from requests.exceptions import ReadTimeout
+from discogs_client.fetchers import FilesystemFetcher, SimulatedFetcher
+from discogs_client.utils import update_qs
+
+
+API_URL = b'https://api.discogs.com'
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'res')
+
+
+class _FetcherClient:
+    """Stands in for the Client object the offline fetchers expect."""
+    _base_url = ''
+
+
+class _ServerFetcher:
+    """Serves the lists registered with :meth:`LocalAPIServer.add_list` and
+    passes everything else on to the wrapped fetcher.
+
+    API URLs in the responses are rewritten to point to the local server. The
+    fixtures use URLs relative to the API root, recorded responses use
+    absolute ones.
+    """
+    def __init__(self, server, fetcher):
+        self.server = server
+        self.fetcher = fetcher
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        split = urlsplit(url)
+        if method == 'GET' and split.path in self.server.lists:
+            return self.server._page_of_list(split.path, split.query)
+        content, status_code = self.fetcher.fetch(client, method, url, data, headers, json)
+        if isinstance(content, str):
+            content = content.encode('utf8')
+        base_url = self.server.base_url.encode('utf8')
+        content = content.replace(b'_url": "/', b'_url": "' + base_url + b'/')
+        content = content.replace(API_URL, base_url)
+        return content, status_code
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep connections alive
+
+    def do_GET(self):
+        self.server.api.respond(self, 'GET')
+
+    def do_POST(self):
+        self.server.api.respond(self, 'POST')
+
+    def do_PUT(self):
+        self.server.api.respond(self, 'PUT')
+
+    def do_PATCH(self):
+        self.server.api.respond(self, 'PATCH')
+
+    def do_DELETE(self):
+        self.server.api.respond(self, 'DELETE')
+
+    def log_message(self, format, *args):
+        if self.server.api.verbose:
+            super().log_message(format, *args)
+
+
+class LocalAPIServer:
+    """Serves responses of an offline fetcher over real sockets.
+
+    Parameters
+    ----------
+    fetcher : Fetcher, optional
+        Offline fetcher producing the responses, by default a
+        :class:`.FilesystemFetcher` serving the bundled test fixtures.
+    host : str, optional
+        Interface to bind to, by default ``'127.0.0.1'``.
+    port : int, optional
+        Port to bind to, by default 0 (pick a free port).
+    gzip_enabled : bool, optional
+        Compress responses if the client accepts gzip, by default True.
+    stall : float, optional
+        Seconds to stall before dropping a request that was selected to time
+        out, by default 30.
+    **simulation
+        Keyword arguments for the :class:`.SimulatedFetcher` wrapping
+        ``fetcher``, e.g. ``latency``, ``rate_limit``, ``error_rate`` or
+        ``seed``. Rate limiting defaults to the API's 60 requests per minute.
+
+    Examples
+    --------
+    >>> with LocalAPIServer(rate_limit=10000) as server:
+    ...     client = Client('ExampleApplication/0.1')
+    ...     client._base_url = server.base_url
+    ...     client.artist(1).name
+    'Persuader, The'
+    """
+    def __init__(self, fetcher=None, host='127.0.0.1', port=0, gzip_enabled=True,
+                 stall=30.0, verbose=False, **simulation):
+        if fetcher is None:
+            fetcher = FilesystemFetcher(FIXTURES_PATH)
+        simulation.setdefault('realtime', True)
+        self.fetcher = SimulatedFetcher(_ServerFetcher(self, fetcher), **simulation)
+        self.fetcher.backoff_enabled = False  # 429s go to the client
+        self.fetcher.read_timeout = stall
+        self.gzip_enabled = gzip_enabled
+        self.verbose = verbose
+        self.lists = {}
+        self.requests_served = 0
+        self._client = _FetcherClient()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _RequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.api = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """Use as a Client's ``_base_url`` to direct its requests here."""
+        host, port = self._httpd.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def add_list(self, path, key, items):
+        """Serve ``items`` as a paginated list at ``path``.
+
+        Requests are answered with the page selected by the ``page`` and
+        ``per_page`` query parameters, wrapped in a ``pagination`` block like
+        the one of the Discogs API.
+        """
+        self.lists[path] = (key, items)
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests and close the socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _page_of_list(self, path, query):
+        key, items = self.lists[path]
+        params = dict(parse_qsl(query))
+        page = int(params.get('page', 1))
+        per_page = int(params.get('per_page', 50))
+        pages = max(1, math.ceil(len(items) / per_page))
+        if not 1 <= page <= pages:
+            return json.dumps({'message': 'Page not found.'}).encode('utf8'), 404
+
+        url = self.base_url + path
+        urls = {}
+        if page < pages:
+            urls['next'] = update_qs(url, {'page': page + 1, 'per_page': per_page})
+            urls['last'] = update_qs(url, {'page': pages, 'per_page': per_page})
+        if page > 1:
+            urls['first'] = update_qs(url, {'page': 1, 'per_page': per_page})
+            urls['prev'] = update_qs(url, {'page': page - 1, 'per_page': per_page})
+        body = {
+            'pagination': {
+                'page': page,
+                'pages': pages,
+                'per_page': per_page,
+                'items': len(items),
+                'urls': urls,
+            },
+            key: items[(page - 1) * per_page:page * per_page],
+        }
+        return json.dumps(body).encode('utf8'), 200
+
+    def respond(self, handler, method):
+        """Answer a request received by ``handler``."""
+        split = urlsplit(handler.path)
+        # Authentication is not checked, drop the user token from the query
+        query = '&'.join(p for p in split.query.split('&') if p and not p.startswith('token='))
+        url = split.path + ('?' + query if query else '')
+
+        length = int(handler.headers.get('Content-Length') or 0)
+        data = handler.rfile.read(length) if length else None
+
+        try:
+            resp = self.fetcher.request(self._client, method, url, data,
+                                        dict(handler.headers), True)
+        except ReadTimeout:
+            # The fetcher stalled past its read timeout, hang up without answer
+            handler.close_connection = True
+            return
+
+        content, status_code = resp.content, resp.status_code
+        with self._lock:
+            self.requests_served += 1
+
+        handler.send_response(status_code)
+        for name, value in resp.headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Type', 'application/json')
+        if self.gzip_enabled and 'gzip' in handler.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content)
+            handler.send_header('Content-Encoding', 'gzip')
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve Discogs API responses locally.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--fixtures', default=FIXTURES_PATH,
+                        help='directory in the FilesystemFetcher layout')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=60)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    server = LocalAPIServer(
+        FilesystemFetcher(args.fixtures), host=args.host, port=args.port,
+        verbose=args.verbose, latency=args.latency, jitter=args.jitter,
+        rate_limit=args.rate_limit, error_rate=args.error_rate, seed=args.seed,
+    )
+    print('Serving Discogs API stand-in at {0}'.format(server.base_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Incremental synchronization of wantlists, inventories and collections.
+
+Walking a large wantlist, inventory or collection folder costs one request per
+page, on every sync. :class:`ListSync` instead sorts the list newest first and
+only requests pages until it reaches items it already knows. It remembers the
+newest date seen, the *high-water mark*, and a fingerprint of every item, and
+reports what was added, changed and removed since the last sync::
+
+    sync = ListSync.wantlist(client.user('example'), 'wantlist.json')
+    for event in sync.sync():
+        print(event.type, event.key)
+
+Items that changed without moving to the front of the list, and removals that
+the item count does not reveal, are only found by walking the complete list.
+This *full reconciliation* happens on the first sync, whenever the item count
+does not add up, and every ``full_every`` seconds.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from discogs_client.utils import parse_timestamp, write_atomic
+
+
+#: A change found by :meth:`ListSync.sync`. ``type`` is one of ``'added'``,
+#: ``'changed'`` or ``'removed'``, ``key`` identifies the item and ``item``
+#: is the model object, or None for removed items.
+SyncEvent = namedtuple('SyncEvent', ['type', 'key', 'item'])
+
+
+def fingerprint(data):
+    """A short hash of the content of an item's data."""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf8')
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+class ListSync:
+    """Keeps track of the changes of a paginated list between syncs.
+
+    Use :meth:`wantlist`, :meth:`inventory` or :meth:`collection` to create
+    one with the right settings for these lists.
+
+    Parameters
+    ----------
+    paginated_list : PaginatedList
+        The list to synchronize. It is sorted by ``sort`` in descending order.
+    state_path : str, optional
+        JSON file keeping the state between syncs. Without it, the state only
+        lives as long as this object.
+    key : str
+        Item attribute identifying an item in the list.
+    date_key : str
+        Item attribute holding the date the item was added to the list.
+    sort : str
+        Sort key of the list ordering it by ``date_key``.
+    full_every : float, optional
+        Seconds between full reconciliations, by default a week. None only
+        reconciles when required.
+    per_page : int, optional
+        Items per request, by default the API's maximum of 100.
+    clock : callable, optional
+        Returns the current time in seconds, by default :func:`time.time`.
+    """
+    def __init__(self, paginated_list, state_path=None, key='id', date_key='date_added',
+                 sort='added', full_every=7 * 24 * 3600, per_page=100, clock=time.time):
+        self.list = paginated_list
+        self.state_path = state_path
+        self.key = key
+        self.date_key = date_key
+        self.sort = sort
+        self.full_every = full_every
+        self.per_page = per_page
+        self.clock = clock
+        self.state = self._load()
+
+    @classmethod
+    def wantlist(cls, user, state_path=None, **kwargs):
+        """Synchronize the wantlist of a :class:`.User`."""
+        return cls(user.wantlist, state_path, key='id', date_key='date_added',
+                   sort='added', **kwargs)
+
+    @classmethod
+    def inventory(cls, user, state_path=None, **kwargs):
+        """Synchronize the inventory of a :class:`.User`."""
+        return cls(user.inventory, state_path, key='id', date_key='posted',
+                   sort='listed', **kwargs)
+
+    @classmethod
+    def collection(cls, folder, state_path=None, **kwargs):
+        """Synchronize the releases of a :class:`.CollectionFolder`."""
+        return cls(folder.releases, state_path, key='instance_id', date_key='date_added',
+                   sort='added', **kwargs)
+
+    def _load(self):
+        if self.state_path is not None and os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {'high_water': None, 'last_full': None, 'items': {}}
+
+    def save(self):
+        """Write the state to ``state_path``, replacing it atomically."""
+        if self.state_path is None:
+            return
+        write_atomic(self.state_path, json.dumps(self.state))
+
+    def reset(self):
+        """Forget the state, the next sync reports every item as added."""
+        self.state = {'high_water': None, 'last_full': None, 'items': {}}
+
+    @property
+    def full_due(self):
+        """Whether the next sync reconciles the complete list."""
+        last_full = self.state['last_full']
+        if last_full is None or self.state['high_water'] is None:
+            return True
+        return self.full_every is not None and self.clock() - last_full >= self.full_every
+
+    def _pages(self):
+        """Yield the pages of the list, newest first."""
+        page_index = 1
+        while page_index <= self.list.pages:
+            yield self.list.page(page_index)
+            page_index += 1
+
+    def sync(self, full=None):
+        """Fetch the changes since the last sync and save the new state.
+
+        Parameters
+        ----------
+        full : bool, optional
+            Walk the complete list even if no full reconciliation is due, or,
+            if False, skip a reconciliation that is due by schedule.
+
+        Returns
+        -------
+        list of SyncEvent
+        """
+        if full is None:
+            full = self.full_due
+        self.list.per_page = self.per_page
+        self.list.sort(self.sort, 'desc')
+        items = dict(self.state['items'])
+        high_water = self.state['high_water']
+        mark = parse_timestamp(high_water) if high_water else None
+
+        events = []
+        seen = set()
+        newest = high_water
+        reached_known = False
+        for page in self._pages():
+            for item in page:
+                key = str(item.data[self.key])
+                date = item.data.get(self.date_key)
+                if date and (newest is None or parse_timestamp(date) > parse_timestamp(newest)):
+                    newest = date
+                if key in seen:
+                    # Shifted to the next page by an item added during the walk
+                    continue
+                seen.add(key)
+                digest = fingerprint(item.data)
+                if key not in items:
+                    events.append(SyncEvent('added', key, item))
+                elif items[key] != digest:
+                    events.append(SyncEvent('changed', key, item))
+                items[key] = digest
+                if mark is not None and date and parse_timestamp(date) < mark:
+                    reached_known = True
+            if reached_known and not full:
+                # The remaining pages are older than the high-water mark.
+                # If they lost items, the count tells.
+                if self.list.count == len(items):
+                    break
+                full = True
+        else:
+            # Walked the complete list
+            full = True
+
+        if full:
+            for key in [key for key in items if key not in seen]:
+                del items[key]
+                events.append(SyncEvent('removed', key, None))
+            self.state['last_full'] = self.clock()
+        self.state['items'] = items
+        self.state['high_water'] = newest
+        self.save()
+        return events
@@ -0,0 +1,587 @@
+"""Deterministic synthetic data shaped like Discogs API responses.
+
+The test fixtures cover a handful of objects, which is too small to reveal
+how the client scales. :class:`SyntheticDataset` describes a catalog and a set
+of users of any size and generates every object on demand, so a dataset of a
+million releases costs no memory until its responses are requested. The same
+seed always produces the same data.
+
+Feed a :class:`.MemoryFetcher`, or write the responses to a directory in the
+layout expected by :class:`.FilesystemFetcher`::
+
+    dataset = SyntheticDataset(seed=1, releases=10**6)
+    dataset.add_user('example', collection=100000, wantlist=20000, inventory=50000)
+    client._fetcher = MemoryFetcher(dataset.responses())
+
+    dataset.write_filesystem('res', dataset.list_urls('/users/example/wants', 20000))
+"""
+import json
+import math
+import os
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qsl
+from discogs_client.utils import update_qs
+
+
+WORDS = (
+    'acid', 'after', 'blue', 'city', 'dance', 'deep', 'dream', 'echo', 'electric',
+    'fire', 'floor', 'funk', 'garden', 'gold', 'heart', 'house', 'jazz', 'light',
+    'love', 'machine', 'midnight', 'moon', 'night', 'ocean', 'paradise', 'power',
+    'rain', 'rhythm', 'river', 'shadow', 'silver', 'soul', 'space', 'star', 'storm',
+    'summer', 'sun', 'system', 'time', 'underground', 'velvet', 'voice', 'wave',
+)
+GENRES = {
+    'Electronic': ('Techno', 'House', 'Ambient', 'Trance', 'Electro'),
+    'Rock': ('Punk', 'Indie Rock', 'Alternative Rock', 'Prog Rock'),
+    'Jazz': ('Hard Bop', 'Fusion', 'Free Jazz'),
+    'Hip Hop': ('Boom Bap', 'Instrumental', 'Conscious'),
+    'Funk / Soul': ('Disco', 'Soul', 'Funk'),
+}
+FORMATS = (
+    ('Vinyl', ('LP', 'Album')), ('Vinyl', ('12"', '33 ⅓ RPM')), ('CD', ('Album',)),
+    ('Cassette', ('Album',)), ('File', ('MP3', 'Album')),
+)
+COUNTRIES = ('US', 'UK', 'Germany', 'France', 'Japan', 'Netherlands', 'Sweden', 'Italy')
+CONDITIONS = (
+    'Mint (M)', 'Near Mint (NM or M-)', 'Very Good Plus (VG+)', 'Very Good (VG)',
+    'Good Plus (G+)',
+)
+ROLES = ('Producer', 'Written-By', 'Mixed By', 'Mastered By', 'Vocals', 'Remix',
+         'Engineer', 'Artwork')
+EPOCH = datetime(2010, 1, 1, tzinfo=timezone(timedelta(hours=-8)))
+
+
+class SyntheticDataset:
+    """A deterministic catalog of releases, masters, artists and labels, plus
+    users with collections, wantlists and inventories.
+
+    Parameters
+    ----------
+    seed : int, optional
+        Seed for all generated data, by default 0.
+    releases, masters, artists, labels : int, optional
+        Number of objects of each type in the catalog. IDs run from 1 to the
+        given number.
+    tracks : tuple, optional
+        Minimum and maximum length of a release's tracklist.
+    credits : tuple, optional
+        Minimum and maximum number of release-level credits.
+    search_results : int, optional
+        Number of results of any search, by default 10000.
+    base_url : str, optional
+        Prefix for URLs inside the generated data, by default ``''`` which
+        matches clients with an empty ``_base_url`` as used in the tests.
+    """
+    def __init__(self, seed=0, releases=100000, masters=20000, artists=20000,
+                 labels=5000, tracks=(4, 40), credits=(0, 30), search_results=10000,
+                 base_url=''):
+        self.seed = seed
+        self.num_releases = releases
+        self.num_masters = masters
+        self.num_artists = artists
+        self.num_labels = labels
+        self.tracks = tracks
+        self.credits = credits
+        self.search_results = search_results
+        self.base_url = base_url
+        self.users = {}
+        self._stubs = {}  # artists and labels are bounded, memoize their summaries
+        self._objects = (
+            (re.compile(r'/releases/(\d+)$'), lambda arg: self.release(int(arg))),
+            (re.compile(r'/masters/(\d+)$'), lambda arg: self.master(int(arg))),
+            (re.compile(r'/artists/(\d+)$'), lambda arg: self.artist(int(arg))),
+            (re.compile(r'/labels/(\d+)$'), lambda arg: self.label(int(arg))),
+            (re.compile(r'/users/([^/]+)$'), self.user),
+            (re.compile(r'/users/([^/]+)/collection/folders$'), self.collection_folders),
+        )
+        self._lists = (
+            (re.compile(r'/masters/(\d+)/versions$'), self._versions),
+            (re.compile(r'/artists/(\d+)/releases$'), self._artist_releases),
+            (re.compile(r'/labels/(\d+)/releases$'), self._label_releases),
+            (re.compile(r'/users/([^/]+)/collection/folders/0/releases$'), self._collection),
+            (re.compile(r'/users/([^/]+)/wants$'), self._wantlist),
+            (re.compile(r'/users/([^/]+)/inventory$'), self._inventory),
+            (re.compile(r'/database/search()$'), self._search),
+        )
+
+    def add_user(self, username, collection=0, wantlist=0, inventory=0):
+        """Add a user with collection, wantlist and inventory of the given
+        sizes."""
+        self.users[username] = {
+            'collection': collection,
+            'wantlist': wantlist,
+            'inventory': inventory,
+        }
+
+    # Random helpers
+
+    def _random(self, *key):
+        # Seeding with a string is stable across processes and Python versions
+        return random.Random('{0}:{1}'.format(self.seed, ':'.join(str(k) for k in key)))
+
+    def _title(self, rnd, words=(1, 3)):
+        return ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(*words))).title()
+
+    def _url(self, path):
+        return self.base_url + path
+
+    def _timestamp(self, rnd, after=EPOCH):
+        return (after + timedelta(seconds=rnd.randint(0, 10 ** 8))).isoformat()
+
+    # Objects
+
+    def artist_stub(self, artist_id):
+        """The artist summary embedded in releases."""
+        stub = self._stubs.get(('artist', artist_id))
+        if stub is None:
+            rnd = self._random('artist', artist_id)
+            stub = self._stubs[('artist', artist_id)] = {
+                'id': artist_id,
+                'name': self._title(rnd, (1, 2)),
+                'anv': '',
+                'join': '',
+                'role': '',
+                'tracks': '',
+                'resource_url': self._url('/artists/{0}'.format(artist_id)),
+            }
+        return dict(stub)
+
+    def label_stub(self, label_id):
+        """The label summary embedded in releases."""
+        stub = self._stubs.get(('label', label_id))
+        if stub is None:
+            rnd = self._random('label', label_id)
+            stub = self._stubs[('label', label_id)] = {
+                'id': label_id,
+                'name': self._title(rnd, (1, 2)) + ' Records',
+                'catno': '{0}{1:03d}'.format(
+                    ''.join(rnd.choice('ABCDEFGHKLMNPRSTX') for _ in range(3)),
+                    rnd.randint(1, 999)),
+                'entity_type': '1',
+                'resource_url': self._url('/labels/{0}'.format(label_id)),
+            }
+        return dict(stub)
+
+    def basic_information(self, release_id):
+        """The release summary embedded in collection and wantlist items."""
+        rnd = self._random('release', release_id)
+        genre = rnd.choice(sorted(GENRES))
+        fmt, descriptions = rnd.choice(FORMATS)
+        master_id = rnd.randint(1, self.num_masters) if self.num_masters else 0
+        return {
+            'id': release_id,
+            'master_id': master_id,
+            'master_url': self._url('/masters/{0}'.format(master_id)) if master_id else None,
+            'resource_url': self._url('/releases/{0}'.format(release_id)),
+            'title': self._title(rnd),
+            'year': rnd.randint(1960, 2024),
+            'thumb': '',
+            'cover_image': '',
+            'formats': [{'name': fmt, 'qty': '1', 'descriptions': list(descriptions)}],
+            'labels': [self.label_stub(rnd.randint(1, self.num_labels))],
+            'artists': [self.artist_stub(rnd.randint(1, self.num_artists))],
+            'genres': [genre],
+            'styles': rnd.sample(GENRES[genre], 2),
+        }
+
+    def release(self, release_id):
+        """A full release as returned by ``/releases/{id}``."""
+        if not 1 <= release_id <= self.num_releases:
+            return None
+        data = self.basic_information(release_id)
+        rnd = self._random('release-details', release_id)
+        num_tracks = rnd.randint(*self.tracks)
+        tracklist = []
+        for i in range(num_tracks):
+            track = {
+                'position': '{0}{1}'.format('AB'[i * 2 // max(num_tracks, 1)], i + 1),
+                'type_': 'track',
+                'title': self._title(rnd),
+                'duration': '{0}:{1:02d}'.format(rnd.randint(2, 9), rnd.randint(0, 59)),
+            }
+            if rnd.random() < 0.3:
+                track['extraartists'] = [dict(self.artist_stub(rnd.randint(1, self.num_artists)),
+                                              role=rnd.choice(ROLES))]
+            tracklist.append(track)
+        data.update({
+            'status': 'Accepted',
+            'uri': 'https://www.discogs.com/release/{0}'.format(release_id),
+            'artists_sort': data['artists'][0]['name'],
+            'companies': [],
+            'data_quality': 'Correct',
+            'community': {
+                'have': rnd.randint(0, 5000),
+                'want': rnd.randint(0, 5000),
+                'rating': {'count': rnd.randint(0, 500), 'average': round(rnd.uniform(1, 5), 2)},
+                'submitter': {'username': 'user{0}'.format(rnd.randint(1, 1000))},
+                'contributors': [],
+                'data_quality': 'Correct',
+                'status': 'Accepted',
+            },
+            'format_quantity': 1,
+            'date_added': self._timestamp(rnd),
+            'date_changed': self._timestamp(rnd),
+            'num_for_sale': rnd.randint(0, 100),
+            'lowest_price': round(rnd.uniform(1, 100), 2),
+            'country': rnd.choice(COUNTRIES),
+            'released': str(data['year']),
+            'notes': '',
+            'identifiers': [],
+            'videos': [],
+            'images': [],
+            'tracklist': tracklist,
+            'extraartists': [
+                dict(self.artist_stub(rnd.randint(1, self.num_artists)), role=rnd.choice(ROLES))
+                for _ in range(rnd.randint(*self.credits))
+            ],
+            'estimated_weight': 230,
+        })
+        return data
+
+    def master(self, master_id):
+        """A master release as returned by ``/masters/{id}``."""
+        if not 1 <= master_id <= self.num_masters:
+            return None
+        rnd = self._random('master', master_id)
+        main_release = rnd.randint(1, self.num_releases)
+        data = self.release(main_release)
+        data.update({
+            'id': master_id,
+            'main_release': main_release,
+            'main_release_url': self._url('/releases/{0}'.format(main_release)),
+            'versions_url': self._url('/masters/{0}/versions'.format(master_id)),
+            'resource_url': self._url('/masters/{0}'.format(master_id)),
+            'uri': 'https://www.discogs.com/master/{0}'.format(master_id),
+        })
+        return data
+
+    def artist(self, artist_id):
+        """An artist as returned by ``/artists/{id}``."""
+        if not 1 <= artist_id <= self.num_artists:
+            return None
+        rnd = self._random('artist-details', artist_id)
+        data = self.artist_stub(artist_id)
+        for key in ('anv', 'join', 'role', 'tracks'):
+            del data[key]
+        data.update({
+            'realname': self._title(rnd, (2, 2)),
+            'profile': self._title(rnd, (5, 20)),
+            'namevariations': [self._title(rnd, (1, 2)) for _ in range(rnd.randint(0, 3))],
+            'aliases': [self.artist_stub(rnd.randint(1, self.num_artists))
+                        for _ in range(rnd.randint(0, 3))],
+            'members': [self.artist_stub(rnd.randint(1, self.num_artists))
+                        for _ in range(rnd.randint(0, 4) if rnd.random() < 0.2 else 0)],
+            'urls': [],
+            'images': [],
+            'data_quality': 'Correct',
+            'uri': 'https://www.discogs.com/artist/{0}'.format(artist_id),
+            'releases_url': self._url('/artists/{0}/releases'.format(artist_id)),
+        })
+        return data
+
+    def label(self, label_id):
+        """A label as returned by ``/labels/{id}``."""
+        if not 1 <= label_id <= self.num_labels:
+            return None
+        rnd = self._random('label-details', label_id)
+        data = self.label_stub(label_id)
+        del data['catno'], data['entity_type']
+        data.update({
+            'profile': self._title(rnd, (5, 20)),
+            'contact_info': '',
+            'urls': [],
+            'images': [],
+            'sublabels': [self.label_stub(rnd.randint(1, self.num_labels))
+                          for _ in range(rnd.randint(0, 3))],
+            'data_quality': 'Correct',
+            'uri': 'https://www.discogs.com/label/{0}'.format(label_id),
+            'releases_url': self._url('/labels/{0}/releases'.format(label_id)),
+        })
+        return data
+
+    def user(self, username):
+        """A user profile as returned by ``/users/{username}``."""
+        if username not in self.users:
+            return None
+        sizes = self.users[username]
+        rnd = self._random('user', username)
+        resource_url = self._url('/users/{0}'.format(username))
+        return {
+            'id': rnd.randint(1, 10 ** 7),
+            'username': username,
+            'name': self._title(rnd, (2, 2)),
+            'profile': '',
+            'location': rnd.choice(COUNTRIES),
+            'home_page': '',
+            'registered': self._timestamp(rnd),
+            'rank': rnd.randint(0, 1000),
+            'rating_avg': round(rnd.uniform(4, 5), 2),
+            'releases_contributed': rnd.randint(0, 100),
+            'num_collection': sizes['collection'],
+            'num_wantlist': sizes['wantlist'],
+            'num_lists': 0,
+            'resource_url': resource_url,
+            'uri': 'https://www.discogs.com/user/{0}'.format(username),
+            'inventory_url': resource_url + '/inventory',
+            'wantlist_url': resource_url + '/wants',
+            'collection_folders_url': resource_url + '/collection/folders',
+        }
+
+    def collection_folders(self, username):
+        """The folders of a user's collection. All items are in the
+        "Uncategorized" folder."""
+        if username not in self.users:
+            return None
+        count = self.users[username]['collection']
+        url = self._url('/users/{0}/collection/folders'.format(username))
+        return {'folders': [
+            {'id': 0, 'name': 'All', 'count': count, 'resource_url': url + '/0'},
+            {'id': 1, 'name': 'Uncategorized', 'count': count, 'resource_url': url + '/1'},
+        ]}
+
+    # List items. Item ``index`` of a list is generated independently of the
+    # others, so any page can be produced in O(per_page).
+
+    def _release_for(self, *key):
+        return self._random(*key).randint(1, self.num_releases)
+
+    def _date_added(self, index, count):
+        # Newest items first, one item every 6 hours on average
+        return (EPOCH + timedelta(hours=6 * (count - index))).isoformat()
+
+    def collection_item(self, username, index):
+        count = self.users[username]['collection']
+        release_id = self._release_for('collection', username, index)
+        rnd = self._random('collection-item', username, index)
+        return {
+            'id': release_id,
+            'instance_id': 10 ** 8 + index,
+            'folder_id': 1,
+            'rating': rnd.randint(0, 5),
+            'date_added': self._date_added(index, count),
+            'basic_information': self.basic_information(release_id),
+        }
+
+    def want(self, username, index):
+        count = self.users[username]['wantlist']
+        release_id = self._release_for('want', username, index)
+        rnd = self._random('want', username, index)
+        return {
+            'id': release_id,
+            'resource_url': self._url('/users/{0}/wants/{1}'.format(username, release_id)),
+            'rating': rnd.randint(0, 5),
+            'notes': '',
+            'date_added': self._date_added(index, count),
+            'basic_information': self.basic_information(release_id),
+        }
+
+    def listing(self, username, index):
+        count = self.users[username]['inventory']
+        release_id = self._release_for('listing', username, index)
+        rnd = self._random('listing', username, index)
+        info = self.basic_information(release_id)
+        listing_id = 10 ** 9 + index
+        return {
+            'id': listing_id,
+            'resource_url': self._url('/marketplace/listings/{0}'.format(listing_id)),
+            'uri': 'https://www.discogs.com/sell/item/{0}'.format(listing_id),
+            'status': 'For Sale',
+            'condition': rnd.choice(CONDITIONS),
+            'sleeve_condition': rnd.choice(CONDITIONS),
+            'comments': '',
+            'ships_from': 'Germany',
+            'posted': self._date_added(index, count),
+            'allow_offers': rnd.random() < 0.5,
+            'audio': False,
+            'price': {'value': round(rnd.uniform(1, 200), 2), 'currency': 'EUR'},
+            'seller': {'id': 1, 'username': username,
+                       'resource_url': self._url('/users/{0}'.format(username))},
+            'release': {
+                'id': release_id,
+                'description': '{0} - {1}'.format(info['artists'][0]['name'], info['title']),
+                'resource_url': info['resource_url'],
+                'year': info['year'],
+                'title': info['title'],
+                'artist': info['artists'][0]['name'],
+                'format': info['formats'][0]['name'],
+                'catalog_number': info['labels'][0]['catno'],
+                'thumb': '',
+            },
+        }
+
+    def search_result(self, query, index):
+        rnd = self._random('search', query, index)
+        kind = rnd.choice(('release', 'release', 'release', 'master', 'artist', 'label'))
+        limit = {'release': self.num_releases, 'master': self.num_masters,
+                 'artist': self.num_artists, 'label': self.num_labels}[kind]
+        object_id = rnd.randint(1, limit)
+        result = {
+            'id': object_id,
+            'type': kind,
+            'resource_url': self._url('/{0}s/{1}'.format(kind, object_id)),
+            'uri': '/{0}/{1}'.format(kind, object_id),
+            'thumb': '',
+            'cover_image': '',
+        }
+        if kind in ('artist', 'label'):
+            result['title'] = self._title(rnd, (1, 2))
+            return result
+        info = self.basic_information(object_id)
+        result.update({
+            'title': '{0} - {1}'.format(info['artists'][0]['name'], info['title']),
+            'year': str(info['year']),
+            'country': rnd.choice(COUNTRIES),
+            'format': [info['formats'][0]['name']] + info['formats'][0]['descriptions'],
+            'label': [info['labels'][0]['name']],
+            'genre': info['genres'],
+            'style': info['styles'],
+            'catno': info['labels'][0]['catno'],
+            'barcode': [],
+            'community': {'want': rnd.randint(0, 500), 'have': rnd.randint(0, 500)},
+        })
+        if kind == 'release':
+            result['master_id'] = info['master_id']
+        return result
+
+    # Paginated lists: (list key, number of items, item factory), or None if
+    # the list does not exist
+
+    def _versions(self, master_id, params):
+        master_id = int(master_id)
+        if not 1 <= master_id <= self.num_masters:
+            return None
+        count = self._random('versions', master_id).randint(1, 60)
+        return 'versions', count, lambda i: self.basic_information(
+            self._release_for('version', master_id, i))
+
+    def _artist_releases(self, artist_id, params):
+        artist_id = int(artist_id)
+        if not 1 <= artist_id <= self.num_artists:
+            return None
+        count = self._random('artist-releases', artist_id).randint(1, 200)
+        return 'releases', count, lambda i: dict(
+            self.basic_information(self._release_for('artist-release', artist_id, i)),
+            type='release', role='Main')
+
+    def _label_releases(self, label_id, params):
+        label_id = int(label_id)
+        if not 1 <= label_id <= self.num_labels:
+            return None
+        count = self._random('label-releases', label_id).randint(1, 500)
+        return 'releases', count, lambda i: self.basic_information(
+            self._release_for('label-release', label_id, i))
+
+    def _collection(self, username, params):
+        if username not in self.users:
+            return None
+        return 'releases', self.users[username]['collection'], \
+            lambda i: self.collection_item(username, i)
+
+    def _wantlist(self, username, params):
+        if username not in self.users:
+            return None
+        return 'wants', self.users[username]['wantlist'], lambda i: self.want(username, i)
+
+    def _inventory(self, username, params):
+        if username not in self.users:
+            return None
+        return 'listings', self.users[username]['inventory'], lambda i: self.listing(username, i)
+
+    def _search(self, _, params):
+        query = '&'.join('{0}={1}'.format(k, v) for k, v in sorted(params.items())
+                         if k not in ('page', 'per_page'))
+        return 'results', self.search_results, lambda i: self.search_result(query, i)
+
+    def page(self, path, key, count, factory, page=1, per_page=50):
+        """A page of a list in the shape the Discogs API returns it, or None
+        if the page is out of range."""
+        pages = max(1, math.ceil(count / per_page))
+        if not 1 <= page <= pages:
+            return None
+        url = self._url(path)
+        urls = {}
+        if page < pages:
+            urls['last'] = update_qs(url, {'page': pages, 'per_page': per_page})
+            urls['next'] = update_qs(url, {'page': page + 1, 'per_page': per_page})
+        if page > 1:
+            urls['first'] = update_qs(url, {'page': 1, 'per_page': per_page})
+            urls['prev'] = update_qs(url, {'page': page - 1, 'per_page': per_page})
+        first = (page - 1) * per_page
+        return {
+            'pagination': {'page': page, 'pages': pages, 'per_page': per_page,
+                           'items': count, 'urls': urls},
+            key: [factory(i) for i in range(first, min(first + per_page, count))],
+        }
+
+    def get(self, url):
+        """The decoded response body for an API URL, or None if the URL does
+        not resolve to anything in the dataset."""
+        if url.startswith(self.base_url):
+            url = url[len(self.base_url):]
+        split = urlsplit(url)
+        for pattern, factory in self._objects:
+            match = pattern.match(split.path)
+            if match:
+                return factory(match.group(1))
+        for pattern, factory in self._lists:
+            match = pattern.match(split.path)
+            if match:
+                params = dict(parse_qsl(split.query))
+                spec = factory(match.group(1), params)
+                if spec is None:
+                    return None
+                key, count, item = spec
+                return self.page(split.path, key, count, item,
+                                 int(params.get('page', 1)), int(params.get('per_page', 50)))
+        return None
+
+    def responses(self):
+        """A lazy mapping of URL -> (content, status_code) for a
+        :class:`.MemoryFetcher`."""
+        return SyntheticResponses(self)
+
+    def list_urls(self, path, count, per_page=50):
+        """The page URLs of a list of ``count`` items at ``path``."""
+        for page in range(1, max(1, math.ceil(count / per_page)) + 1):
+            yield update_qs(self._url(path), {'page': page, 'per_page': per_page})
+
+    def write_filesystem(self, base_path, urls):
+        """Write the responses for ``urls`` into ``base_path`` in the layout
+        of a :class:`.FilesystemFetcher`. Returns the number of files written.
+        """
+        written = 0
+        for url in urls:
+            body = self.get(url)
+            if body is None:
+                continue
+            name = url[len(self.base_url):].lstrip('/').replace('?', '_') + '.json'
+            path = os.path.join(base_path, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(body, f)
+            written += 1
+        return written
+
+
+class SyntheticResponses:
+    """Looks like the dict of responses a :class:`.MemoryFetcher` expects,
+    but generates the responses on demand."""
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def get(self, url, default=None):
+        body = self.dataset.get(url)
+        if body is None:
+            return default
+        return json.dumps(body).encode('utf8'), 200
+
+    def __getitem__(self, url):
+        response = self.get(url)
+        if response is None:
+            raise KeyError(url)
+        return response
+
+    def __contains__(self, url):
+        return self.dataset.get(url) is not None
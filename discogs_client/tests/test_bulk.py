@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+import unittest
+from discogs_client import Client, Condition
+from discogs_client.bulk import BulkInventory
+from discogs_client.exceptions import DiscogsAPIError
+from discogs_client.models import InventoryUpload, Listing
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class UploadFetcher:
+    """Accepts inventory uploads and reports results after a few polls"""
+    def __init__(self, results='', status='success', polls=2, with_id=False):
+        self.results = results
+        self.status = status
+        self.polls = polls
+        self.with_id = with_id
+        self.uploads = []
+        self.requests = []
+
+    def upload(self, id_):
+        filename, _, _ = self.uploads[id_ - 1]
+        return {'id': id_, 'type': 'change', 'filename': filename, 'results': self.results,
+                'status': 'pending' if self.polls else self.status}
+
+    def fetch(self, client, method, url, data=None, headers=None, json_format=True):
+        self.requests.append((method, url))
+        if method == 'POST':
+            assert not json_format
+            content_type = headers['Content-Type']
+            assert content_type.startswith('multipart/form-data; boundary=')
+            head, csv_file = data.split(b'\r\n\r\n', 1)
+            filename = head.decode('utf8').split('filename="')[1].split('"')[0]
+            csv_file = csv_file.rsplit(b'\r\n--', 1)[0].decode('utf8')
+            self.uploads.append((filename, url, list(csv.DictReader(io.StringIO(csv_file)))))
+            if self.with_id:
+                return json.dumps(self.upload(len(self.uploads))).encode('utf8'), 200
+            return b'', 200
+        if url == '/inventory/upload':
+            items = [self.upload(i) for i in range(len(self.uploads), 0, -1)]
+            return json.dumps({'items': items}).encode('utf8'), 200
+        self.polls -= 1
+        return json.dumps(self.upload(int(url.rsplit('/', 1)[1]))).encode('utf8'), 200
+
+
+class BulkTestCase(DiscogsClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fetcher = UploadFetcher()
+        self.client = Client('ua')
+        self.client._base_url = ''
+        self.client._fetcher = self.fetcher
+        self.bulk = BulkInventory(self.client, batch_size=2, poll_interval=0)
+
+    def listing(self, id_):
+        return Listing(self.client, {
+            'id': id_, 'status': 'For Sale', 'condition': 'Mint (M)', 'allow_offers': False,
+            'price': {'value': 10.0, 'currency': 'EUR'}, 'comments': '',
+            'release': {'id': 1000 + id_, 'description': 'Release'},
+            'posted': '2020-01-01T10:00:00-07:00',
+        })
+
+    def test_add(self):
+        """Dicts are uploaded in batches and every row gets a result"""
+        items = [
+            {'release': 1, 'price': 9.99, 'condition': Condition.MINT, 'allow_offers': True},
+            {'release_id': 2, 'price': 5, 'media_condition': 'Good (G)', 'comments': 'a, "b"'},
+            {'release': 3, 'price': 1, 'condition': Condition.POOR},
+        ]
+        results = self.bulk.add(items)
+        self.assertEqual([r.ok for r in results], [True, True, True])
+        self.assertEqual([r.item for r in results], items)
+
+        self.assertEqual(len(self.fetcher.uploads), 2)
+        filename, url, rows = self.fetcher.uploads[0]
+        self.assertTrue(filename.startswith('add-'))
+        self.assertEqual(url, '/inventory/upload/add')
+        self.assertEqual(rows, [
+            {'release_id': '1', 'price': '9.99', 'media_condition': 'Mint (M)',
+             'comments': '', 'accept_offer': 'Y'},
+            {'release_id': '2', 'price': '5', 'media_condition': 'Good (G)',
+             'comments': 'a, "b"', 'accept_offer': ''},
+        ])
+        self.assertEqual(list(self.fetcher.uploads[1][2][0]), ['release_id', 'price', 'media_condition'])
+
+        self.assertRaises(ValueError, self.bulk.add, [{'release': 1, 'price': 2}])
+
+    def test_change_listings(self):
+        """Listing objects are uploaded with their changes, which are applied
+        after the upload succeeded"""
+        self.fetcher.with_id = True
+        self.fetcher.results = 'CSV file contains 2 records.\nLine 3: Invalid price.'
+        listings = [self.listing(1), self.listing(2)]
+        for listing in listings:
+            listing.price = 12.5
+        results = self.bulk.change(listings)
+
+        _, url, rows = self.fetcher.uploads[0]
+        self.assertEqual(url, '/inventory/upload/change')
+        self.assertEqual(rows[0], {'listing_id': '1', 'release_id': '1001', 'price': '12.5',
+                                   'media_condition': 'Mint (M)', 'comments': '',
+                                   'accept_offer': 'N'})
+        self.assertEqual(results[0].ok, True)
+        self.assertEqual(results[1], (listings[1], False, 'Line 3: Invalid price.'))
+        self.assertEqual(listings[0].price.value, 12.5)
+        self.assertEqual(listings[0].data['price'], {'value': 12.5, 'currency': 'EUR'})
+        self.assertEqual(listings[0].changes, {})
+        self.assertEqual(listings[1].changes, {'price': 12.5})
+        self.assertFalse(any(url == '/inventory/upload' for _, url in self.fetcher.requests))
+
+    def test_delete_failed(self):
+        """A failed upload fails every row"""
+        self.fetcher.status = 'failure'
+        self.fetcher.results = 'Invalid CSV file.'
+        user = self.client.user('example')
+        user.data['inventory_url'] = '/users/example/inventory'
+        results = user.inventory.bulk_delete([self.listing(1), {'id': 2}], poll_interval=0)
+        self.assertEqual(self.fetcher.uploads[0][2], [{'listing_id': '1'}, {'listing_id': '2'}])
+        self.assertEqual([r.ok for r in results], [False, False])
+        self.assertEqual(results[0].message, 'Invalid CSV file.')
+
+    def test_pending(self):
+        """Uploads still pending after the timeout have no result"""
+        self.fetcher.polls = 100
+        self.bulk.timeout = 0
+        results = self.bulk.delete([{'listing_id': 1}])
+        self.assertEqual(results[0].ok, None)
+
+        upload = self.client.inventory_upload(1)
+        self.assertTrue(isinstance(upload, InventoryUpload))
+        self.assertTrue(upload.pending)
+
+    def test_upload_not_found(self):
+        """An upload missing from the recent uploads raises an error"""
+        self.fetcher.upload = lambda id_: {'id': id_, 'filename': 'other.csv'}
+        self.assertRaises(DiscogsAPIError, self.bulk.delete, [{'listing_id': 1}])
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(BulkTestCase)
+    return suite
@@ -0,0 +1,225 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from discogs_client import Client
+from discogs_client.cli import main
+from discogs_client.exceptions import TooManyAttemptsError
+from discogs_client.fetchers import MemoryFetcher, RateLimitedFetcher
+from discogs_client.synthetic import SyntheticDataset
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class FailingFetcher:
+    """Answers with a server error, or another response, for URLs containing
+    ``fail``, once"""
+    def __init__(self, fetcher, fail, response=(b'{"message": "Internal server error."}', 500)):
+        self.fetcher = fetcher
+        self.fail = fail
+        self.response = response
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        if self.fail and self.fail in url:
+            self.fail = None
+            return self.response
+        return self.fetcher.fetch(client, method, url, data, headers, json)
+
+
+class ConcurrencyFetcher:
+    """Records the most requests in progress at the same time"""
+    def __init__(self, fetcher, delay=0.01):
+        self.fetcher = fetcher
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return self.fetcher.fetch(client, method, url, data, headers, json)
+
+
+class CommandLineTestCase(DiscogsClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = SyntheticDataset(seed=5, releases=500, search_results=250)
+        self.dataset.add_user('example', collection=30, wantlist=20, inventory=12)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def client(self, fail=None, **kwargs):
+        client = Client('ua')
+        client._base_url = ''
+        client._fetcher = FailingFetcher(MemoryFetcher(self.dataset.responses()), fail, **kwargs)
+        return client
+
+    def run_main(self, *argv, client=None):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            status = main(['--rate', '0'] + list(argv), client=client or self.client())
+        return status, stderr.getvalue()
+
+    def read_lines(self, name):
+        with open(self.path(name)) as f:
+            return [json.loads(line) for line in f]
+
+    def test_export(self):
+        """Lists are exported completely"""
+        status, stderr = self.run_main('export', 'wantlist', '--user', 'example',
+                                       '--per-page', '7', '-o', self.path('wants.jsonl'))
+        self.assertEqual(status, 0)
+        self.assertEqual(self.read_lines('wants.jsonl'),
+                         [self.dataset.want('example', i) for i in range(20)])
+        self.assertTrue('Wrote 20 items' in stderr)
+
+        self.run_main('export', 'collection', '--user', 'example', '--fields',
+                      'instance_id,basic_information.title', '-o', self.path('collection.csv'))
+        with open(self.path('collection.csv'), newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0]['basic_information.title'],
+                         self.dataset.collection_item('example', 0)['basic_information']['title'])
+
+        self.run_main('export', 'inventory', '--user', 'example', '-o', self.path('inventory.jsonl'))
+        self.assertEqual(len(self.read_lines('inventory.jsonl')), 12)
+
+    def test_export_resume(self):
+        """An interrupted export continues from its checkpoint"""
+        argv = ['export', 'wantlist', '--user', 'example', '--per-page', '6',
+                '--checkpoint', self.path('wants.checkpoint'), '-o', self.path('wants.csv')]
+        status, stderr = self.run_main(*argv, client=self.client(fail='page=3'))
+        self.assertEqual(status, 1)
+        self.assertTrue('500' in stderr)
+        with open(self.path('wants.checkpoint')) as f:
+            cursor = json.load(f)
+        self.assertEqual(cursor['page'], 3)
+        self.assertEqual(cursor['last_id'], self.dataset.want('example', 11)['id'])
+
+        status, _ = self.run_main(*argv)
+        self.assertEqual(status, 0)
+        with open(self.path('wants.csv'), newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([int(row['id']) for row in rows],
+                         [self.dataset.want('example', i)['id'] for i in range(20)])
+        self.assertFalse(os.path.exists(self.path('wants.checkpoint')))
+
+        # Checkpoints of other jobs are rejected
+        with open(self.path('other.checkpoint'), 'w') as f:
+            json.dump({'url': '/users/other/wants', 'per_page': 50, 'sort': None,
+                       'sort_order': 'asc', 'filters': {}, 'page': 2, 'last_id': 1}, f)
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, self.run_main, 'export', 'wantlist', '--user', 'example',
+                              '--checkpoint', self.path('other.checkpoint'))
+
+    def test_export_concurrency(self):
+        """The pages of a list are fetched --concurrency at a time"""
+        client = self.client()
+        client._fetcher = fetcher = ConcurrencyFetcher(client._fetcher)
+        status, _ = self.run_main('--concurrency', '3', 'export', 'wantlist', '--user', 'example',
+                                  '--per-page', '2', '--prefetch', '4', '-o', self.path('wants.jsonl'),
+                                  client=client)
+        self.assertEqual(status, 0)
+        self.assertEqual(self.read_lines('wants.jsonl'),
+                         [self.dataset.want('example', i) for i in range(20)])
+        self.assertEqual(fetcher.max_active, 3)
+
+    def test_job_failure(self):
+        """Errors during a job are reported as its failure, not as usage
+        errors"""
+        argv = ['export', 'wantlist', '--user', 'example', '--per-page', '6',
+                '-o', self.path('wants.jsonl')]
+        client = self.client(fail='page=2', response=(b'{"wants": [', 200))
+        status, stderr = self.run_main(*argv, client=client)
+        self.assertEqual(status, 1)
+        self.assertTrue(stderr.startswith('Job failed: '))
+        self.assertEqual(len(self.read_lines('wants.jsonl')), 6)
+
+        class RateLimitedOut(FailingFetcher):
+            def fetch(self, client, method, url, data=None, headers=None, json=True):
+                if 'page=2' in url:
+                    raise TooManyAttemptsError()
+                return super().fetch(client, method, url, data, headers, json)
+
+        client = self.client()
+        client._fetcher = RateLimitedOut(client._fetcher, None)
+        status, stderr = self.run_main(*argv, client=client)
+        self.assertEqual(status, 1)
+        self.assertTrue(stderr.startswith('Job failed: Failed to make request'))
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, self.run_main, 'export', 'collection', '--user', 'example',
+                              '--folder', '99')
+
+    def test_parquet_resume(self):
+        """Parquet exports cannot be resumed, which is found before the file
+        is opened"""
+        with open(self.path('wants.checkpoint'), 'w') as f:
+            json.dump({'url': '/users/example/wants', 'per_page': 100, 'sort': None,
+                       'sort_order': 'asc', 'filters': {}, 'page': 2, 'last_id': 1}, f)
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, self.run_main, 'export', 'wantlist', '--user', 'example',
+                              '--checkpoint', self.path('wants.checkpoint'),
+                              '-o', self.path('wants.parquet'))
+        self.assertFalse(os.path.exists(self.path('wants.parquet')))
+
+    def test_search(self):
+        """Search results are exported up to the end of the search"""
+        status, _ = self.run_main('search', 'deep house', '-f', 'type=release', '--fields', 'id,type',
+                                  '-o', self.path('search.jsonl'))
+        self.assertEqual(status, 0)
+        results = self.read_lines('search.jsonl')
+        self.assertEqual(len(results), 250)
+        self.assertEqual(list(results[0]), ['id', 'type'])
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, self.run_main, 'search', '-f', 'type')
+
+    def test_hydrate(self):
+        """IDs are fetched concurrently and written in order, failures are
+        reported"""
+        with open(self.path('ids.txt'), 'w') as f:
+            f.write('# releases\n3\n\n1\n9999\n' + ''.join('{0}\n'.format(i) for i in range(10, 130)))
+        argv = ['--concurrency', '3', 'hydrate', self.path('ids.txt'), '-o', self.path('releases.jsonl'),
+                '--checkpoint', self.path('ids.checkpoint')]
+        status, stderr = self.run_main(*argv)
+        self.assertEqual(status, 1)
+        self.assertTrue('release 9999' in stderr)
+        releases = self.read_lines('releases.jsonl')
+        self.assertEqual([r['id'] for r in releases], [3, 1] + list(range(10, 130)))
+        self.assertEqual(releases[0], self.dataset.release(3))
+
+        # Resumed after an interruption
+        os.remove(self.path('releases.jsonl'))
+        with open(self.path('ids.checkpoint'), 'w') as f:
+            json.dump({'job': 'hydrate release ' + self.path('ids.txt'), 'position': 100, 'count': 99}, f)
+        self.run_main(*argv)
+        self.assertEqual([r['id'] for r in self.read_lines('releases.jsonl')], list(range(107, 130)))
+
+    def test_rate_limit(self):
+        """Requests are rate limited unless disabled"""
+        client = self.client()
+        with contextlib.redirect_stderr(io.StringIO()):
+            main(['--rate', '1000', 'export', 'wantlist', '--user', 'example',
+                  '-o', self.path('wants.jsonl')], client=client)
+        self.assertTrue(isinstance(client._fetcher, RateLimitedFetcher))
+        self.assertEqual(client._fetcher.rate, 1000)
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(CommandLineTestCase)
+    return suite
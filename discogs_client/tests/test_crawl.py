@@ -0,0 +1,143 @@
+import os
+import tempfile
+import threading
+import unittest
+from discogs_client import Client
+from discogs_client.crawl import CoordinatorServer, CrawlQueue, CrawlWorker, JSONLinesSink, \
+    RemoteQueue, SQLiteSink
+from discogs_client.exceptions import LeaseLostError
+from discogs_client.fetchers import MemoryFetcher
+from discogs_client.synthetic import SyntheticDataset
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class FailingFetcher:
+    """Answers with a server error for the URLs in ``fail``, once each"""
+    def __init__(self, fetcher, fail=()):
+        self.fetcher = fetcher
+        self.fail = set(fail)
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        if url in self.fail:
+            self.fail.discard(url)
+            return b'{"message": "Internal server error."}', 500
+        return self.fetcher.fetch(client, method, url, data, headers, json)
+
+
+class CrawlTestCase(DiscogsClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.now = 0.0
+        self.dataset = SyntheticDataset(seed=2, releases=300, masters=10)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def queue(self, **kwargs):
+        return CrawlQueue(self.path('crawl.db'), clock=lambda: self.now, **kwargs)
+
+    def client(self, fail=()):
+        client = Client('ua')
+        client._base_url = ''
+        client._fetcher = FailingFetcher(MemoryFetcher(self.dataset.responses()), fail)
+        return client
+
+    def test_leases(self):
+        """Units are leased once, retried after failures and taken over
+        after their lease expired"""
+        queue = self.queue(lease_time=60, max_attempts=2)
+        self.assertEqual(queue.add_range('/releases/{id}', 1, 250, size=100), 3)
+        first, second = queue.lease('a'), queue.lease('b')
+        self.assertEqual((first.first, first.last, second.first, second.last), (1, 100, 101, 200))
+
+        second = queue.progress(second, 'b', 150)
+        queue.fail(second, 'b', 'Server error')
+        retried = queue.lease('c')
+        self.assertEqual((retried.id, retried.position, retried.attempts), (second.id, 150, 1))
+
+        self.now = 61
+        taken = queue.lease('d')
+        self.assertEqual(taken.id, first.id)
+        self.assertRaises(LeaseLostError, queue.progress, first, 'a', 50)
+        queue.complete(first, 'a')  # ignored, the lease is gone
+        self.assertEqual(queue.stats(), {'pending': 1, 'leased': 2, 'done': 0, 'failed': 0})
+
+        queue.fail(retried, 'c', 'Server error')
+        self.assertEqual(queue.failures()[0][1], 'Server error')
+        queue.complete(taken, 'd')
+        self.assertEqual(queue.stats(), {'pending': 1, 'leased': 0, 'done': 1, 'failed': 1})
+
+    def test_steal(self):
+        """Without pending units, the second half of a range is stolen"""
+        queue = self.queue(steal_min=100)
+        queue.add_range('/releases/{id}', 1, 1000)
+        victim = queue.progress(queue.lease('a'), 'a', 201)
+        stolen = queue.lease('b')
+        self.assertEqual((stolen.first, stolen.last, stolen.position), (601, 1000, 601))
+        self.assertEqual(queue.progress(victim, 'a', 210).last, 600)
+
+        # Ranges too small are left alone
+        queue.progress(victim, 'a', 560)
+        queue.progress(stolen, 'b', 950)
+        self.assertEqual(queue.lease('c'), None)
+
+    def test_budget(self):
+        """The rate budget is shared by every queue on the file"""
+        queues = [self.queue(), self.queue()]
+        delays = [queues[i % 2].reserve(3, 10) for i in range(7)]
+        self.assertEqual(delays, [0, 0, 0, 10, 10, 10, 20])
+        self.now = 12
+        self.assertEqual(queues[0].reserve(3, 10), 8)
+
+    def test_workers(self):
+        """Workers in parallel fetch every ID once, following pages"""
+        queue = self.queue()
+        queue.add_range('/releases/{id}', 1, 320, size=40)
+        queue.add_urls(['/masters/3/versions?per_page=5'])
+        versions = self.dataset.get('/masters/3/versions')['pagination']['items']
+
+        sink = SQLiteSink(self.path('results.db'))
+        workers = [CrawlWorker(self.client(fail={'/releases/77'}), self.queue(), sink,
+                               name=str(i), concurrency=3, rate=None) for i in range(3)]
+        threads = [threading.Thread(target=worker.run) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # The failed unit comes back
+        CrawlWorker(self.client(), queue, sink, rate=None).run()
+
+        self.assertEqual(queue.stats()['done'], 9)
+        self.assertEqual(sum(worker.missing for worker in workers), 20)
+        self.assertEqual(len(sink), 300 + -(-versions // 5))
+        self.assertEqual(sink.get('/releases/77'), self.dataset.release(77))
+        self.assertEqual(sink.get('/masters/3/versions?page=2&per_page=5')['pagination']['page'], 2)
+
+    def test_remote_queue(self):
+        """Workers on other machines use the queue through the coordinator"""
+        with CoordinatorServer(self.queue()) as server:
+            remote = RemoteQueue(server.url)
+            remote.add_range('/releases/{id}', 1, 30, size=10)
+            sink = JSONLinesSink(self.path('results.jsonl'))
+            worker = CrawlWorker(self.client(), remote, sink, rate=1000, per=1.0)
+            self.assertEqual(worker.run(), 3)
+            sink.close()
+            self.assertEqual(remote.stats()['done'], 3)
+
+            unit = remote.lease('other')
+            self.assertEqual(unit, None)
+            remote.add_urls(['/releases/1'])
+            unit = remote.lease('a')
+            self.assertRaises(LeaseLostError, remote.progress, unit, 'b')
+            remote.close()
+        with open(self.path('results.jsonl')) as f:
+            self.assertEqual(len(f.readlines()), 30)
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(CrawlTestCase)
+    return suite
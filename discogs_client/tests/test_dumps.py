@@ -0,0 +1,185 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from discogs_client import dumps
+from discogs_client.dumps import DumpReader, DumpStore, DumpFetcher
+from discogs_client.models import Artist, Label, Master, Release
+from discogs_client.exceptions import HTTPError
+from discogs_client.tests import DiscogsClientTestCase
+
+
+RELEASES = b'''<releases>
+<release id="1" status="Accepted"><images><image height="600" type="primary" uri="" uri150="" width="600"/></images><artists><artist><id>1</id><name>The Persuader</name><anv/><join/><role/><tracks/></artist></artists><title>Stockholm</title><labels><label catno="SK032" id="5" name="Svek"/></labels><extraartists><artist><id>239</id><name>Jesper Dahlb\xc3\xa4ck</name><anv/><join/><role>Music By [All Tracks By]</role><tracks/></artist></extraartists><formats><format name="Vinyl" qty="2" text=""><descriptions><description>12"</description><description>33 \xe2\x85\x93 RPM</description></descriptions></format></formats><genres><genre>Electronic</genre></genres><styles><style>Deep House</style></styles><country>Sweden</country><released>1999-03-00</released><notes>The &lt;release&gt; notes</notes><data_quality>Complete and Correct</data_quality><master_id is_main_release="true">5427</master_id><tracklist><track><position>A</position><title>\xc3\x96stermalm</title><duration>4:45</duration></track><track><position>B1</position><title>Vasastaden</title><duration>6:11</duration><extraartists><artist><id>2</id><name>Mr. James Barth &amp; A.D.</name><anv/><join/><role>Remix</role><tracks/></artist></extraartists></track></tracklist><identifiers><identifier description="A-Side" type="Matrix / Runout" value="MPO SK 032 A1"/></identifiers><videos><video duration="290" embed="true" src="https://www.youtube.com/watch?v=AHuQWcylaU4"><title>The Persuader - \xc3\x96stermalm</title><description>\xc3\x96stermalm</description></video></videos><companies/></release>
+<release id="2" status="Accepted"><artists><artist><id>2</id><name>Mr. James Barth &amp; A.D.</name><anv/><join/><role/><tracks/></artist></artists><title>Knockin' Boots Vol 2 Of 2</title><labels><label catno="SK 026" id="5" name="Svek"/></labels><formats><format name="Vinyl" qty="1" text=""/></formats><genres><genre>Electronic</genre></genres><country>Sweden</country><released>1998</released><tracklist/></release>
+<release id="3" status="Accepted"><title>Profound Sounds Vol. 1</title><released/><tracklist/></release>
+</releases>
+'''
+
+ARTISTS = b'''<artists><artist><images/><id>1</id><name>The Persuader</name><realname>Jesper Dahlb\xc3\xa4ck</realname><profile/><data_quality>Needs Vote</data_quality><urls><url>https://example.org</url></urls><namevariations><name>Persuader</name></namevariations><aliases><name id="239">Jesper Dahlb\xc3\xa4ck</name></aliases></artist><artist><id>2</id><name>Mr. James Barth &amp; A.D.</name><members><id>26</id><name id="26">Alexi Delano</name></members></artist></artists>'''
+
+LABELS = b'''<labels><label><images/><id>1</id><name>Planet E</name><contactinfo>Detroit</contactinfo><profile>Carl Craig's label</profile><data_quality>Correct</data_quality><urls><url>http://planet-e.net</url></urls><sublabels><label id="86537">Antidote (4)</label><label id="41841">Community Projects</label></sublabels></label><label><id>86537</id><name>Antidote (4)</name><parentLabel id="1">Planet E</parentLabel></label></labels>'''
+
+MASTERS = b'''<masters><master id="18500"><main_release>155102</main_release><artists><artist><id>212070</id><name>Samuel L Session</name><anv/><join/><role/><tracks/></artist></artists><genres><genre>Electronic</genre></genres><styles><style>Techno</style></styles><year>2001</year><title>New Soil</title><data_quality>Correct</data_quality></master></masters>'''
+
+
+class DumpsTestCase(DiscogsClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = {}
+        for kind, content in (('releases', RELEASES), ('artists', ARTISTS),
+                              ('labels', LABELS), ('masters', MASTERS)):
+            path = os.path.join(self.directory.name, 'discogs_20240101_{0}.xml'.format(kind))
+            with open(path, 'wb') as f:
+                f.write(content)
+            with gzip.open(path + '.gz', 'wb') as f:
+                f.write(content)
+            self.paths[kind] = path
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_releases(self):
+        """Releases are parsed into dicts shaped like the API's"""
+        releases = list(DumpReader(self.paths['releases'], self.d))
+        self.assertEqual([r.id for r in releases], [1, 2, 3])
+        r = releases[0]
+        self.assertTrue(isinstance(r, Release))
+        self.assertEqual(r.title, 'Stockholm')
+        self.assertEqual(r.year, 1999)
+        self.assertEqual(r.notes, 'The <release> notes')
+        self.assertEqual(r.artists[0].name, 'The Persuader')
+        self.assertEqual(r.credits[0].role, 'Music By [All Tracks By]')
+        self.assertEqual(r.labels[0].catno, 'SK032')
+        self.assertEqual(r.formats[0]['descriptions'], ['12"', '33 ⅓ RPM'])
+        self.assertEqual(r.tracklist[1].credits[0].name, 'Mr. James Barth & A.D.')
+        self.assertEqual(r.videos[0].duration, 290)
+        self.assertEqual(r.master.id, 5427)
+        self.assertEqual(r.data['resource_url'], '/releases/1')
+        self.assertEqual(releases[2].year, 0)
+        self.assertTrue(releases[2].master is None)
+
+        # Data missing from the dump does not cause requests
+        self.assertTrue(r.fetch('community') is None)
+        self.assertEqual(len(self.d._fetcher.requests), 0)
+
+    def test_other_dumps(self):
+        """Artists, labels and masters dumps are detected and parsed"""
+        artists = list(DumpReader(self.paths['artists'], self.d))
+        self.assertTrue(isinstance(artists[0], Artist))
+        self.assertEqual(artists[0].real_name, 'Jesper Dahlbäck')
+        self.assertEqual(artists[0].aliases[0].id, 239)
+        self.assertEqual(artists[1].members[0].name, 'Alexi Delano')
+
+        labels = list(DumpReader(self.paths['labels'], self.d))
+        self.assertEqual(len(labels), 2)
+        self.assertTrue(isinstance(labels[0], Label))
+        self.assertEqual([l.id for l in labels[0].sublabels], [86537, 41841])
+        self.assertEqual(labels[1].parent_label.name, 'Planet E')
+        self.assertEqual(labels[0].contact_info, 'Detroit')
+
+        masters = list(DumpReader(self.paths['masters'], self.d))
+        self.assertTrue(isinstance(masters[0], Master))
+        self.assertEqual(masters[0].main_release.id, 155102)
+        self.assertEqual(masters[0].year, 2001)
+
+        self.assertRaises(ValueError, lambda: DumpReader(self.paths['masters'], kind='tracks'))
+
+    def test_gzip_and_small_blocks(self):
+        """Gzipped dumps and records spanning read blocks are handled"""
+        expected = list(DumpReader(self.paths['releases']).dicts())
+        self.assertEqual(list(DumpReader(self.paths['releases'] + '.gz').dicts()), expected)
+
+        block_size = dumps.BLOCK_SIZE
+        try:
+            dumps.BLOCK_SIZE = 7
+            self.assertEqual(list(DumpReader(self.paths['releases']).dicts()), expected)
+            self.assertEqual(len(list(DumpReader(self.paths['labels']).dicts())), 2)
+        finally:
+            dumps.BLOCK_SIZE = block_size
+
+    def test_split(self):
+        """Every record is in exactly one of the byte ranges"""
+        reader = DumpReader(self.paths['releases'])
+        expected = list(reader.dicts())
+        for parts in (1, 2, 3, 7, 50):
+            records = []
+            for start, end in reader.split(parts):
+                records.extend(reader.dicts(start, end))
+            self.assertEqual(records, expected)
+        self.assertRaises(ValueError, lambda: DumpReader(self.paths['releases'] + '.gz').split(2))
+
+    def test_map(self):
+        """Records can be parsed in worker processes"""
+        for path in (self.paths['releases'], self.paths['releases'] + '.gz'):
+            reader = DumpReader(path)
+            self.assertEqual(list(reader.map(processes=2, batch_size=2)), list(reader.dicts()))
+
+        # Uncompressed dumps are parsed in ranges of a fixed size
+        range_size = dumps.RANGE_SIZE
+        dumps.RANGE_SIZE = 300
+        try:
+            reader = DumpReader(self.paths['releases'])
+            self.assertTrue(os.path.getsize(reader.path) > 3 * dumps.RANGE_SIZE)
+            self.assertEqual(list(reader.map(processes=2)), list(reader.dicts()))
+        finally:
+            dumps.RANGE_SIZE = range_size
+
+    def test_store_and_fetcher(self):
+        """A Client answers requests from a DumpStore, and falls back to
+        its previous fetcher for everything else"""
+        store_path = os.path.join(self.directory.name, 'store')
+        for processes in (1, 2):
+            store = DumpStore.build(store_path, list(self.paths.values()), base_url='',
+                                    processes=processes)
+            self.assertEqual(sorted(store.kinds), ['artists', 'labels', 'masters', 'releases'])
+            self.assertEqual(len(store), 8)
+            self.assertTrue(store.get('releases', 2).startswith(b'{"id":2,'))
+            self.assertTrue(store.get('releases', 4) is None)
+            self.assertTrue(store.get('labels', 41841) is None)
+            store.close()
+
+        fallback = self.d._fetcher
+        self.d._fetcher = DumpFetcher(store_path, fallback=fallback)
+        self.assertEqual(self.d.release(1).title, 'Stockholm')
+        self.assertEqual(self.d.label(86537).parent_label.id, 1)
+        self.assertEqual(self.d.master(18500).title, 'New Soil')
+        self.assertEqual(self.d._fetcher.hits, 3)
+        self.assertEqual(len(fallback.requests), 0)
+
+        # Not in the dump
+        self.assertEqual(self.d.release(79).title, 'City Of Islands')
+        self.assertEqual(fallback.last_request[1], '/releases/79')
+        self.assertEqual(self.d.user('example').location, 'Example Town, Exampland')
+        self.assertEqual(fallback.last_request[1], '/users/example')
+
+        # Settings go to the fallback
+        self.d._fetcher = DumpFetcher(store_path, fallback=fallback.fetcher)
+        self.d.backoff_enabled = False
+        self.assertFalse(fallback.fetcher.backoff_enabled)
+
+        self.d._fetcher = DumpFetcher(store_path)
+        self.assertRaises(HTTPError, lambda: self.d.release(79).title)
+
+    def test_store_unsorted_dump(self):
+        """The index is sorted even if the dump is not"""
+        path = os.path.join(self.directory.name, 'unsorted_releases.xml')
+        with open(path, 'wb') as f:
+            f.write(b'<releases><release id="30" status="Accepted"><title>C</title></release>'
+                    b'<release id="10" status="Accepted"><title>A</title></release>'
+                    b'<release id="20" status="Accepted"><title>B</title></release></releases>')
+        store = DumpStore.build(os.path.join(self.directory.name, 'store'), [path], processes=1)
+        for id_, title in ((10, 'A'), (20, 'B'), (30, 'C')):
+            self.assertEqual(json.loads(store.get('releases', id_))['title'], title)
+        store.close()
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite = unittest.TestLoader().loadTestsFromTestCase(DumpsTestCase)
+    return suite
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+from discogs_client import Client
+from discogs_client.export import WRITERS
+from discogs_client.fetchers import LoggingDelegator, MemoryFetcher
+from discogs_client.synthetic import SyntheticDataset
+from discogs_client.tests import DiscogsClientTestCase
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class ExportTestCase(DiscogsClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = SyntheticDataset(seed=3)
+        self.dataset.add_user('example', collection=230, wantlist=20)
+        self.client = Client('ua')
+        self.client._base_url = ''
+        self.client._fetcher = LoggingDelegator(MemoryFetcher(self.dataset.responses()))
+        self.user = self.client.user('example')
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_jsonl(self):
+        """Items are written as raw dicts, without caching pages"""
+        releases = self.user.collection_folders[0].releases
+        self.assertEqual(releases.export(self.path('collection.jsonl')), 230)
+        with open(self.path('collection.jsonl')) as f:
+            items = [json.loads(line) for line in f]
+        expected = [self.dataset.collection_item('example', i) for i in range(230)]
+        self.assertEqual(items, expected)
+        self.assertEqual(releases._pages, {})
+        self.assertEqual(len(self.client._fetcher.requests), 7)  # user, folders, 5 pages
+
+        # Projection, to an open file
+        f = io.StringIO()
+        releases.export(f, fields=['instance_id', 'basic_information.title', 'missing.key'])
+        first = json.loads(f.getvalue().splitlines()[0])
+        self.assertEqual(first, {'instance_id': expected[0]['instance_id'],
+                                 'basic_information.title': expected[0]['basic_information']['title'],
+                                 'missing.key': None})
+
+    def test_json(self):
+        """.json files get a JSON array, .jsonl files JSON Lines"""
+        wantlist = self.user.wantlist
+        wantlist.per_page = 7
+        self.assertEqual(wantlist.export(self.path('wants.json'), fields=['id']), 20)
+        with open(self.path('wants.json')) as f:
+            items = json.load(f)
+        self.assertEqual(items, [{'id': self.dataset.want('example', i)['id']} for i in range(20)])
+        self.assertEqual(wantlist.export(self.path('wants'), format='json', fields=['id']), 20)
+        with open(self.path('wants')) as f:
+            self.assertEqual(json.load(f), items)
+
+        f = io.StringIO()
+        writer = WRITERS['json'](f, None)
+        writer.close()
+        self.assertEqual(json.loads(f.getvalue()), [])
+        self.assertRaises(ValueError, WRITERS['json'].check, True)
+
+    def test_csv(self):
+        """CSV files get a column per field, nested values as JSON"""
+        wantlist = self.user.wantlist
+        wantlist.per_page = 7
+        self.assertEqual(wantlist.export(self.path('wants.csv')), 20)
+        with open(self.path('wants.csv'), newline='') as f:
+            rows = list(csv.DictReader(f))
+        want = self.dataset.want('example', 0)
+        self.assertEqual(list(rows[0]), list(want))
+        self.assertEqual(rows[0]['id'], str(want['id']))
+        self.assertEqual(json.loads(rows[0]['basic_information']), want['basic_information'])
+
+        self.assertEqual(self.client.search('foo').export(self.path('search.csv'), fields=['id', 'type']), 10000)
+        with open(self.path('search.csv')) as f:
+            self.assertEqual(next(f), 'id,type\n')
+
+        self.assertRaises(ValueError, wantlist.export, self.path('wants.xml'), format='xml')
+
+    def test_fetch_error(self):
+        """Errors fetching later pages reach the caller"""
+        wantlist = self.user.wantlist
+        wantlist.per_page = 7
+        responses = self.client._fetcher.fetcher.responses = {}
+        responses['/users/example'] = (json.dumps(self.dataset.user('example')), 200)
+        responses['/users/example/wants?page=1&per_page=7'] = (
+            json.dumps(self.dataset.get('/users/example/wants?page=1&per_page=7')), 200)
+        with self.assertRaises(Exception):
+            wantlist.export(self.path('wants.jsonl'))
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        """Parquet files are written in a row group per page"""
+        releases = self.user.collection_folders[0].releases
+        releases.export(self.path('collection.parquet'), fields=['instance_id', 'rating'])
+        table = pyarrow.parquet.read_table(self.path('collection.parquet'))
+        self.assertEqual(table.num_rows, 230)
+        self.assertEqual(table.column_names, ['instance_id', 'rating'])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet_null_column(self):
+        """A column without values on the first page takes values later on"""
+        with open(self.path('items.parquet'), 'wb') as f:
+            writer = WRITERS['parquet'](f, None)
+            writer.write([{'id': 1, 'notes': None}])
+            writer.write([{'id': 2, 'notes': 'text'}, {'id': 3, 'notes': 4}])
+            writer.close()
+        table = pyarrow.parquet.read_table(self.path('items.parquet'))
+        self.assertEqual(table.column('notes').to_pylist(), [None, 'text', '4'])
+
+    @unittest.skipIf(pyarrow is not None, 'pyarrow is installed')
+    def test_parquet_missing(self):
+        """Without pyarrow, Parquet cannot be written"""
+        self.assertRaises(ImportError, self.user.wantlist.export, self.path('wants.parquet'))
+        # The check comes before the file is created
+        self.assertFalse(os.path.exists(self.path('wants.parquet')))
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(ExportTestCase)
+    return suite
@@ -1,5 +1,11 @@
-from discogs_client.fetchers import OAuth2Fetcher
+from discogs_client.fetchers import OAuth2Fetcher, MemoryFetcher, SimulatedFetcher, \
+    FilesystemFetcher, RecordingFetcher, ReplayFetcher, RateLimitedFetcher, SchedulingFetcher
+import os
+import tempfile
+import threading
+import time
 import unittest
+from requests.exceptions import ReadTimeout
 from discogs_client.tests import DiscogsClientTestCase
 from discogs_client.exceptions import HTTPError
 
@@ -42,6 +48,250 @@ class FetcherTestCase(DiscogsClientTestCase):
         _fetcher.set_verifier('1234567890')
         self.assertEqual(_fetcher.client.verifier, '1234567890')
 
+    def test_filesystem_fetcher_index(self):
+        """FilesystemFetcher finds files regardless of the parameter order"""
+        fetcher = self.d._fetcher.fetcher
+        for url in ('/artists/1/releases?per_page=50&page=2',
+                    '/artists/1/releases?page=2&per_page=50',
+                    '/database/search?per_page=50&q=trash80&page=1',
+                    '/marketplace/fee/20.5000/EUR',
+                    '/users/example/collection/folders/0/releases?per_page=50&page=1'):
+            content, status_code = fetcher.fetch(self.d, 'GET', url)
+            self.assertEqual(status_code, 200, url)
+            self.assertTrue(isinstance(content, bytes))
+        self.assertEqual(fetcher.fetch(self.d, 'GET', '/artists/1/releases?page=3&per_page=50')[1], 404)
+        self.assertEqual(fetcher.fetch(self.d, 'GET', '/artists/1/releases?page=2')[1], 404)
+
+    def test_filesystem_fetcher_watch_and_mmap(self):
+        """FilesystemFetcher picks up changes when watching, also when mmap'd"""
+        with tempfile.TemporaryDirectory() as path:
+            os.mkdir(os.path.join(path, 'artists'))
+            fetcher = FilesystemFetcher(path, watch=True, use_mmap=True)
+            self.assertEqual(fetcher.fetch(self.m, 'GET', '/artists/1')[1], 404)
+
+            with open(os.path.join(path, 'artists', '1.json'), 'w') as f:
+                f.write('{"id": 1}')
+            self.assertEqual(fetcher.fetch(self.m, 'GET', '/artists/1'), (b'{"id": 1}', 200))
+            self.assertEqual(fetcher.fetch(self.m, 'GET', '/artists/1'), (b'{"id": 1}', 200))
+
+            with open(os.path.join(path, 'artists', '1.json'), 'w') as f:
+                f.write('{"id": 1, "name": "Badger"}')
+            self.assertEqual(fetcher.fetch(self.m, 'GET', '/artists/1')[0],
+                             b'{"id": 1, "name": "Badger"}')
+
+            os.remove(os.path.join(path, 'artists', '1.json'))
+            self.assertEqual(fetcher.fetch(self.m, 'GET', '/artists/1')[1], 404)
+
+            # Without watching, the index is only built once
+            unwatched = FilesystemFetcher(path)
+            with open(os.path.join(path, 'artists', '2.json'), 'w') as f:
+                f.write('{"id": 2}')
+            self.assertEqual(unwatched.fetch(self.m, 'GET', '/artists/2')[1], 404)
+            unwatched.build_index()
+            self.assertEqual(unwatched.fetch(self.m, 'GET', '/artists/2')[1], 200)
+
+    def test_filesystem_fetcher_mmap_limit(self):
+        """FilesystemFetcher keeps a limited number of files mapped, and
+        errors other than missing files are raised"""
+        with tempfile.TemporaryDirectory() as path:
+            os.mkdir(os.path.join(path, 'artists'))
+            for i in range(10):
+                with open(os.path.join(path, 'artists', '{0}.json'.format(i)), 'w') as f:
+                    f.write('{{"id": {0}}}'.format(i))
+            fetcher = FilesystemFetcher(path, use_mmap=True)
+            fetcher.max_maps = 3
+            for _ in range(2):
+                for i in range(10):
+                    content, status_code = fetcher.fetch(self.m, 'GET', '/artists/{0}'.format(i))
+                    self.assertEqual(content, '{{"id": {0}}}'.format(i).encode())
+            self.assertEqual(len(fetcher._maps), 3)
+            fetcher.close()
+            self.assertEqual(len(fetcher._maps), 0)
+
+            fetcher._index[fetcher._canonical('artists/10', '.json')] = os.path.join(path, 'artists')
+            self.assertRaises(OSError, fetcher.fetch, self.m, 'GET', '/artists/10')
+
+    def test_record_and_replay(self):
+        """Responses recorded to a cassette are replayed by canonical URL"""
+        with tempfile.TemporaryDirectory() as path:
+            cassette = os.path.join(path, 'session.cassette')
+            simulated = SimulatedFetcher(self.d._fetcher.fetcher, realtime=False, rate_limit=100)
+            recorder = RecordingFetcher(simulated, cassette)
+            self.d._fetcher = recorder
+            self.d.backoff_enabled = False
+            self.assertFalse(simulated.backoff_enabled)
+
+            self.assertEqual(self.d.artist(1).name, 'Persuader, The')
+            releases = [r.id for r in self.d.artist(1).releases]
+            self.assertRaises(HTTPError, lambda: self.d.release(123).title)
+            recorder.close()
+
+            replay = ReplayFetcher(cassette)
+            self.assertEqual(len(replay), 5)
+            self.d._fetcher = replay
+            self.assertEqual(self.d.artist(1).name, 'Persuader, The')
+            self.assertEqual(replay.rate_limit, '100')
+            self.assertEqual(replay.rate_limit_used, '1')
+            self.assertEqual([r.id for r in self.d.artist(1).releases], releases)
+            self.assertRaises(HTTPError, lambda: self.d.release(123).title)
+
+            # Parameter order and authentication don't matter
+            content, status_code = replay.fetch(
+                self.d, 'GET', '/artists/1/releases?token=secret&per_page=50&page=2')
+            self.assertEqual(status_code, 200)
+            self.assertEqual(replay.fetch(self.d, 'POST', '/artists/1')[1], 404)
+
+            # An interrupted recording can be replayed up to the last record
+            with open(cassette, 'ab') as f:
+                f.write(b'{"method":"GET","url":"/artists/2","status":200,"headers":{},"length":100}\n{"id"')
+            self.assertEqual(len(ReplayFetcher(cassette)), 5)
+
+            with open(os.path.join(path, 'other'), 'wb') as f:
+                f.write(b'{}')
+            self.assertRaises(ValueError, lambda: ReplayFetcher(os.path.join(path, 'other')))
+
+    def _simulated(self, **kwargs):
+        fetcher = SimulatedFetcher(MemoryFetcher({
+            '/artists/1': (b'{"id": 1, "name": "Badger"}', 200),
+        }), realtime=False, **kwargs)
+        fetcher.backoff_enabled = False
+        return fetcher
+
+    def test_simulated_fetcher_latency(self):
+        """SimulatedFetcher advances its clock by a reproducible latency"""
+        clocks = []
+        for _ in range(2):
+            fetcher = self._simulated(latency=0.2, jitter=0.1, seed=42)
+            for _ in range(10):
+                content, status_code = fetcher.fetch(self.m, 'GET', '/artists/1')
+                self.assertEqual(status_code, 200)
+                self.assertEqual(content, b'{"id": 1, "name": "Badger"}')
+            self.assertTrue(1.0 <= fetcher.clock <= 3.0)
+            clocks.append(fetcher.clock)
+        self.assertEqual(clocks[0], clocks[1])
+
+        content, status_code = fetcher.fetch(self.m, 'GET', '/artists/2')
+        self.assertEqual(status_code, 404)
+
+    def test_simulated_fetcher_rate_limit(self):
+        """SimulatedFetcher answers with 429 once the quota is used up"""
+        fetcher = self._simulated(latency=1, distribution='constant',
+                                  rate_limit=3, rate_limit_window=10)
+        statuses = [fetcher.fetch(self.m, 'GET', '/artists/1')[1] for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(fetcher.rate_limit_remaining, 0)
+        self.assertEqual(tuple(fetcher.rate_limit_info), ('3', '3', '0'))
+
+        # Once the window has moved on, requests are allowed again
+        fetcher.clock += 10
+        self.assertEqual(fetcher.fetch(self.m, 'GET', '/artists/1')[1], 200)
+
+        # With backoff enabled the fetcher waits on its simulated clock
+        fetcher = self._simulated(latency=1, distribution='constant',
+                                  rate_limit=3, rate_limit_window=10)
+        fetcher.backoff_enabled = True
+        statuses = [fetcher.fetch(self.m, 'GET', '/artists/1')[1] for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 200])
+        self.assertTrue(fetcher.clock >= 10)
+
+    def test_rate_limited_fetcher(self):
+        """RateLimitedFetcher waits instead of running into the rate limit"""
+        simulated = self._simulated(rate_limit=3, rate_limit_window=10)
+        fetcher = RateLimitedFetcher(simulated, rate=3, per=10,
+                                     clock=simulated.now, sleep=simulated._sleep)
+        statuses = [fetcher.fetch(self.m, 'GET', '/artists/1')[1] for _ in range(7)]
+        self.assertEqual(statuses, [200] * 7)
+        self.assertEqual(simulated.clock, 20)
+        self.assertEqual(fetcher.waited, 20)
+
+        # Settings reach the wrapped fetcher
+        fetcher.read_timeout = 3
+        self.assertEqual(simulated.read_timeout, 3)
+        self.assertEqual(fetcher.rate_limit_remaining, 2)
+
+    def _schedule(self, fetcher, requests):
+        """Block the first request of a scheduler until the others queued up,
+        return the order the others were sent in."""
+        gate = threading.Event()
+        order = []
+
+        class Gated:
+            def fetch(self, client, method, url, data=None, headers=None, json=True):
+                if url == '/first':
+                    gate.wait(5)
+                else:
+                    order.append(url)
+                return b'{}', 200
+
+        fetcher.fetcher = Gated()
+        threads = []
+        for name, url in [('background', '/first')] + requests:
+            def run(name=name, url=url):
+                with fetcher.use(name):
+                    fetcher.fetch(self.m, 'GET', url)
+            threads.append(threading.Thread(target=run))
+            threads[-1].start()
+            # Queue up in a known order
+            while sum(v['queued'] + v['requests'] for v in fetcher.stats().values()) < len(threads):
+                time.sleep(0.001)
+        gate.set()
+        for thread in threads:
+            thread.join()
+        return order
+
+    def test_scheduling_fetcher_priority(self):
+        """Requests of higher priority classes jump the queue"""
+        fetcher = SchedulingFetcher(None, rate=1000, per=1, max_concurrency=1)
+        order = self._schedule(fetcher, [('background', '/b1'), ('background', '/b2'),
+                                         ('default', '/d1'), ('interactive', '/i1')])
+        self.assertEqual(order, ['/i1', '/d1', '/b1', '/b2'])
+
+        stats = fetcher.stats()
+        self.assertEqual(stats['background']['requests'], 3)
+        self.assertEqual(stats['background']['max_queued'], 2)
+        self.assertEqual(stats['interactive']['queued'], 0)
+        self.assertTrue(stats['background']['max_wait'] > stats['interactive']['max_wait'])
+        self.assertTrue(stats['interactive']['mean_wait'] > 0)
+        self.assertRaises(ValueError, fetcher.use('bulk').__enter__)
+
+    def test_scheduling_fetcher_fair(self):
+        """Classes of equal priority share requests by weight"""
+        fetcher = SchedulingFetcher(None, rate=1000, per=1, max_concurrency=1,
+                                    classes={'a': 0, 'b': 0, 'background': 1},
+                                    weights={'a': 2}, default='a')
+        requests = [('a', '/a{0}'.format(i)) for i in range(4)] + \
+            [('b', '/b{0}'.format(i)) for i in range(2)]
+        order = self._schedule(fetcher, requests)
+        self.assertEqual(order, ['/a0', '/a1', '/b0', '/a2', '/a3', '/b1'])
+
+    def test_scheduling_fetcher_rate(self):
+        """The scheduler keeps to its rate limit"""
+        fetcher = SchedulingFetcher(MemoryFetcher({'/artists/1': (b'{}', 200)}), rate=3, per=0.2)
+        self.m._fetcher = fetcher
+        start = time.monotonic()
+        with self.m.priority('interactive'):
+            for _ in range(4):
+                self.m.artist(1).refresh()
+        self.assertTrue(time.monotonic() - start >= 0.2)
+        self.assertEqual(fetcher.stats()['interactive']['requests'], 4)
+        self.assertEqual(fetcher.current, 'default')
+
+    def test_simulated_fetcher_failures(self):
+        """SimulatedFetcher injects server errors and timeouts"""
+        fetcher = self._simulated(error_rate=1, error_burst=3, seed=1)
+        status_code = fetcher.fetch(self.m, 'GET', '/artists/1')[1]
+        self.assertTrue(status_code in fetcher.error_statuses)
+
+        fetcher = self._simulated(timeout_rate=1)
+        self.assertRaises(ReadTimeout, lambda: fetcher.fetch(self.m, 'GET', '/artists/1'))
+
+        fetcher = self._simulated(latency=5, distribution='constant')
+        fetcher.read_timeout = 2
+        self.assertRaises(ReadTimeout, lambda: fetcher.fetch(self.m, 'GET', '/artists/1'))
+        self.assertEqual(fetcher.clock, 2)
+
+        self.assertRaises(ValueError, lambda: self._simulated(distribution='pareto'))
+
 
 def suite():
     suite = unittest.TestSuite()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from discogs_client import Client
+from discogs_client.fetchers import LoggingDelegator, MemoryFetcher
+from discogs_client.graph import RELATIONS, GraphCrawler, VisitedSet
+from discogs_client.synthetic import SyntheticDataset
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class GraphTestCase(DiscogsClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = SyntheticDataset(seed=4, releases=2000, masters=400, artists=300, labels=50)
+        self.client = Client('ua')
+        self.client._base_url = ''
+        self.client._fetcher = LoggingDelegator(MemoryFetcher(self.dataset.responses()))
+
+    def crawl(self, **kwargs):
+        kwargs.setdefault('list_pages', 1)
+        return GraphCrawler(self.client, [self.client.artist(7), ('label', 3)], **kwargs)
+
+    def test_crawl(self):
+        """Every node is fetched once, nodes at the maximum depth not at all"""
+        crawler = self.crawl(max_depth=2, concurrency=3)
+        nodes = list(crawler)
+        keys = [(node.kind, node.id) for node in nodes]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(len(crawler.visited), len(nodes))
+        self.assertEqual({key for key, node in zip(keys, nodes) if node.depth == 0},
+                         {('artist', 7), ('label', 3)})
+        self.assertEqual(max(node.depth for node in nodes), 2)
+
+        urls = [request[1] for request in self.client._fetcher.requests]
+        self.assertEqual(len(urls), len(set(urls)))
+        self.assertEqual(crawler.requests, len(urls))
+        fetched = [node for node in nodes if node.data is not None]
+        self.assertTrue(all(node.depth < 2 for node in fetched))
+        self.assertEqual(len(fetched) + sum(1 for node in nodes if node.depth == 2), len(nodes))
+
+        # Edges point to yielded nodes, relations are those of the node type
+        artist = nodes[keys.index(('artist', 7))]
+        self.assertEqual(artist.data, self.dataset.artist(7))
+        self.assertTrue({relation for relation, _ in artist.edges} <= set(RELATIONS['artist']))
+        for node in fetched:
+            for _, target in node.edges:
+                self.assertTrue(target in crawler.visited)
+
+    def test_relations(self):
+        """Only the selected relations are followed"""
+        nodes = list(self.crawl(relations=['artist.aliases', 'label.sublabels'], max_depth=3))
+        self.assertEqual({node.kind for node in nodes}, {'artist', 'label'})
+        self.assertTrue({r for node in nodes for r, _ in node.edges} <= {'aliases', 'sublabels'})
+        self.assertRaises(ValueError, GraphCrawler, self.client, [], relations=['artist.labels'])
+
+        crawler = GraphCrawler(self.client, [('release', 999999)])
+        self.assertEqual(list(crawler), [])
+        self.assertEqual(crawler.missing, 1)
+
+    def test_checkpoint(self):
+        """A stopped crawl continues from its checkpoint"""
+        expected = {(node.kind, node.id) for node in self.crawl(max_depth=2)}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.json')
+            first = []
+            for node in self.crawl(max_depth=2, checkpoint=path, checkpoint_every=5):
+                first.append((node.kind, node.id))
+                if len(first) == 12:
+                    break
+            crawler = self.crawl(max_depth=2, checkpoint=path)
+            second = [(node.kind, node.id) for node in crawler]
+            self.assertEqual(set(first) & set(second), set())
+            self.assertEqual(set(first) | set(second), expected)
+            self.assertEqual(list(self.crawl(max_depth=2, checkpoint=path)), [])
+
+    def test_visited_set(self):
+        """The visited set keeps IDs as bits"""
+        visited = VisitedSet()
+        self.assertTrue(visited.add('release', 1000000))
+        self.assertFalse(visited.add('release', 1000000))
+        self.assertTrue(visited.add('artist', 3))
+        restored = VisitedSet.from_dict(visited.to_dict())
+        self.assertTrue(('release', 1000000) in restored)
+        self.assertFalse(('release', 999999) in restored)
+        self.assertFalse(('label', 3) in restored)
+        self.assertEqual(len(restored), 2)
+        self.assertEqual(len(visited._bits['release']), 125001)
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(GraphTestCase)
+    return suite
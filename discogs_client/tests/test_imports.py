@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import unittest
+from discogs_client.tests import DiscogsClientTestCase
+
+
+#: Seconds ``import discogs_client`` may take, as reported by -X importtime.
+#: Without bytecode caches most of it is spent compiling the package itself.
+IMPORT_BUDGET = 0.1
+#: Dependencies that are imported once they are used
+LAZY_MODULES = ('requests', 'urllib3', 'oauthlib', 'dateutil', 'concurrent.futures', 'uuid')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCRIPT = '''
+import sys
+before = set(sys.modules)
+import discogs_client
+print('\\n'.join(sorted(set(sys.modules) - before)))
+'''
+
+
+def measure_import():
+    """Import the package in a new interpreter.
+
+    Returns
+    -------
+    seconds : float
+        Cumulative import time of the package.
+    modules : list of str
+        Modules imported by importing the package.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', SCRIPT], cwd=ROOT,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+    microseconds = None
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == 'discogs_client':
+            microseconds = int(parts[1])
+    return microseconds / 1e6, process.stdout.split()
+
+
+class ImportTestCase(DiscogsClientTestCase):
+    def test_lazy_dependencies(self):
+        """Importing the package does not import heavy dependencies"""
+        _, modules = measure_import()
+        self.assertTrue('discogs_client.client' in modules)
+        for name in LAZY_MODULES:
+            self.assertFalse(name in modules, '{0} is imported eagerly'.format(name))
+
+    def test_import_budget(self):
+        """Importing the package stays within its time budget"""
+        seconds = min(measure_import()[0] for _ in range(3))
+        self.assertTrue(seconds <= IMPORT_BUDGET, 'import discogs_client took {0:.3f} s, budget {1} s'.format(
+            seconds, IMPORT_BUDGET))
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(ImportTestCase)
+    return suite
@@ -1,9 +1,73 @@
+import json
+import os
+import tempfile
 import unittest
-from discogs_client.models import Artist, Release, ListItem, CollectionValue, CollectionItemInstance
+from discogs_client import Client
+from discogs_client.fetchers import LoggingDelegator, MemoryFetcher
+from discogs_client.models import Artist, Release, ListItem, CollectionValue, CollectionItemInstance, \
+    Listing, User, Cursor, BasePaginatedResponse, MixedPaginatedList
 from discogs_client.tests import DiscogsClientTestCase
 from discogs_client.exceptions import HTTPError
 
 
+class ShortPagesFetcher:
+    """Serves a list whose pages hold the given numbers of items, at most
+    ``served_per_page`` whatever is requested"""
+    def __init__(self, lengths, served_per_page=None):
+        self.pages = []
+        next_id = 0
+        for length in lengths:
+            self.pages.append(list(range(next_id, next_id + length)))
+            next_id += length
+        self.served_per_page = served_per_page
+        self.requested = []
+
+    def fetch(self, client, method, url, data=None, headers=None, json_format=True):
+        params = dict(param.split('=') for param in url.partition('?')[2].split('&'))
+        page = int(params['page'])
+        self.requested.append(page)
+        if page > len(self.pages):
+            return json.dumps({'message': 'Page not found.'}), 404
+        per_page = self.served_per_page or int(params['per_page'])
+        return json.dumps({
+            'pagination': {'page': page, 'pages': len(self.pages), 'per_page': per_page,
+                           'items': sum(map(len, self.pages))},
+            'items': self.pages[page - 1],
+        }), 200
+
+
+class WantsFetcher:
+    """Serves a mutable wantlist in the order the wants were added"""
+    def __init__(self, ids):
+        self.wants = [{'id': i, 'notes': ''} for i in ids]
+        self.gets = 0
+
+    def fetch(self, client, method, url, data=None, headers=None, json_format=True):
+        path, _, query = url.partition('?')
+        if method == 'PUT':
+            want_id = int(path.rsplit('/', 1)[1])
+            want = {'id': want_id, 'notes': data.get('notes', '')}
+            existing = [i for i, w in enumerate(self.wants) if w['id'] == want_id]
+            if existing:
+                self.wants[existing[0]] = want
+            else:
+                self.wants.append(want)
+            return json.dumps(want), 201
+        if method == 'DELETE':
+            want_id = int(path.rsplit('/', 1)[1])
+            self.wants = [w for w in self.wants if w['id'] != want_id]
+            return b'', 204
+        self.gets += 1
+        params = dict(p.split('=') for p in query.split('&'))
+        page, per_page = int(params['page']), int(params['per_page'])
+        wants = self.wants[::-1] if params.get('sort_order') == 'desc' else self.wants
+        return json.dumps({
+            'pagination': {'page': page, 'per_page': per_page, 'items': len(wants),
+                           'pages': max(1, -(-len(wants) // per_page))},
+            'wants': wants[(page - 1) * per_page:page * per_page],
+        }), 200
+
+
 class ModelsTestCase(DiscogsClientTestCase):
     def test_artist(self):
         """Artists can be fetched and parsed"""
@@ -391,6 +455,352 @@ class ModelsTestCase(DiscogsClientTestCase):
         self.assertEqual(method, "GET")
         self.assertEqual(url, "/users/example/collection/value")
 
+    def wantlist(self, fetcher, order='desc'):
+        client = Client('ua')
+        client._base_url = ''
+        client._fetcher = fetcher
+        user = User(client, {'username': 'example', 'wantlist_url': '/users/example/wants'})
+        wantlist = user.wantlist
+        if order:
+            wantlist.sort('added', order)
+        wantlist.per_page = 5
+        return wantlist
+
+    def assertFresh(self, fetcher, wantlist):
+        order = wantlist._sort_order if wantlist._sort_key else None
+        fresh = self.wantlist(WantsFetcher([]), order)
+        fresh.client._fetcher = fetcher
+        gets = fetcher.gets
+        expected = [(w.id, w.notes) for w in fresh]
+        fetcher.gets = gets
+        self.assertEqual(len(wantlist), len(expected))
+        self.assertEqual(wantlist.pages, fresh.pages)
+        self.assertEqual([(w.id, w.notes) for w in wantlist], expected)
+        self.assertEqual([wantlist[i].id for i in range(len(expected))], [e[0] for e in expected])
+
+    def test_wantlist_cache_patched(self):
+        """Adding and removing wants patches the cached pages"""
+        for order in ('desc', 'asc'):
+            fetcher = WantsFetcher(range(1, 24))
+            wantlist = self.wantlist(fetcher, order)
+            list(wantlist)
+            self.assertEqual(fetcher.gets, 5)
+            wantlist.add(100)
+            wantlist.add(101)
+            wantlist.remove(7)
+            wantlist.add(3, notes='changed')
+            wantlist.remove(100)
+            self.assertFresh(fetcher, wantlist)
+            self.assertEqual(fetcher.gets, 5)
+
+            # A new page at the end
+            for want_id in (102, 103, 104):
+                wantlist.add(want_id)
+            self.assertEqual(wantlist.pages, 6)
+            self.assertFresh(fetcher, wantlist)
+
+    def test_wantlist_cache_partially_patched(self):
+        """Pages that cannot be patched are dropped"""
+        fetcher = WantsFetcher(range(1, 24))
+        wantlist = self.wantlist(fetcher)
+        wantlist[0]
+        wantlist[7]
+        self.assertEqual(fetcher.gets, 2)
+        wantlist.add(100)
+        self.assertEqual(sorted(wantlist._pages), [1, 2])
+        wantlist.remove(20)
+        self.assertEqual(sorted(wantlist._pages), [1])
+        self.assertFresh(fetcher, wantlist)
+        self.assertEqual(fetcher.gets, 6)
+
+        # Position unknown: everything is dropped
+        wantlist.remove(1)
+        wantlist._pages = {1: wantlist._pages[1]}
+        wantlist.remove(2)
+        self.assertEqual(wantlist._pages, {})
+        self.assertFresh(fetcher, wantlist)
+
+    def test_wantlist_cache_page_boundary(self):
+        """Removals that empty the last page shift its items first"""
+        for ids, removed in ((range(1, 7), 4), (range(1, 12), 1), (range(1, 12), 11)):
+            for order in ('desc', 'asc'):
+                fetcher = WantsFetcher(ids)
+                wantlist = self.wantlist(fetcher, order)
+                list(wantlist)
+                wantlist.remove(removed)
+                self.assertEqual(wantlist.pages, len(wantlist._pages))
+                self.assertFresh(fetcher, wantlist)
+
+    def test_wantlist_add_without_want(self):
+        """The cache is not patched with wants missing from the response"""
+        class EmptyPutFetcher(WantsFetcher):
+            def fetch(self, client, method, url, data=None, headers=None, json_format=True):
+                content, status_code = super().fetch(client, method, url, data, headers, json_format)
+                return (b'', 204) if method == 'PUT' else (content, status_code)
+
+        fetcher = EmptyPutFetcher(range(1, 8))
+        wantlist = self.wantlist(fetcher)
+        for release_id in (3, 100):
+            list(wantlist)
+            wantlist.add(release_id, notes='changed')
+            self.assertEqual(wantlist._pages, {})
+            self.assertFresh(fetcher, wantlist)
+
+    def test_wantlist_cache_invalidated(self):
+        """Without a known order of the list, the cache is invalidated"""
+        fetcher = WantsFetcher(range(1, 24))
+        wantlist = self.wantlist(fetcher, order=None)
+        list(wantlist)
+        wantlist.add(100)
+        self.assertEqual(wantlist._pages, {})
+        self.assertFresh(fetcher, wantlist)
+
+        wantlist = self.wantlist(fetcher)
+        wantlist.client.trust_per_page = False
+        list(wantlist)
+        wantlist.remove(100)
+        self.assertEqual(wantlist._pages, {})
+        self.assertFresh(fetcher, wantlist)
+
+    def short_pages(self, fetcher, per_page, trust_per_page=False):
+        client = Client('ua')
+        client._base_url = ''
+        client._fetcher = fetcher
+        client.trust_per_page = trust_per_page
+        lst = BasePaginatedResponse(client, '/list')
+        lst.per_page = per_page
+        return lst
+
+    def test_untrusted_index(self):
+        """Without trust_per_page, items are found by the offsets of the pages,
+        fetching every page once"""
+        lengths = [10, 7, 10, 3, 10, 10, 4]
+        fetcher = ShortPagesFetcher(lengths)
+        lst = self.short_pages(fetcher, 10)
+        self.assertEqual(lst[45], 45)
+        # Page 1, then the pages it takes to reach the index if they are full
+        self.assertEqual(fetcher.requested[0], 1)
+        self.assertEqual(sorted(fetcher.requested[1:5]), [2, 3, 4, 5])
+        self.assertEqual(fetcher.requested[5:], [6])
+
+        self.assertEqual([lst[i] for i in (0, 9, 10, 16, 17, 29, 49)], [0, 9, 10, 16, 17, 29, 49])
+        self.assertEqual(len(fetcher.requested), 6)
+        self.assertEqual(lst[53], 53)
+        self.assertRaises(IndexError, lambda: lst[54])
+        self.assertEqual(sorted(fetcher.requested), list(range(1, 8)))
+
+        # In order, every page is fetched once
+        fetcher = ShortPagesFetcher(lengths)
+        lst = self.short_pages(fetcher, 10)
+        self.assertEqual([lst[i] for i in range(54)], list(range(54)))
+        self.assertEqual(fetcher.requested, list(range(1, 8)))
+
+        # Changes to the list start over
+        lst.sort('added')
+        self.assertEqual(lst[20], 20)
+        self.assertEqual(len(fetcher.requested), 10)
+
+    def test_untrusted_index_page_size(self):
+        """Pages are taken to hold no more items than the API serves"""
+        fetcher = ShortPagesFetcher([5] * 20, served_per_page=5)
+        lst = self.short_pages(fetcher, 50)
+        self.assertEqual(lst[72], 72)
+        self.assertEqual(sorted(fetcher.requested), list(range(1, 16)))
+        self.assertRaises(IndexError, lambda: lst[100])
+        self.assertEqual(len(fetcher.requested), 20)
+
+    def test_slices(self):
+        """Slices and negative indexes fetch only the pages they need"""
+        fetcher = ShortPagesFetcher([10] * 10)
+        lst = self.short_pages(fetcher, 10, trust_per_page=True)
+        self.assertEqual(lst[-10:], list(range(90, 100)))
+        # Page 1 for the number of items, then the last one
+        self.assertEqual(fetcher.requested, [1, 10])
+        self.assertEqual(lst[-1], 99)
+        self.assertEqual(lst[-100], 0)
+        self.assertRaises(IndexError, lambda: lst[-101])
+        self.assertEqual(lst[35:62:13], [35, 48, 61])
+        self.assertEqual(sorted(fetcher.requested[2:]), [4, 5, 7])
+        self.assertEqual(lst[98:3:-45], [98, 53, 8])
+        self.assertEqual(fetcher.requested[5:], [6])
+        self.assertEqual(lst[100:], [])
+        self.assertEqual(len(fetcher.requested), 6)
+
+        # Non-negative bounds don't need page 1, the first page of the slice
+        # tells the number of items
+        fetcher = ShortPagesFetcher([10] * 10)
+        lst = self.short_pages(fetcher, 10, trust_per_page=True)
+        self.assertEqual(lst[35:62:13], [35, 48, 61])
+        self.assertEqual(fetcher.requested[0], 4)
+        self.assertEqual(sorted(fetcher.requested[1:]), [5, 7])
+        lst = self.short_pages(fetcher, 10, trust_per_page=True)
+        self.assertEqual(lst[95:120], list(range(95, 100)))
+        self.assertEqual(lst[150:160], [])
+        lst = self.short_pages(fetcher, 10, trust_per_page=True)
+        self.assertEqual(lst[150:160], [])
+        self.assertEqual(fetcher.requested[3:], [10, 16])
+
+        lengths = [10, 7, 10, 3, 10, 10, 4]
+        fetcher = ShortPagesFetcher(lengths)
+        lst = self.short_pages(fetcher, 10)
+        self.assertEqual(lst[-3:], [51, 52, 53])
+        self.assertEqual(sorted(fetcher.requested), list(range(1, 8)))
+        self.assertEqual(lst[5:40:5], [5, 10, 15, 20, 25, 30, 35])
+        self.assertEqual(lst[::-20], [53, 33, 13])
+        self.assertEqual(len(fetcher.requested), 7)
+
+    def test_reversed(self):
+        """Reverse iteration goes from the last page backwards"""
+        fetcher = ShortPagesFetcher([10, 7, 10, 3])
+        lst = self.short_pages(fetcher, 10, trust_per_page=True)
+        items = reversed(lst)
+        self.assertEqual([next(items) for _ in range(3)], [29, 28, 27])
+        self.assertEqual(fetcher.requested, [1, 4])
+        self.assertEqual(list(items), list(range(26, -1, -1)))
+        self.assertEqual(fetcher.requested, [1, 4, 3, 2])
+
+    def test_iter_from_cursor(self):
+        """Walks continue from a cursor, also after the list changed"""
+        fetcher = WantsFetcher(range(1, 24))
+        wantlist = self.wantlist(fetcher, order='asc')
+        walk = wantlist.iter_from()
+        self.assertEqual([next(walk).id for _ in range(7)], list(range(1, 8)))
+        cursor = wantlist.position
+        self.assertEqual(cursor, Cursor('/users/example/wants', 5, 'added', 'asc', {}, 2, 7))
+        self.assertEqual(Cursor.from_json(cursor.to_json()), cursor)
+
+        # Another list object resumes, taking over per_page and sort
+        fetcher.wants.insert(0, {'id': 100, 'notes': ''})
+        resumed = self.wantlist(fetcher, order=None)
+        resumed.per_page = 50
+        self.assertEqual([w.id for w in resumed.iter_from(cursor)], list(range(8, 24)))
+        self.assertEqual(resumed._sort_key, 'added')
+        self.assertEqual(resumed._pages, {})
+        self.assertEqual(resumed.position.page, 6)
+
+        other = User(wantlist.client, {'username': 'other', 'wantlist_url': '/users/other/wants'})
+        self.assertRaises(ValueError, lambda: next(other.wantlist.iter_from(cursor)))
+
+    def test_iter_from_mixed_types(self):
+        """Cursors tell apart items of different types with the same ID"""
+        items = [{'type': 'release', 'id': 1}, {'type': 'master', 'id': 5},
+                 {'type': 'release', 'id': 5}, {'type': 'artist', 'id': 5, 'title': 'Five'},
+                 {'type': 'master', 'id': 6}]
+        responses = {}
+
+        def serve():
+            for page in (1, 2, 3):
+                responses['/artists/1/releases?page={0}&per_page=2'.format(page)] = (json.dumps({
+                    'pagination': {'page': page, 'pages': 3, 'per_page': 2, 'items': len(items)},
+                    'releases': items[(page - 1) * 2:page * 2],
+                }), 200)
+
+        serve()
+        releases = MixedPaginatedList(self.memory_client(responses), '/artists/1/releases', 'releases')
+        releases.per_page = 2
+        walk = releases.iter_from()
+        self.assertEqual([next(walk).id for _ in range(3)], [1, 5, 5])
+        cursor = Cursor.from_json(releases.position.to_json())
+        self.assertEqual(cursor.last_id, ('release', 5))
+
+        # The release moved to the previous page, the artist with the same ID
+        # is not skipped
+        del items[0]
+        serve()
+        resumed = MixedPaginatedList(releases.client, '/artists/1/releases', 'releases')
+        self.assertEqual([(r.data['type'], r.id) for r in resumed.iter_from(cursor)],
+                         [('artist', 5), ('master', 6)])
+
+    def test_iter_from_checkpoint(self):
+        """Checkpoints are saved every few pages and resumed from"""
+        fetcher = WantsFetcher(range(1, 24))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'wants.cursor')
+            walk = self.wantlist(fetcher).iter_from(checkpoint=path, checkpoint_every=2)
+            self.assertEqual([next(walk).id for _ in range(17)], list(range(23, 6, -1)))
+            self.assertEqual(Cursor.load(path).page, 3)
+
+            # Items yielded after the checkpoint are repeated
+            walk = self.wantlist(fetcher).iter_from(checkpoint=path, checkpoint_every=2)
+            self.assertEqual([w.id for w in walk], list(range(13, 0, -1)))
+            self.assertEqual(Cursor.load(path).page, 6)
+            self.assertEqual(list(self.wantlist(fetcher).iter_from(checkpoint=path)), [])
+            self.assertEqual(Cursor.load(os.path.join(directory, 'missing')), None)
+
+    def memory_client(self, responses):
+        client = Client('ua')
+        client._base_url = ''
+        client._fetcher = LoggingDelegator(MemoryFetcher(responses))
+        return client
+
+    def test_save_optimistic(self):
+        """Optimistic saves apply the changes without a refresh"""
+        client = self.memory_client({'/marketplace/listings/1': (b'', 204)})
+        client.save_mode = 'optimistic'
+        listing = Listing(client, {'id': 1, 'status': 'For Sale',
+                                   'price': {'value': 5.0, 'currency': 'EUR'}})
+        listing.previous_request = listing.data['resource_url']
+        listing.price = 4.5
+        listing.status = 'Draft'
+        listing.save()
+        self.assertEqual(len(client._fetcher.requests), 1)
+        self.assertEqual(client._fetcher.last_request[:3],
+                         ('POST', '/marketplace/listings/1', {'price': 4.5, 'status': 'Draft'}))
+        self.assertEqual(listing.changes, {})
+        self.assertEqual(listing.status, 'Draft')
+        self.assertEqual(listing.price.value, 4.5)
+        self.assertEqual(listing.price.currency, 'EUR')
+
+        # The refresh happens once a missing field is read
+        client._fetcher.fetcher.responses['/marketplace/listings/1'] = (json.dumps({
+            'id': 1, 'status': 'Draft', 'price': {'value': 4.5, 'currency': 'EUR'},
+            'comments': 'Mint',
+        }), 200)
+        self.assertEqual(listing.comments, 'Mint')
+        self.assertEqual(client._fetcher.last_request[:2], ('GET', '/marketplace/listings/1'))
+        self.assertEqual(len(client._fetcher.requests), 2)
+
+    def test_save_optimistic_response(self):
+        """Optimistic saves take the updated object from the response"""
+        client = self.memory_client({'/users/example': (json.dumps({
+            'username': 'example', 'resource_url': 'https://api.discogs.com/users/example',
+            'home_page': 'http://example.org', 'profile': 'Updated',
+        }), 200)})
+        user = User(client, {'username': 'example', 'home_page': ''})
+        user.previous_request = user.data['resource_url']
+        user.home_page = 'http://example.org'
+        user.save(mode='optimistic')
+        self.assertEqual(len(client._fetcher.requests), 1)
+        self.assertEqual(user.home_page, 'http://example.org')
+        self.assertEqual(user.profile, 'Updated')
+        self.assertEqual(user.fetch('missing'), None)
+        self.assertEqual(user.data['resource_url'], '/users/example')
+        self.assertEqual(len(client._fetcher.requests), 1)
+
+        self.assertRaises(ValueError, user.save, 'eventually')
+        self.assertEqual(client.save_mode, 'refresh')
+        with self.assertRaises(ValueError):
+            client.save_mode = 'eventually'
+
+    def test_save_all(self):
+        """Objects are saved concurrently and errors are reported per object"""
+        client = self.memory_client({
+            '/marketplace/listings/{0}'.format(i): (b'', 204) for i in range(1, 10) if i != 4
+        })
+        listings = [Listing(client, {'id': i, 'status': 'For Sale'}) for i in range(1, 11)]
+        for listing in listings[:9]:
+            listing.status = 'Draft'
+        results = client.save_all(listings, concurrency=3, mode='optimistic')
+        self.assertEqual([r.object for r in results], listings)
+        self.assertEqual([r.error is None for r in results],
+                         [True, True, True, False, True, True, True, True, True, True])
+        self.assertTrue(isinstance(results[3].error, HTTPError))
+        self.assertEqual(results[3].error.status_code, 404)
+        self.assertEqual(listings[3].changes, {'status': 'Draft'})
+        self.assertEqual(listings[0].status, 'Draft')
+        # The unchanged listing was not saved
+        self.assertEqual(len(client._fetcher.requests), 9)
+
 
 def suite():
     suite = unittest.TestSuite()
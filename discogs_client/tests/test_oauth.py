@@ -0,0 +1,99 @@
+import json
+import random
+import unittest
+from urllib.parse import urlencode
+from oauthlib import oauth1
+from discogs_client.fetchers import OAuth2Fetcher
+from discogs_client.oauth import OAuthSigner
+from discogs_client.tests import DiscogsClientTestCase
+
+
+URLS = [
+    'https://api.discogs.com/users/example/inventory?page=3&per_page=100&sort=listed&sort_order=desc',
+    'https://API.Discogs.com:443/releases/1',
+    'http://api.discogs.com:8080/a b/c;p?x=1&x=0&y=&z',
+    'https://api.discogs.com',
+    'https://api.discogs.com/database/search?q=sigur+r%C3%B3s&type=release&oauth_x=a%2520b',
+]
+CHARACTERS = 'abcXYZ019 -_.~+%&=/?\xe9☃!*\'(),;:@$"'
+
+
+class OAuthSignerTestCase(DiscogsClientTestCase):
+    def assertSameSignature(self, client, url, method, body=None, headers=None):
+        expected = client.sign(url, http_method=method, body=body, headers=dict(headers or {}))
+        signed = OAuthSigner(client).sign(url, http_method=method, body=body,
+                                          headers=dict(headers or {}))
+        self.assertEqual(signed, expected)
+
+    def test_same_as_oauthlib(self):
+        """Requests are signed byte for byte like oauthlib signs them"""
+        rnd = random.Random(3)
+
+        def text(length=8):
+            return ''.join(rnd.choice(CHARACTERS) for _ in range(rnd.randint(0, length)))
+
+        for _ in range(500):
+            client = oauth1.Client(
+                rnd.choice(['consumer_key', text() + 'k']),
+                client_secret=rnd.choice([None, '', text()]),
+                resource_owner_key=rnd.choice([None, '', text()]),
+                resource_owner_secret=rnd.choice([None, text()]),
+                verifier=rnd.choice([None, text()]),
+                callback_uri=rnd.choice([None, 'https://example.org/callback?a=1']),
+                nonce=rnd.choice(['1234567890', text() + '☃']),
+                timestamp=str(rnd.randint(0, 2 ** 31)))
+            url = rnd.choice(URLS)
+            if rnd.random() < 0.5:
+                query = [(text() + 'k', text()) for _ in range(rnd.randint(1, 4))]
+                url = url.split('?')[0] + '?' + urlencode(query)
+            method = rnd.choice(['GET', 'post', 'PUT', 'DELETE'])
+            headers = {'Accept-Encoding': 'gzip', 'User-Agent': 'ua'}
+            body = None
+            if method != 'GET' and rnd.random() < 0.7:
+                body = json.dumps({text(): text() for _ in range(3)}, ensure_ascii=rnd.random() < 0.5)
+                if rnd.random() < 0.8:
+                    headers['Content-Type'] = 'application/json'
+            if rnd.random() < 0.1:
+                headers['Host'] = 'api.discogs.com:8443'
+            self.assertSameSignature(client, url, method, body, headers)
+
+    def test_fallback(self):
+        """Requests outside the fast path are signed by oauthlib"""
+        client = oauth1.Client('key', client_secret='secret', nonce='1', timestamp='2')
+        form = {'Content-Type': 'application/x-www-form-urlencoded', 'User-Agent': 'ua'}
+        self.assertSameSignature(client, 'https://api.discogs.com/oauth/request_token', 'POST',
+                                 'oauth_callback=https%3A%2F%2Fexample.org', form)
+        self.assertSameSignature(client, 'https://api.discogs.com/releases/1#notes', 'GET')
+
+        plaintext = oauth1.Client('key', client_secret='secret', signature_method='PLAINTEXT',
+                                  nonce='1', timestamp='2')
+        self.assertFalse(OAuthSigner(plaintext).fast)
+        self.assertSameSignature(plaintext, 'https://api.discogs.com/releases/1', 'GET')
+
+    def test_random_nonces(self):
+        """Every request gets a nonce of its own"""
+        signer = OAuthSigner(oauth1.Client('key', client_secret='secret'))
+        headers = [signer.sign('https://api.discogs.com/releases/1')[1]['Authorization']
+                   for _ in range(3)]
+        self.assertEqual(len(set(headers)), 3)
+
+    def test_fetcher(self):
+        """The fetcher signs with a signer of its current token"""
+        fetcher = OAuth2Fetcher('key', 'secret', token='token', secret='token_secret')
+        signer = fetcher.signer
+        self.assertTrue(fetcher.signer is signer)
+        self.assertEqual(signer.client.resource_owner_key, 'token')
+
+        fetcher.store_token('other', 'other_secret')
+        self.assertFalse(fetcher.signer is signer)
+        _, headers, _ = fetcher.signer.sign('https://api.discogs.com/oauth/identity')
+        self.assertTrue('oauth_token="other"' in headers['Authorization'])
+
+        fetcher.forget_token()
+        _, headers, _ = fetcher.signer.sign('https://api.discogs.com/oauth/identity')
+        self.assertFalse('oauth_token' in headers['Authorization'])
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(OAuthSignerTestCase)
+    return suite
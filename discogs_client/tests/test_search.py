@@ -0,0 +1,177 @@
+import json
+import random
+import unittest
+from urllib.parse import urlsplit, parse_qsl
+from discogs_client import Client
+from discogs_client.search import SearchCache, SearchEnumerator, normalize_query
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class SearchFetcher:
+    """Filters a list of search results by type, year, format and country"""
+    def __init__(self, results, window):
+        self.results = results
+        self.window = window
+        self.requests = 0
+
+    def matches(self, result, params):
+        for name, value in params.items():
+            if name == 'year':
+                first, _, last = value.partition('-')
+                if not result.get('year') or not int(first) <= result['year'] <= int(last or first):
+                    return False
+            elif name == 'format':
+                if value not in result.get('format', []):
+                    return False
+            elif name in ('type', 'country', 'genre'):
+                if result.get(name) != value:
+                    return False
+        return True
+
+    def fetch(self, client, method, url, data=None, headers=None, json_format=True):
+        self.requests += 1
+        params = dict(parse_qsl(urlsplit(url).query))
+        page, per_page = int(params.pop('page')), int(params.pop('per_page'))
+        if page * per_page > self.window:
+            return json.dumps({'message': 'Page not found.'}), 404
+        results = [r for r in self.results if self.matches(r, params)]
+        return json.dumps({
+            'pagination': {'page': page, 'per_page': per_page, 'items': len(results),
+                           'pages': max(1, -(-len(results) // per_page))},
+            'results': results[(page - 1) * per_page:page * per_page],
+        }), 200
+
+
+def results(releases, artists):
+    rnd = random.Random(1)
+    items = []
+    for i in range(releases):
+        items.append({'type': 'release' if i % 3 else 'master', 'id': i, 'title': str(i),
+                      'year': rnd.randint(1960, 2020), 'country': rnd.choice(['US', 'UK', 'Japan']),
+                      'format': rnd.sample(['Vinyl', 'CD', 'Cassette'], rnd.randint(1, 2)),
+                      'genre': 'Electronic'})
+    for i in range(artists):
+        items.append({'type': 'artist', 'id': i, 'title': 'Artist {0}'.format(i),
+                      'genre': 'Electronic'})
+    return items
+
+
+class SearchTestCase(DiscogsClientTestCase):
+    def client(self, items, window=300):
+        client = Client('ua')
+        client._base_url = ''
+        client._fetcher = SearchFetcher(items, window)
+        return client
+
+    def test_enumerate(self):
+        """Searches larger than the window are split until every part fits"""
+        items = results(2000, 250)
+        client = self.client(items)
+        enumerator = SearchEnumerator(client, {'genre': 'Electronic'}, window=300,
+                                      years=(1960, 2020))
+        found = [(r.data['type'], r.id) for r in enumerator]
+        self.assertEqual(len(found), len(set(found)))
+        self.assertEqual(set(found), {(r['type'], r['id']) for r in items})
+        self.assertEqual(enumerator.truncated, [])
+        self.assertEqual(enumerator.requests, client._fetcher.requests)
+        self.assertTrue(client._fetcher.requests < 80)
+
+        # Results are model objects
+        artists = [r for r in SearchEnumerator(client, {'type': 'artist'}, window=300)]
+        self.assertEqual(artists[0].name, artists[0].data['title'])
+
+    def test_small_search(self):
+        """Searches fitting into the window are not split"""
+        client = self.client(results(250, 0))
+        found = list(client.search_all(genre='Electronic'))
+        self.assertEqual(len(found), 250)
+        self.assertEqual(client._fetcher.requests, 3)
+
+    def test_truncated(self):
+        """Parts that cannot be split are fetched as far as possible"""
+        client = self.client(results(0, 450))
+        enumerator = SearchEnumerator(client, {'q': 'Artist'}, window=300)
+        found = list(enumerator)
+        self.assertEqual(len(found), 300)
+        self.assertEqual(enumerator.truncated, [({'q': 'Artist', 'type': 'artist'}, 150)])
+
+    def test_missing_from_parts(self):
+        """Results the parts of a split search miss are counted, and the
+        first page of a split search is not read"""
+        undated = [{'type': 'release', 'id': 10000 + i, 'title': 'Undated', 'genre': 'Electronic'}
+                   for i in range(50)]
+        items = undated + results(2000, 0)
+        client = self.client(items)
+        enumerator = SearchEnumerator(client, {'genre': 'Electronic'}, window=300,
+                                      years=(1960, 2020))
+        found = [(r.data['type'], r.id) for r in enumerator]
+        self.assertEqual(len(found), len(set(found)))
+        self.assertEqual(set(found), {(r['type'], r['id']) for r in items[50:]})
+        self.assertEqual(enumerator.truncated, [({'genre': 'Electronic', 'type': 'release'}, 50)])
+
+    def test_stop_early(self):
+        """Stopping the iteration cancels the pending requests"""
+        client = self.client(results(2000, 0))
+        enumerator = SearchEnumerator(client, {}, concurrency=1, window=300, years=(1960, 2020))
+        for i, _ in enumerate(enumerator):
+            if i == 150:
+                requests = client._fetcher.requests
+                break
+        # Only the request in progress is completed
+        self.assertTrue(client._fetcher.requests <= requests + 1)
+        self.assertTrue(client._fetcher.requests < 20)
+
+    def test_normalize_query(self):
+        """Equivalent searches have the same canonical parameters"""
+        self.assertEqual(
+            list(normalize_query({'Type': 'Release, master', 'q': '  Nirvana\tNevermind ',
+                                  'genre': 'Hip  Hop', 'year': 1991}).items()),
+            [('genre', 'Hip Hop'), ('q', 'nirvana nevermind'), ('type', 'master,release'),
+             ('year', 1991)])
+        self.assertEqual(normalize_query({'artist': b'Nirvana'}), {'artist': 'nirvana'})
+
+    def test_search_cache(self):
+        """Equivalent searches share cached pages"""
+        client = self.client(results(250, 0))
+        self.now = 0
+        client.search_cache = SearchCache(ttl=60, clock=lambda: self.now)
+        first = client.search('Electronic  Music', genre='Electronic', type='release')
+        self.assertEqual(len(first), 166)
+        self.assertEqual(client._fetcher.requests, 1)
+        second = client.search(TYPE='Release', genre='Electronic', q='electronic music')
+        self.assertEqual(second.url, first.url)
+        self.assertEqual(len(second), 166)
+        self.assertEqual(client._fetcher.requests, 1)
+        self.assertEqual(client.search_cache.hits, 1)
+
+        # Changes to the objects don't reach the cache
+        second[0].data['title'] = 'Changed'
+        self.assertNotEqual(client.search('electronic music', genre='Electronic',
+                                          type='release')[0].data['title'], 'Changed')
+
+        # Pages are keyed by their per_page, sort and filter state
+        second.per_page = 100
+        second.page(1)
+        second.sort('year', 'desc').page(1)
+        second.filter(country='UK').page(1)
+        self.assertEqual(client._fetcher.requests, 4)
+        client.search('electronic music', genre='Electronic', type='release').page(1)
+        self.assertEqual(client._fetcher.requests, 4)
+
+        # Pages expire
+        self.now = 60
+        first._invalidate()
+        first.page(1)
+        self.assertEqual(client._fetcher.requests, 5)
+
+        client.search_cache = SearchCache(maxsize=2)
+        for year in (1990, 1991, 1992):
+            client.search(year=year).page(1)
+        self.assertEqual(len(client.search_cache), 2)
+        client.search(year=1990).page(1)
+        self.assertEqual(client._fetcher.requests, 9)
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(SearchTestCase)
+    return suite
@@ -0,0 +1,65 @@
+import unittest
+import requests
+from discogs_client import Client
+from discogs_client.exceptions import HTTPError
+from discogs_client.fetchers import MemoryFetcher
+from discogs_client.server import LocalAPIServer
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class ServerTestCase(DiscogsClientTestCase):
+    def _client(self, server):
+        client = Client('test_client/0.1 +http://example.org')
+        client._base_url = server.base_url
+        client._fetcher.backoff_enabled = False
+        return client
+
+    def test_fixtures_over_http(self):
+        """The server answers requests from the test fixtures"""
+        with LocalAPIServer(rate_limit=1000) as server:
+            client = self._client(server)
+            self.assertEqual(client.artist(1).name, 'Persuader, The')
+            self.assertEqual(client._fetcher.rate_limit, '1000')
+            self.assertEqual(client._fetcher.rate_limit_used, '1')
+            self.assertEqual(client._fetcher.rate_limit_remaining, '999')
+
+            releases = client.artist(1).releases
+            self.assertEqual(len(releases), 57)
+            self.assertEqual(releases[0].id, 20209)
+            self.assertRaises(HTTPError, lambda: client.release(123456789).title)
+
+    def test_gzip_and_rate_limit(self):
+        """Responses are compressed and requests beyond the quota get a 429"""
+        with LocalAPIServer(rate_limit=2) as server:
+            url = server.base_url + '/artists/1'
+            with requests.Session() as session:
+                resp = session.get(url, headers={'Accept-Encoding': 'gzip'})
+                self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+                self.assertEqual(resp.json()['id'], 1)
+                resp = session.get(url, headers={'Accept-Encoding': 'identity'})
+                self.assertTrue('Content-Encoding' not in resp.headers)
+                resp = session.get(url)
+                self.assertEqual(resp.status_code, 429)
+                self.assertEqual(resp.headers['X-Discogs-Ratelimit-Remaining'], '0')
+
+    def test_paginated_list(self):
+        """Registered lists are paginated like the Discogs API does"""
+        items = [{'id': i, 'type': 'release', 'title': str(i)} for i in range(120)]
+        with LocalAPIServer(MemoryFetcher({}), rate_limit=1000) as server:
+            server.add_list('/database/search', 'results', items)
+            client = self._client(server)
+            results = client.search('anything')
+            self.assertEqual(results.pages, 3)
+            self.assertEqual(len(results), 120)
+            self.assertEqual([r.id for r in results], list(range(120)))
+            self.assertEqual(results[119].id, 119)
+            self.assertRaises(IndexError, lambda: results[120])
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite = unittest.TestLoader().loadTestsFromTestCase(ServerTestCase)
+    return suite
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
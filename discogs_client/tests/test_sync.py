@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import unittest
+from urllib.parse import urlsplit, parse_qsl
+from discogs_client import Client
+from discogs_client.sync import ListSync
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class ListFetcher:
+    """Serves a wantlist, newest first, and counts the requests"""
+    def __init__(self, wants):
+        self.wants = wants
+        self.requests = 0
+
+    def fetch(self, client, method, url, data=None, headers=None, json_format=True):
+        self.requests += 1
+        split = urlsplit(url)
+        params = dict(parse_qsl(split.query))
+        assert split.path == '/users/example/wants'
+        assert params['sort'] == 'added' and params['sort_order'] == 'desc'
+        page, per_page = int(params['page']), int(params['per_page'])
+        wants = sorted(self.wants, key=lambda want: want['date_added'], reverse=True)
+        body = {
+            'pagination': {'page': page, 'pages': max(1, -(-len(wants) // per_page)),
+                           'per_page': per_page, 'items': len(wants)},
+            'wants': wants[(page - 1) * per_page:page * per_page],
+        }
+        return json.dumps(body).encode('utf8'), 200
+
+
+def want(id_, day, rating=0):
+    return {'id': id_, 'rating': rating, 'date_added': '2020-01-{0:02d}T10:00:00-07:00'.format(day),
+            'basic_information': {'id': id_, 'title': 'Release {0}'.format(id_)}}
+
+
+class SyncTestCase(DiscogsClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fetcher = ListFetcher([want(i, i) for i in range(1, 26)])
+        self.client = Client('ua')
+        self.client._base_url = ''
+        self.client._fetcher = self.fetcher
+        self.user = self.client.user('example')
+        self.user.data['wantlist_url'] = '/users/example/wants'
+        self.now = 1000.0
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'wantlist.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_sync(self):
+        return ListSync.wantlist(self.user, self.path, per_page=10, full_every=3600,
+                                 clock=lambda: self.now)
+
+    def test_first_sync(self):
+        """The first sync walks the list and reports every item as added"""
+        events = self.make_sync().sync()
+        self.assertEqual(len(events), 25)
+        self.assertEqual({e.type for e in events}, {'added'})
+        self.assertEqual(events[0].key, '25')
+        self.assertEqual(events[0].item.release.title, 'Release 25')
+        self.assertEqual(self.fetcher.requests, 3)
+
+        with open(self.path) as f:
+            state = json.load(f)
+        self.assertEqual(state['high_water'], '2020-01-25T10:00:00-07:00')
+        self.assertEqual(len(state['items']), 25)
+
+    def test_incremental(self):
+        """Later syncs stop at known items and report the changes"""
+        self.make_sync().sync()
+        self.fetcher.requests = 0
+
+        # Nothing changed: one request
+        self.assertEqual(self.make_sync().sync(), [])
+        self.assertEqual(self.fetcher.requests, 1)
+
+        # New items and a changed recent item
+        self.fetcher.wants += [want(26, 26), want(27, 27)]
+        self.fetcher.wants[23]['rating'] = 5
+        self.fetcher.requests = 0
+        events = self.make_sync().sync()
+        self.assertEqual([(e.type, e.key) for e in events],
+                         [('added', '27'), ('added', '26'), ('changed', '24')])
+        self.assertEqual(self.fetcher.requests, 1)
+
+        # Changes of old items wait for the scheduled reconciliation
+        self.fetcher.wants[0]['rating'] = 3
+        self.assertEqual(self.make_sync().sync(), [])
+        self.now += 3600
+        sync = self.make_sync()
+        self.assertTrue(sync.full_due)
+        self.assertEqual([(e.type, e.key) for e in sync.sync()], [('changed', '1')])
+        self.assertFalse(self.make_sync().full_due)
+
+    def test_removed(self):
+        """Removals found through the item count trigger a reconciliation"""
+        self.make_sync().sync()
+        del self.fetcher.wants[2]
+        self.fetcher.requests = 0
+        events = self.make_sync().sync()
+        self.assertEqual([(e.type, e.key, e.item) for e in events], [('removed', '3', None)])
+        self.assertEqual(self.fetcher.requests, 3)
+
+        # A removal balanced by an addition of an old item waits for the
+        # scheduled reconciliation
+        del self.fetcher.wants[2]
+        self.fetcher.wants.append(want(30, 2))
+        self.assertEqual(self.make_sync().sync(), [])
+        events = self.make_sync().sync(full=True)
+        self.assertEqual(sorted((e.type, e.key) for e in events),
+                         [('added', '30'), ('removed', '4')])
+
+    def test_without_state_file(self):
+        """The state can live in memory only"""
+        sync = ListSync.wantlist(self.user, per_page=10)
+        self.assertEqual(len(sync.sync()), 25)
+        self.assertEqual(sync.sync(), [])
+        self.assertFalse(os.path.exists(self.path))
+        sync.reset()
+        self.assertEqual(len(sync.sync()), 25)
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(SyncTestCase)
+    return suite
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from discogs_client import Client
+from discogs_client.fetchers import FilesystemFetcher, MemoryFetcher
+from discogs_client.exceptions import HTTPError
+from discogs_client.models import Artist, Listing
+from discogs_client.synthetic import SyntheticDataset
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class SyntheticTestCase(DiscogsClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = SyntheticDataset(seed=7, releases=1000000)
+        self.dataset.add_user('example', collection=100000, wantlist=120, inventory=75)
+        self.client = Client('ua')
+        self.client._base_url = ''
+        self.client._fetcher = MemoryFetcher(self.dataset.responses())
+
+    def test_deterministic(self):
+        """The same seed produces the same data, another seed different data"""
+        other = SyntheticDataset(seed=7, releases=1000000)
+        self.assertEqual(self.dataset.release(123456), other.release(123456))
+        self.assertNotEqual(self.dataset.release(123456),
+                            SyntheticDataset(seed=8, releases=1000000).release(123456))
+        self.assertEqual(self.dataset.get('/database/search?q=foo&page=3&per_page=50'),
+                         other.get('/database/search?q=foo&page=3&per_page=50'))
+
+    def test_models(self):
+        """Generated responses work with the models"""
+        release = self.client.release(999999)
+        self.assertTrue(release.title)
+        self.assertTrue(4 <= len(release.tracklist) <= 40)
+        self.assertTrue(isinstance(release.artists[0], Artist))
+        self.assertEqual(release.labels[0].catno, release.data['labels'][0]['catno'])
+        self.assertTrue(release.master.title)
+        self.assertRaises(HTTPError, lambda: self.client.release(1000001).title)
+
+        user = self.client.user('example')
+        self.assertEqual(user.num_collection, 100000)
+        self.assertEqual(len(user.collection_folders[0].releases), 100000)
+        self.assertEqual(len(user.wantlist), 120)
+        self.assertEqual(len([w for w in user.wantlist]), 120)
+        self.assertTrue(isinstance(user.inventory[74], Listing))
+        self.assertRaises(IndexError, lambda: user.inventory[75])
+
+        results = self.client.search('foo', type='release')
+        self.assertEqual(results.count, 10000)
+        self.assertEqual(results.pages, 200)
+
+    def test_pagination(self):
+        """Pages of large lists are generated on demand"""
+        url = '/users/example/collection/folders/0/releases'
+        last = self.dataset.get(url + '?page=2000&per_page=50')
+        self.assertEqual(last['pagination']['pages'], 2000)
+        self.assertEqual(len(last['releases']), 50)
+        self.assertTrue('prev' in last['pagination']['urls'])
+        self.assertFalse('next' in last['pagination']['urls'])
+        self.assertTrue(self.dataset.get(url + '?page=2001&per_page=50') is None)
+
+        # Newest items come first
+        first = self.dataset.get(url + '?page=1&per_page=2')['releases']
+        self.assertTrue(first[0]['date_added'] > first[1]['date_added'])
+
+    def test_write_filesystem(self):
+        """Generated responses can be served by a FilesystemFetcher"""
+        with tempfile.TemporaryDirectory() as path:
+            urls = ['/releases/1', '/artists/2', '/users/example']
+            urls += list(self.dataset.list_urls('/users/example/wants', 120))
+            self.assertEqual(self.dataset.write_filesystem(path, urls), 6)
+            self.assertTrue(os.path.exists(os.path.join(path, 'releases', '1.json')))
+
+            self.client._fetcher = FilesystemFetcher(path)
+            self.assertEqual(self.client.release(1).title, self.dataset.release(1)['title'])
+            wantlist = self.client.user('example').wantlist
+            self.assertEqual([w.id for w in wantlist],
+                             [self.dataset.want('example', i)['id'] for i in range(120)])
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite = unittest.TestLoader().loadTestsFromTestCase(SyntheticTestCase)
+    return suite
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
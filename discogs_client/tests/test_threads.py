@@ -0,0 +1,237 @@
+import copy
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from discogs_client import Client
+from discogs_client.dumps import DumpFetcher, DumpStore
+from discogs_client.fetchers import (
+    FilesystemFetcher, LoggingDelegator, MemoryFetcher, OAuth2Fetcher, RateLimitedFetcher,
+    RecordingFetcher, ReplayFetcher, RequestsFetcher, SchedulingFetcher, SimulatedFetcher,
+    UserTokenRequestsFetcher)
+from discogs_client.synthetic import SyntheticDataset
+from discogs_client.tests import DiscogsClientTestCase
+
+
+class CountingFetcher:
+    """Counts the requests per URL, and holds every request for a moment so
+    that threads overlap"""
+    def __init__(self, fetcher, delay=0.001):
+        self.fetcher = fetcher
+        self.delay = delay
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def fetch(self, client, method, url, data=None, headers=None, json=True):
+        with self._lock:
+            self.counts[url] += 1
+        time.sleep(self.delay)
+        return self.fetcher.fetch(client, method, url, data, headers, json)
+
+
+class ThreadSafetyTestCase(DiscogsClientTestCase):
+    threads = 16
+
+    def setUp(self):
+        super().setUp()
+        self.dataset = SyntheticDataset(seed=11, releases=200)
+        self.dataset.add_user('example', wantlist=300)
+        self.client = Client('ua')
+        self.client._base_url = ''
+        self.fetcher = CountingFetcher(MemoryFetcher(self.dataset.responses()))
+        self.client._fetcher = self.fetcher
+
+    def run_threads(self, function, count):
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            return list(executor.map(function, range(count)))
+
+    def test_objects(self):
+        """Threads reading the same objects get complete data from a single
+        request per object"""
+        releases = [self.client.release(i) for i in range(1, 51)]
+
+        def read(i):
+            release = releases[i % len(releases)]
+            return release.id, release.title, len(release.tracklist), release.fetch('no such key')
+
+        for release_id, title, tracks, missing in self.run_threads(read, 2000):
+            expected = self.dataset.release(release_id)
+            self.assertEqual(title, expected['title'])
+            self.assertEqual(tracks, len(expected['tracklist']))
+            self.assertTrue(missing is None)
+        self.assertEqual(set(self.fetcher.counts.values()), {1})
+        self.assertEqual(len(self.fetcher.counts), 50)
+
+    def test_paginated(self):
+        """Pages are read concurrently while the cache is dropped over and
+        over"""
+        wantlist = self.client.user('example').wantlist
+        wantlist.per_page = 25
+        expected = [self.dataset.want('example', i)['id'] for i in range(300)]
+        done = threading.Event()
+
+        def invalidate():
+            while not done.is_set():
+                wantlist.filter()
+                time.sleep(0.0005)
+
+        invalidator = threading.Thread(target=invalidate)
+        invalidator.start()
+        try:
+            ids = self.run_threads(lambda i: wantlist[(i * 7) % 300].id, 1500)
+            self.assertEqual(ids, [expected[(i * 7) % 300] for i in range(1500)])
+            walks = self.run_threads(lambda i: [want.id for want in wantlist], 8)
+        finally:
+            done.set()
+            invalidator.join()
+        self.assertEqual(walks, [expected] * 8)
+
+        # Without invalidation, every page is cached once it is fetched
+        self.fetcher.counts.clear()
+        wantlist.filter()
+        self.run_threads(lambda i: list(wantlist), 8)
+        self.run_threads(lambda i: list(wantlist), 8)
+        self.assertTrue(sum(self.fetcher.counts.values()) <= 8 * 12)
+        self.assertEqual(len(wantlist._pages), 12)
+
+    def test_page_threads(self):
+        """Pages are fetched by the same few threads every time, so that
+        their sessions are reused"""
+        wantlist = self.client.user('example').wantlist
+        wantlist.per_page = 25
+        idents = set()
+        fetch = self.fetcher.fetch
+
+        def record(*args, **kwargs):
+            idents.add(threading.get_ident())
+            return fetch(*args, **kwargs)
+
+        self.fetcher.fetch = record
+        for _ in range(5):
+            wantlist.filter()
+            wantlist._load_pages(range(1, 13))
+        self.assertTrue(len(idents) <= wantlist.concurrency)
+        self.assertEqual(len(wantlist._pages), 12)
+
+    def test_sessions(self):
+        """Every thread has a session of its own, kept across requests"""
+        fetcher = RequestsFetcher()
+        sessions = self.run_threads(lambda i: (threading.get_ident(), fetcher.session), 200)
+        by_thread = {}
+        for ident, session in sessions:
+            self.assertTrue(by_thread.setdefault(ident, session) is session)
+        self.assertEqual(len(set(map(id, by_thread.values()))), len(by_thread))
+
+    def test_rate_limit_info(self):
+        """The rate limit headers of a response are read together"""
+        fetcher = RequestsFetcher()
+
+        def store(i):
+            used = i % 60
+            fetcher.store_rate_limit({'X-Discogs-Ratelimit': '60',
+                                      'X-Discogs-Ratelimit-Used': str(used),
+                                      'X-Discogs-Ratelimit-Remaining': str(60 - used)})
+            info = fetcher.rate_limit_info
+            return int(info.rate_limit_used) + int(info.rate_limit_remaining)
+
+        self.assertEqual(set(self.run_threads(store, 5000)), {60})
+        self.assertEqual(fetcher.rate_limit, '60')
+
+    def test_oauth_tokens(self):
+        """Requests are signed with a token and its own secret while the token
+        changes"""
+        fetcher = OAuth2Fetcher('consumer_key', 'consumer_secret')
+
+        def sign(i):
+            if i % 10 == 0:
+                fetcher.store_token('token{0}'.format(i), 'secret{0}'.format(i))
+            client = fetcher.client
+            client.sign('https://api.discogs.com/oauth/identity', http_method='GET')
+            key, secret = client.resource_owner_key, client.resource_owner_secret
+            return key is None or key[5:] == secret[6:]
+
+        self.assertTrue(all(self.run_threads(sign, 2000)))
+        fetcher.set_verifier('1234')
+        self.assertEqual(fetcher.client.verifier, '1234')
+
+    def test_pickle(self):
+        """Objects, lists and fetchers used from many threads can still be
+        pickled and copied"""
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'res')
+        filesystem_fetcher = FilesystemFetcher(path, use_mmap=True)
+        client = Client('ua')
+        client._base_url = ''
+        client._fetcher = filesystem_fetcher
+        release = client.release(1)
+        self.assertTrue(release.fetch('no such key') is None)
+        wantlist = client.user('example').wantlist
+        ids = [want.id for want in wantlist]
+
+        for clone in (pickle.loads(pickle.dumps(release)), copy.deepcopy(release)):
+            self.assertEqual(clone.title, release.title)
+            self.assertTrue(clone.fetch('no such key') is None)
+        for clone in (pickle.loads(pickle.dumps(wantlist)), copy.deepcopy(wantlist)):
+            self.assertEqual([want.id for want in clone], ids)
+            # The cache of the copy is dropped under its own lock
+            clone.per_page = 50
+            self.assertEqual(clone[-1].id, ids[-1])
+            clone.client._fetcher.close()
+
+        requests_fetcher = RequestsFetcher()
+        session = requests_fetcher.session
+        oauth_fetcher = OAuth2Fetcher('key', 'secret', token='token', secret='token_secret')
+        oauth_fetcher.signer.sign('https://api.discogs.com/oauth/identity')
+        for fetcher in (requests_fetcher, oauth_fetcher):
+            for clone in (pickle.loads(pickle.dumps(fetcher)), copy.deepcopy(fetcher)):
+                self.assertEqual(type(clone), type(fetcher))
+        self.assertFalse(copy.deepcopy(requests_fetcher).session is session)
+        clone = pickle.loads(pickle.dumps(oauth_fetcher))
+        _, headers, _ = clone.signer.sign('https://api.discogs.com/oauth/identity')
+        self.assertTrue('oauth_token="token"' in headers['Authorization'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            cassette = os.path.join(directory, 'session.cassette')
+            recorder = RecordingFetcher(filesystem_fetcher, cassette)
+            client._fetcher = recorder
+            self.assertEqual(client.release(1).title, release.title)
+            recorder.close()
+            replay = ReplayFetcher(cassette)
+            store = DumpStore(directory)
+            fetchers = [
+                LoggingDelegator(filesystem_fetcher),
+                UserTokenRequestsFetcher('token'),
+                MemoryFetcher({'/releases/1': ('{"id": 1}', 200)}),
+                RecordingFetcher(filesystem_fetcher, cassette),
+                RateLimitedFetcher(filesystem_fetcher, rate=10, per=1.0),
+                SchedulingFetcher(filesystem_fetcher, rate=10, per=1.0),
+                replay,
+                SimulatedFetcher(filesystem_fetcher, rate_limit=10),
+                DumpFetcher(store, fallback=replay),
+            ]
+            for fetcher in fetchers:
+                for clone in (pickle.loads(pickle.dumps(fetcher)), copy.deepcopy(fetcher)):
+                    self.assertEqual(type(clone), type(fetcher))
+                    if isinstance(clone, (RecordingFetcher, ReplayFetcher)):
+                        clone.close()
+                    if isinstance(clone, DumpFetcher):
+                        clone.store.close()
+            # The copies open the cassette and the store again
+            clone = copy.deepcopy(replay)
+            self.assertEqual(len(clone), len(replay))
+            content, status_code = clone.fetch(client, 'GET', '/releases/1')
+            self.assertEqual(status_code, 200)
+            clone.close()
+            self.assertEqual(copy.deepcopy(store).kinds, store.kinds)
+            fetchers[3].close()
+            replay.close()
+            store.close()
+        filesystem_fetcher.close()
+
+
+def suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(ThreadSafetyTestCase)
+    return suite
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
@@ -26,6 +28,14 @@ class UtilsTestCase(DiscogsClientTestCase):
         self.assertEqual(u('http://example.com', {'a': 't\xe9st'}),
                          'http://example.com?a=t%C3%A9st')
 
+    def test_canonical_url(self):
+        c = utils.canonical_url
+        self.assertEqual(c('HTTPS://API.Discogs.com/artists/1'), 'https://api.discogs.com/artists/1')
+        self.assertEqual(c('/database/search?q=a&page=2&per_page=50'),
+                         c('/database/search?per_page=50&page=2&q=a'))
+        self.assertEqual(c('/database/search?token=abc&q=a&oauth_nonce=1'), '/database/search?q=a')
+        self.assertEqual(c('/users/example/wants?token=abc'), '/users/example/wants')
+
     def test_omit_none(self):
         o = utils.omit_none
         self.assertEqual(o({
@@ -42,6 +52,15 @@ class UtilsTestCase(DiscogsClientTestCase):
         self.assertEqual(o({'nope': 'yep'}), {'nope': 'yep'})
         self.assertEqual(o({}), {})
 
+    def test_write_atomic(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'state.json')
+            utils.write_atomic(path, '{"a": 1}')
+            utils.write_atomic(path, '{"a": 2}')
+            with open(path) as f:
+                self.assertEqual(f.read(), '{"a": 2}')
+            self.assertEqual(os.listdir(directory), ['state.json'])
+
     def test_parse_timestamp(self):
         p = utils.parse_timestamp
         self.assertEqual(
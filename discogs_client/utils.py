@@ -4,9 +4,9 @@ except ImportError:
     def member(func):
         return func
 
+import os
 from datetime import datetime
-from dateutil.parser import parse
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit
 from discogs_client.exceptions import TooManyAttemptsError
 from time import sleep
 from random import uniform
@@ -16,6 +16,8 @@ from enum import Enum
 
 def parse_timestamp(timestamp: str) -> datetime:
     """Convert an ISO 8601 timestamp into a datetime."""
+    # Imported on first use, it takes a good part of the import time
+    from dateutil.parser import parse
     return parse(timestamp)
 
 
@@ -27,6 +29,47 @@ def update_qs(url, params):
     return url + separator + joined_qs
 
 
+def canonical_url(url, ignore=('token', 'oauth_')):
+    """Normalize a URL so that equivalent requests compare equal.
+
+    Scheme and host are lowercased and the query parameters are sorted.
+    Parameters whose names start with one of the prefixes in ``ignore`` are
+    dropped; by default these are the ones used for authentication.
+    """
+    split = urlsplit(url)
+    params = sorted(p for p in split.query.split('&')
+                    if p and not p.split('=', 1)[0].startswith(ignore))
+    netloc = split.netloc.lower()
+    base = '{0}://{1}{2}'.format(split.scheme.lower(), netloc, split.path) \
+        if netloc else split.path
+    return base + ('?' + '&'.join(params) if params else '')
+
+
+def encode_multipart(field, filename, content, content_type='application/octet-stream'):
+    """Encode a file upload as multipart/form-data.
+
+    Returns the body and the Content-Type header value with its boundary.
+    """
+    from uuid import uuid4
+    boundary = uuid4().hex
+    head = ('--{0}\r\n'
+            'Content-Disposition: form-data; name="{1}"; filename="{2}"\r\n'
+            'Content-Type: {3}\r\n\r\n').format(boundary, field, filename, content_type)
+    tail = '\r\n--{0}--\r\n'.format(boundary)
+    body = head.encode('utf8') + content + tail.encode('utf8')
+    return body, 'multipart/form-data; boundary=' + boundary
+
+
+def write_atomic(path, text):
+    """Write text to a file, replacing it atomically: the text is written to
+    ``path + '.tmp'`` first, so that readers see the old file or the new one
+    but never a partly written one."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
 def omit_none(dict_):
     """Removes any key from a dict that has a value of None."""
     return {k: v for k, v in dict_.items() if v is not None}
@@ -67,7 +110,8 @@ def backoff(f):
                 return result
 
             duration = get_backoff_duration(i)
-            sleep(duration)
+            # Fetchers running on a simulated clock provide their own sleep
+            getattr(self, '_sleep', sleep)(duration)
 
         # Max attempts reached without returning, raise error
         raise TooManyAttemptsError